@@ -7,18 +7,36 @@ API 服务模块：处理热点获取、剧本生成、图片生成等功能
 import os
 import re
 import json
-import requests
-import urllib.request
+import time
+import threading
 import streamlit as st
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core.api_client import DEFAULT_ZHIPU_QUOTA, zhipu_rate_limiter
+from core.http_transport import DEFAULT_RETRY, get_openai_client, get_transport
+from core.media_store import get_media_store, media_key
+from core.video_jobs import VideoJob, run_video_jobs_sync
+
+# 智谱生成接口
+ZHIPU_API_BASE = "https://open.bigmodel.cn/api/paas/v4"
+ZHIPU_IMAGE_URL = f"{ZHIPU_API_BASE}/images/generations"
+
+# 分镜图片并发生成上限（智谱并发配额有限，可用环境变量调整）
+IMAGE_MAX_CONCURRENCY = int(os.environ.get("VIDEOTAXI_IMAGE_CONCURRENCY", "4"))
+# 生成请求 / 下载的超时：(建连, 读取) 秒
+IMAGE_REQUEST_TIMEOUT = (10, 60)
+IMAGE_DOWNLOAD_TIMEOUT = (10, 60)
+# DeepSeek 接口（OpenAI SDK 客户端经 get_openai_client 按 API Key 复用）
+DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
 
 def get_hot_topics(api_key):
     """获取抖音热搜榜单"""
     url = 'https://apis.tianapi.com/douyinhot/index'.strip()
     try:
-        res = requests.post(url, data={'key': api_key}, 
-                          headers={'Content-type': 'application/x-www-form-urlencoded'}, 
-                          timeout=10)
+        # 热搜查询无副作用，按幂等请求重试
+        res = get_transport().post(url, endpoint="tianapi:douyinhot", retry=DEFAULT_RETRY,
+                                   data={'key': api_key},
+                                   headers={'Content-type': 'application/x-www-form-urlencoded'},
+                                   timeout=10)
         data = res.json()
         if data.get('code') == 200:
             return [item['word'] for item in data['result']['list'][:10]]
@@ -29,7 +47,7 @@ def get_hot_topics(api_key):
 
 def generate_script_json(topic, api_key):
     """使用 DeepSeek 生成剧本（标准模式，注入爆款基因）"""
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com/v1".strip())
+    client = get_openai_client(api_key, DEEPSEEK_BASE_URL)
     
     # 🔥 升级版标准模式：爆款基因 + 真实性保护
     system_prompt = """你是一位专业的短视频导演，精通爆款视频创作法则，同时坚守内容真实性。
@@ -73,7 +91,7 @@ def generate_script_json(topic, api_key):
 
 def generate_viral_script(topic, api_key, auto_image_prompt=True):
     """🔥 使用爆款剧本大师 Agent 生成高能量脚本 (注入完整 Skill)"""
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com/v1".strip())
+    client = get_openai_client(api_key, DEEPSEEK_BASE_URL)
     
     # 动态设定关于画面提示词的指令
     if auto_image_prompt:
@@ -311,7 +329,7 @@ def generate_script_by_style(topic, style, api_key, auto_image_prompt=True):
     2. 导演级Prompt模板：强制包含镜头语言、光影、风格滤镜
     3. 电影质感增强：8K、胶片颗粒、专业摄影术语
     """
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com/v1".strip())
+    client = get_openai_client(api_key, DEEPSEEK_BASE_URL)
     
     # 🎯 步骤1：生成视觉锚点（主角特征包）
     with st.status("🎬 导演正在确定视觉锚点...", expanded=True) as status:
@@ -565,33 +583,43 @@ def generate_script_by_style(topic, style, api_key, auto_image_prompt=True):
         st.error(f"{style} 剧本生成失败: {e}")
         return []
 
-def generate_images_zhipu(scenes_data, api_key, style_config=None, use_video_model=False):
+def generate_images_zhipu(scenes_data, api_key, style_config=None, use_video_model=False,
+                          only=None, on_result=None, max_concurrency=None):
     """
     🎬 调用智谱 AI - VideoTaxi Cinematography v3.0 导演定焦版
     
     支持两种模式：
     1. CogView-4: 图片生成（默认，最新版）
-    2. CogVideoX-3: 视频生成（当 use_video_model=True）
+    2. CogVideoX-3: 视频生成（当 use_video_model=True）；所有分镜的任务一次性提交、统一轮询，
+       同时生成静态图片，任务失败或超过截止时间的分镜回退到静态图片
     
     核心升级：
     1. 使用 build_master_image_prompt 构建电影级 Prompt
     2. 视觉锚点确保人物一致性
     3. 强制镜头语言、光影、风格滤镜
+    
+    各分镜在线程池中并发生成（共用一个连接池会话），生成完成即流式下载到磁盘，
+    整批耗时约等于最慢的一个分镜；返回结果仍按分镜顺序排列。
+    
+    Args:
+        only: 只生成这些序号的分镜（其余返回 None）；镜头类型与文件名仍按完整剧本中的序号
+        on_result: 每个分镜完成后回调 on_result(序号, 路径或 None)，按完成先后调用，用于流水线提前开工
+        max_concurrency: 同时进行的生成请求数（默认 IMAGE_MAX_CONCURRENCY）
     """
-    # 根据模式选择 API 端点和模型
+    # 根据模式选择模型
     if use_video_model:
-        url = "https://open.bigmodel.cn/api/paas/v4/videos/generations".strip()
         model_name = "cogvideox-3"
         file_ext = "mp4"
         media_type = "视频"
     else:
-        url = "https://open.bigmodel.cn/api/paas/v4/images/generations".strip()
         model_name = "cogview-4"
         file_ext = "jpg"
         media_type = "图片"
     
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
-    media_paths = []
+    transport = get_transport()
+    limiter = zhipu_rate_limiter(api_key)
+    store = get_media_store()
     
     # 获取视觉锚点（从第一个 scene 中获取）
     visual_anchor = ""
@@ -604,14 +632,15 @@ def generate_images_zhipu(scenes_data, api_key, style_config=None, use_video_mod
         "default_shot": "close_up"
     }
     style = style_config or default_style
+    style_label = style.get("name") or style.get("shot_keywords", "")
     
-    for i, scene in enumerate(scenes_data):
+    def scene_prompt(i, scene):
+        """分镜的最终提示词（image_prompt 为空时返回 None）"""
         # 🔍 检查 image_prompt 是否为空
         raw_prompt = scene.get('image_prompt', '')
         if not raw_prompt or raw_prompt.strip() == "":
             st.warning(f"⚠️ 分镜 {i+1} 的 image_prompt 为空，跳过{media_type}生成")
-            media_paths.append(None)
-            continue
+            return None
         
         # 🎬 使用导演级 Prompt 构建器
         # 提取场景描述（去掉可能的 visual_anchor 前缀）
@@ -641,42 +670,150 @@ def generate_images_zhipu(scenes_data, api_key, style_config=None, use_video_mod
         # 确保提示词长度合适（智谱有长度限制）
         if len(enhanced_prompt) > 500:
             enhanced_prompt = enhanced_prompt[:497] + "..."
-            
+        return enhanced_prompt
+    
+    def generate_one(i, scene):
+        enhanced_prompt = scene_prompt(i, scene)
+        if enhanced_prompt is None:
+            return None
+        
         payload = {
             "model": model_name, 
-            "prompt": enhanced_prompt
+            "prompt": enhanced_prompt,
+            "size": "1024x1920"
         }
         
-        # 图片模式添加尺寸，视频模式使用默认
-        if not use_video_model:
-            payload["size"] = "1024x1920"
+        # 💾 素材库：模型 + 尺寸 + 最终提示词相同即复用，不再调用付费接口
+        key = media_key(model_name, payload["size"], enhanced_prompt)
+        temp_name = f"temp_scene_{i}.{file_ext}"
+        if store.fetch(key, temp_name):
+            st.write(f"♻️ 分镜 {i+1} 提示词未变，复用素材库中的{media_type}")
+            return temp_name
         
         st.toast(f"🎨 正在生成{media_type}分镜 {i+1}/{len(scenes_data)} ...")
         st.caption(f"📝 优化后提示词: {enhanced_prompt[:80]}...")
         
         try:
-            res = requests.post(url, json=payload, headers=headers, timeout=60).json()
+            res = transport.post(ZHIPU_IMAGE_URL, endpoint="zhipu:images/generations", json=payload,
+                                 headers=headers, timeout=IMAGE_REQUEST_TIMEOUT, limiter=limiter,
+                                 retry=DEFAULT_ZHIPU_QUOTA.retry).json()
             
             # 🔍 详细的错误日志
             if 'data' in res:
                 media_url = res['data'][0]['url']
-                temp_name = f"temp_scene_{i}.{file_ext}"
                 st.write(f"✅ 分镜 {i+1} {media_type}URL获取成功: {media_url[:50]}...")
-                urllib.request.urlretrieve(media_url, temp_name)
+                transport.download(media_url, temp_name, endpoint="zhipu:media-download",
+                                   timeout=IMAGE_DOWNLOAD_TIMEOUT)
                 
                 # 验证文件是否下载成功
                 if os.path.exists(temp_name) and os.path.getsize(temp_name) > 0:
                     st.write(f"✅ 分镜 {i+1} {media_type}下载成功: {temp_name} ({os.path.getsize(temp_name)} bytes)")
-                    media_paths.append(temp_name)
+                    store.store(key, temp_name, model_name, payload["size"], enhanced_prompt,
+                                anchor=visual_anchor, style=style_label)
+                    return temp_name
                 else:
                     st.error(f"❌ 分镜 {i+1} {media_type}下载失败或文件为空")
-                    media_paths.append(None)
+                    return None
             else:
                 st.error(f"❌ 分镜 {i+1} 智谱API返回错误: {res}")
-                media_paths.append(None)
+                return None
         except Exception as e:
             st.error(f"❌ 分镜 {i+1} {media_type}生成异常: {str(e)}")
-            media_paths.append(None)
+            return None
+    
+    media_paths = [None] * len(scenes_data)
+    pending = [i for i in range(len(scenes_data)) if only is None or i in only]
+    if not pending:
+        return media_paths
+    
+    # 工作线程继承当前页面的脚本上下文，st.* 输出仍显示在页面上
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    ctx = get_script_run_ctx(suppress_warning=True)
+    
+    def attach_context():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+    
+    if use_video_model:
+        start = time.perf_counter()
+        
+        # 静态图片在后台线程并发生成，作为视频任务失败 / 超时的回退
+        def generate_stills():
+            attach_context()
+            return generate_images_zhipu(scenes_data, api_key, style_config, use_video_model=False,
+                                         only=set(pending), max_concurrency=max_concurrency)
+        
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="zhipu-stills") as stills_pool:
+            stills = stills_pool.submit(generate_stills)
+            
+            jobs = []
+            keys = {}
+            for i in pending:
+                enhanced_prompt = scene_prompt(i, scenes_data[i])
+                if enhanced_prompt is None:
+                    continue
+                keys[i] = media_key(model_name, "", enhanced_prompt)
+                temp_name = f"temp_scene_{i}.{file_ext}"
+                if store.fetch(keys[i], temp_name):
+                    st.write(f"♻️ 分镜 {i+1} 提示词未变，复用素材库中的{media_type}")
+                    media_paths[i] = temp_name
+                    if on_result:
+                        on_result(i, temp_name)
+                    continue
+                jobs.append(VideoJob(index=i, prompt=enhanced_prompt, output_path=temp_name))
+            
+            def job_done(job):
+                if not job.succeeded:
+                    return
+                st.write(f"✅ 分镜 {job.index+1} 视频生成完成（{job.elapsed:.0f}s）")
+                store.store(keys[job.index], job.output_path, model_name, "", job.prompt,
+                            anchor=visual_anchor, style=style_label)
+                media_paths[job.index] = job.output_path
+                if on_result:
+                    on_result(job.index, job.output_path)
+            
+            if jobs:
+                st.toast(f"🎬 已提交 {len(jobs)} 个视频生成任务，统一轮询中...")
+                run_video_jobs_sync(api_key, jobs, base_url=ZHIPU_API_BASE, on_done=job_done, limiter=limiter)
+            still_paths = stills.result()
+        
+        failed = {job.index: job for job in jobs if not job.succeeded}
+        for i in pending:
+            if media_paths[i] is not None:
+                # 视频可用，回退用的静态图片不再需要（素材库中仍有保存）
+                if still_paths[i] and os.path.exists(still_paths[i]):
+                    os.remove(still_paths[i])
+                continue
+            if i in failed:
+                st.warning(f"⚠️ 分镜 {i+1} 视频未生成（{failed[i].error}），回退到静态图片")
+            media_paths[i] = still_paths[i]
+            if on_result:
+                on_result(i, media_paths[i])
+        
+        st.caption(f"⏱️ 视频生成总耗时 {time.perf_counter() - start:.1f}s"
+                   f"（{len(jobs)} 个任务，成功 {len(jobs) - len(failed)}，回退 {len(failed)}）")
+        return media_paths
+    
+    def run(i):
+        attach_context()
+        start = time.perf_counter()
+        return generate_one(i, scenes_data[i]), time.perf_counter() - start
+    
+    workers = max(1, min(max_concurrency or IMAGE_MAX_CONCURRENCY, len(pending)))
+    latencies = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zhipu-media") as pool:
+        futures = {pool.submit(run, i): i for i in pending}
+        for future in as_completed(futures):
+            i = futures[future]
+            path, latency = future.result()
+            media_paths[i] = path
+            latencies.append(latency)
+            if on_result:
+                on_result(i, path)
+    
+    st.caption(f"⏱️ {media_type}生成总耗时 {time.perf_counter() - start:.1f}s"
+               f"（{len(pending)} 个分镜，并发 {workers}，最慢 {max(latencies):.1f}s）")
     return media_paths
 
 def get_pexels_videos(query, api_key, required_duration):
@@ -686,11 +823,12 @@ def get_pexels_videos(query, api_key, required_duration):
     params = {"query": query, "per_page": 5, "orientation": "portrait"}
     
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        transport = get_transport()
+        response = transport.get(url, endpoint="pexels:videos/search", headers=headers, params=params, timeout=10)
         data = response.json()
         if not data.get('videos'):
             params['query'] = "nature landscape"  # 英文风景保底
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = transport.get(url, endpoint="pexels:videos/search", headers=headers, params=params, timeout=10)
             data = response.json()
 
         downloaded_files = []
@@ -705,7 +843,7 @@ def get_pexels_videos(query, api_key, required_duration):
             link = hd_file['link']
             
             temp_name = f"temp_pexels_{i}.mp4"
-            urllib.request.urlretrieve(link, temp_name)
+            transport.download(link, temp_name, endpoint="pexels:video-download", timeout=(10, 120))
             
             clip = VideoFileClip(temp_name)
             current_dur += clip.duration
@@ -719,7 +857,7 @@ def get_pexels_videos(query, api_key, required_duration):
 
 def refine_script_data(current_scenes, api_key):
     """✨ 调用大师进行二次精修，挑刺并提升文案能量密度"""
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com/v1".strip())
+    client = get_openai_client(api_key, DEEPSEEK_BASE_URL)
     
     # 将当前的剧本转换为 JSON 字符串喂给 AI
     current_json_str = json.dumps(current_scenes, ensure_ascii=False)
@@ -785,7 +923,7 @@ def refine_script_by_chat(current_scenes, user_request, api_key):
     Returns:
         修改后的 scenes_data
     """
-    client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com/v1".strip())
+    client = get_openai_client(api_key, DEEPSEEK_BASE_URL)
     
     # 构造 Prompt：传递当前剧本 + 用户意图
     system_prompt = """你是一位精通短视频导演的 AI 助手。用户会给你一个已存在的剧本，并提出修改需求。
@@ -45,11 +45,17 @@ def get_config_manager():
     """获取配置管理器（缓存）"""
     return ConfigManager()
 
+@st.cache_resource
+def warm_up_voices(voice_id):
+    """后台预热配置的默认音色（每个进程一次）：实例入池、凭证校验、火山引擎预先建连，不阻塞页面渲染"""
+    return VoiceFactory.warm_up_in_background([voice_id], timeout=5)
+
 def init_app():
     """初始化应用"""
     # 初始化配置
     config_mgr = get_config_manager()
     config_mgr.load_from_secrets().load_from_env()
+    warm_up_voices(config_mgr.get_config().default_voice)
     
     # 初始化状态
     app_state = AppState()
@@ -7,8 +7,8 @@
 
 import streamlit as st
 import time
-import requests
 import json
+from core.http_transport import get_transport
 from db_manager import get_user_credits, deduct_credits, save_message, load_messages, clear_messages
 
 def call_deepseek_chat(messages, api_key, model_id="deepseek-chat"):
@@ -26,8 +26,9 @@ def call_deepseek_chat(messages, api_key, model_id="deepseek-chat"):
             "max_tokens": 2000
         }
         
-        response = requests.post(
+        response = get_transport().post(
             "https://api.deepseek.com/v1/chat/completions",
+            endpoint="deepseek:chat/completions",
             headers=headers,
             json=payload,
             timeout=30
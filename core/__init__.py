@@ -6,8 +6,11 @@ VideoTaxi 核心模块 - 面向对象架构
 
 from .config import Config, ConfigManager
 from .database import Database, UserRepository
-from .api_client import APIClient, DeepSeekClient, ZhipuClient
+from .api_client import APIClient, DeepSeekClient, ZhipuClient, TianapiClient, PexelsClient, ZhipuQuota
+from .primitives import RetryPolicy, TokenBucket
 from .app_state import AppState, WorkflowState
+from .media_store import MediaStore, MediaEntry, media_key, get_media_store
+from .http_transport import HttpTransport, TransportSettings, EndpointMetrics, get_transport, get_openai_client
 
 __all__ = [
     'Config',
@@ -17,6 +20,20 @@ __all__ = [
     'APIClient',
     'DeepSeekClient',
     'ZhipuClient',
+    'TianapiClient',
+    'PexelsClient',
+    'ZhipuQuota',
+    'RetryPolicy',
+    'TokenBucket',
     'AppState',
-    'WorkflowState'
+    'WorkflowState',
+    'MediaStore',
+    'MediaEntry',
+    'media_key',
+    'get_media_store',
+    'HttpTransport',
+    'TransportSettings',
+    'EndpointMetrics',
+    'get_transport',
+    'get_openai_client'
 ]
@@ -5,9 +5,18 @@ API 客户端模块 - 面向对象的 API 调用封装
 
 import requests
 import json
+import os
+import queue
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Iterator, Optional, List, Sequence, Tuple
+from dataclasses import dataclass, field
+
+from .http_transport import DEFAULT_RETRY, get_transport
+from .media_store import get_media_store, media_key
+from .primitives import RetryPolicy, TokenBucket
+from .video_jobs import VideoJob, run_video_jobs_sync
 
 
 @dataclass
@@ -28,22 +37,31 @@ class APIClient(ABC):
     def __init__(self, api_key: str, base_url: str):
         self._api_key = api_key
         self._base_url = base_url
-        self._session = requests.Session()
+        self._transport = get_transport()
     
     @abstractmethod
     def _get_headers(self) -> Dict[str, str]:
         """获取请求头"""
         pass
     
-    def _post(self, endpoint: str, payload: Dict, timeout: int = 60) -> APIResponse:
-        """发送 POST 请求"""
-        url = f"{self._base_url}/{endpoint}"
+    def _post(self, endpoint: str, payload: Dict, timeout: int = 60,
+              retry: Optional[RetryPolicy] = None, limiter: Optional[TokenBucket] = None) -> APIResponse:
+        """
+        发送 POST 请求（经共享传输层：连接复用，按重试策略重试）
+        
+        Args:
+            retry: 重试策略（默认使用传输层的 POST 策略：只重试 429）
+            limiter: 提供时每次请求（含重试）先取令牌
+        """
         try:
-            response = self._session.post(
-                url,
+            response = self._transport.post(
+                f"{self._base_url}/{endpoint}",
+                endpoint=self._endpoint_name(endpoint),
                 json=payload,
                 headers=self._get_headers(),
-                timeout=timeout
+                timeout=timeout,
+                retry=retry,
+                limiter=limiter
             )
             response.raise_for_status()
             data = response.json()
@@ -55,10 +73,10 @@ class APIClient(ABC):
     
     def _get(self, endpoint: str, params: Dict = None, timeout: int = 30) -> APIResponse:
         """发送 GET 请求"""
-        url = f"{self._base_url}/{endpoint}"
         try:
-            response = self._session.get(
-                url,
+            response = self._transport.get(
+                f"{self._base_url}/{endpoint}",
+                endpoint=self._endpoint_name(endpoint),
                 params=params,
                 headers=self._get_headers(),
                 timeout=timeout
@@ -68,6 +86,12 @@ class APIClient(ABC):
             return APIResponse(success=True, data=data, raw_response=data)
         except requests.exceptions.RequestException as e:
             return APIResponse(success=False, error=str(e))
+    
+    def _endpoint_name(self, endpoint: str) -> str:
+        """指标中的端点名：类名 + 路径（任务 ID 等路径参数归并为一个端点）"""
+        if endpoint.startswith("async-result/"):
+            endpoint = "async-result"
+        return f"{type(self).__name__.replace('Client', '').lower()}:{endpoint}"
 
 
 class DeepSeekClient(APIClient):
@@ -132,14 +156,47 @@ class DeepSeekClient(APIClient):
         return self._post("chat/completions", payload)
 
 
+@dataclass(frozen=True)
+class ZhipuQuota:
+    """智谱生成接口的配额（同一 API Key 的所有客户端共享令牌桶）"""
+    max_concurrency: int = 4            # 批量生成时同时进行的请求数
+    rate: float = 1.0                   # 每秒请求数
+    burst: int = 4                      # 允许的突发请求数
+    # 只重试 429 / 5xx：网络异常或超时时请求可能已被受理，重新提交会生成第二个计费任务
+    retry: RetryPolicy = field(default_factory=lambda: RetryPolicy(max_attempts=4, retry_network_errors=False))
+
+
+DEFAULT_ZHIPU_QUOTA = ZhipuQuota()
+
+_zhipu_buckets: Dict[Tuple[str, float, int], TokenBucket] = {}
+_zhipu_buckets_lock = threading.Lock()
+
+
+def zhipu_rate_limiter(api_key: str, quota: ZhipuQuota = DEFAULT_ZHIPU_QUOTA) -> TokenBucket:
+    """同一 API Key 共享的智谱生成接口令牌桶（ZhipuClient 与 api_services 的分镜生成共用）"""
+    key = (api_key, quota.rate, quota.burst)
+    with _zhipu_buckets_lock:
+        bucket = _zhipu_buckets.get(key)
+        if bucket is None:
+            bucket = _zhipu_buckets[key] = TokenBucket(quota.rate, quota.burst)
+        return bucket
+
+
 class ZhipuClient(APIClient):
     """
     智谱 AI API 客户端
-    用于图片/视频生成
+    用于图片/视频生成；生成请求经令牌桶限流，限流与服务端错误按 Retry-After / 退避重试，
+    网络异常与超时不重试（避免重复提交计费任务）
     """
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, quota: ZhipuQuota = DEFAULT_ZHIPU_QUOTA):
         super().__init__(api_key, "https://open.bigmodel.cn/api/paas/v4")
+        self.quota = quota
+    
+    def _generation_post(self, endpoint: str, payload: Dict, timeout: int) -> APIResponse:
+        """生成类请求：限流 + 按状态码重试（不因网络异常重新提交）"""
+        return self._post(endpoint, payload, timeout=timeout, retry=self.quota.retry,
+                          limiter=zhipu_rate_limiter(self._api_key, self.quota))
     
     def _get_headers(self) -> Dict[str, str]:
         return {
@@ -154,23 +211,178 @@ class ZhipuClient(APIClient):
             "prompt": prompt,
             "size": size
         }
-        return self._post("images/generations", payload, timeout=60)
+        return self._generation_post("images/generations", payload, timeout=60)
     
     def generate_video(self, prompt: str) -> APIResponse:
-        """生成视频（CogVideoX-3）"""
+        """
+        提交视频生成任务（CogVideoX-3）
+        接口是异步任务：返回的 data 中只有任务 ID（data["id"]），结果需轮询 get_video_result，
+        或直接使用 generate_media_file / core.video_jobs 完成提交、轮询与下载
+        """
         payload = {
             "model": "cogvideox-3",
             "prompt": prompt
         }
-        return self._post("videos/generations", payload, timeout=120)
+        return self._generation_post("videos/generations", payload, timeout=30)
+    
+    def get_video_result(self, task_id: str) -> APIResponse:
+        """查询视频任务（data["task_status"] 为 PROCESSING / SUCCESS / FAIL）"""
+        return self._get(f"async-result/{task_id}", timeout=30)
+    
+    def generate_media_file(self, prompt: str, output_path: str, use_video_model: bool = False,
+                            size: str = "1024x1920", anchor: str = "", style: str = "") -> APIResponse:
+        """
+        生成图片 / 视频并下载到 output_path
+        先查素材库（模型 + 尺寸 + 提示词相同直接复用，不调用接口），生成成功后写入素材库；
+        视频见 iter_generate_video_files（单个分镜不生成回退图片）
+        
+        Returns:
+            APIResponse，data 为 output_path
+        """
+        if use_video_model:
+            for _, response in self.iter_generate_video_files([(prompt, output_path)], anchor=anchor,
+                                                              style=style, fallback_size=None):
+                return response
+        
+        model = "cogview-4"
+        store = get_media_store()
+        key = media_key(model, size, prompt)
+        if store.fetch(key, output_path):
+            return APIResponse(success=True, data=output_path)
+        
+        response = self.generate_image(prompt, size)
+        if not response.success:
+            return response
+        try:
+            media_url = response.data["data"][0]["url"]
+        except (KeyError, IndexError, TypeError):
+            return APIResponse(success=False, error=f"响应中没有媒体URL: {response.data}",
+                               raw_response=response.raw_response)
+        
+        try:
+            self._transport.download(media_url, output_path, endpoint="zhipu:media-download", timeout=(10, 60))
+        except (requests.exceptions.RequestException, OSError) as e:
+            return APIResponse(success=False, error=f"下载媒体失败: {e}", raw_response=response.raw_response)
+        
+        store.store(key, output_path, model, size, prompt, anchor=anchor, style=style)
+        return APIResponse(success=True, data=output_path, raw_response=response.raw_response)
+    
+    def iter_batch(self, func, items: Sequence, max_concurrency: Optional[int] = None
+                   ) -> Iterator[Tuple[int, APIResponse]]:
+        """
+        并发执行 func(item)，按完成先后产出 (序号, APIResponse)
+        同时进行的请求数不超过 max_concurrency（默认配额中的并发数），单项异常记为失败，不影响其余项
+        """
+        if not items:
+            return
+        workers = max(1, min(max_concurrency or self.quota.max_concurrency, len(items)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zhipu-batch") as pool:
+            futures = {pool.submit(func, item): index for index, item in enumerate(items)}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = APIResponse(success=False, error=str(e))
+                    yield futures[future], result
+            finally:
+                # 调用方提前结束迭代时不再发出排队中的请求
+                for future in futures:
+                    future.cancel()
+    
+    def iter_generate_images(self, prompts: Sequence[str], size: str = "1024x1920",
+                             max_concurrency: Optional[int] = None) -> Iterator[Tuple[int, APIResponse]]:
+        """批量生成图片，按完成先后产出 (序号, APIResponse)"""
+        return self.iter_batch(lambda prompt: self.generate_image(prompt, size), list(prompts), max_concurrency)
+    
+    def iter_generate_media_files(self, items: Sequence[Tuple[str, str]], use_video_model: bool = False,
+                                  size: str = "1024x1920", max_concurrency: Optional[int] = None
+                                  ) -> Iterator[Tuple[int, APIResponse]]:
+        """
+        批量生成并下载（见 generate_media_file），按完成先后产出 (序号, APIResponse)
+        
+        Args:
+            items: [(提示词, 输出路径)]
+        """
+        if use_video_model:
+            return self.iter_generate_video_files(items, fallback_size=size, max_concurrency=max_concurrency)
+        return self.iter_batch(
+            lambda item: self.generate_media_file(item[0], item[1], use_video_model, size),
+            list(items), max_concurrency
+        )
+    
+    def iter_generate_video_files(self, items: Sequence[Tuple[str, str]], anchor: str = "", style: str = "",
+                                  fallback_size: Optional[str] = "1024x1920",
+                                  max_concurrency: Optional[int] = None) -> Iterator[Tuple[int, APIResponse]]:
+        """
+        批量生成视频，按完成先后产出 (序号, APIResponse)，data 为实际生成的文件路径
+        素材库未命中的分镜一次性提交为同一批 CogVideoX 任务（一个事件循环与连接池，提交经配额令牌桶限流）；
+        同时在后台并发生成静态图片，视频失败 / 超时的分镜回退到图片（与输出路径同名的 .jpg）
+        
+        Args:
+            items: [(提示词, 视频输出路径)]
+            fallback_size: 回退图片的尺寸，None 表示不生成回退图片
+        """
+        store = get_media_store()
+        items = list(items)
+        jobs: List[VideoJob] = []
+        for index, (prompt, output_path) in enumerate(items):
+            if store.fetch(media_key("cogvideox-3", "", prompt), output_path):
+                yield index, APIResponse(success=True, data=output_path)
+            else:
+                jobs.append(VideoJob(index=index, prompt=prompt, output_path=output_path))
+        if not jobs:
+            return
+        
+        finished: "queue.Queue[VideoJob]" = queue.Queue()
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="zhipu-video") as pool:
+            stills = None
+            if fallback_size is not None:
+                still_items = [(job.prompt, f"{os.path.splitext(job.output_path)[0]}.jpg") for job in jobs]
+                stills = pool.submit(lambda: dict(self.iter_generate_media_files(
+                    still_items, False, fallback_size, max_concurrency)))
+            videos = pool.submit(run_video_jobs_sync, self._api_key, jobs, base_url=self._base_url,
+                                 on_done=finished.put, limiter=zhipu_rate_limiter(self._api_key, self.quota))
+            
+            def completed():
+                while not videos.done() or not finished.empty():
+                    try:
+                        yield finished.get(timeout=0.5)
+                    except queue.Empty:
+                        continue
+            
+            for job in completed():
+                if job.succeeded:
+                    store.store(media_key("cogvideox-3", "", job.prompt), job.output_path, "cogvideox-3", "",
+                                job.prompt, anchor=anchor, style=style)
+                    yield job.index, APIResponse(success=True, data=job.output_path)
+            videos.result()
+            still_results = stills.result() if stills is not None else {}
+        
+        for k, job in enumerate(jobs):
+            still = still_results.get(k)
+            if job.succeeded:
+                # 视频可用，回退用的静态图片不再需要（素材库中仍有保存）
+                if still is not None and still.success and os.path.exists(still.data):
+                    os.remove(still.data)
+            elif still is not None and still.success:
+                print(f"⚠️ 分镜 {job.index+1} 视频未生成（{job.error}），回退到静态图片")
+                yield job.index, still
+            else:
+                yield job.index, APIResponse(success=False, error=f"视频生成失败: {job.error}")
     
     def batch_generate_images(self, prompts: List[str], 
-                              size: str = "1024x1920") -> List[APIResponse]:
-        """批量生成图片"""
-        results = []
-        for prompt in prompts:
-            result = self.generate_image(prompt, size)
-            results.append(result)
+                              size: str = "1024x1920",
+                              max_concurrency: Optional[int] = None) -> List[APIResponse]:
+        """
+        批量生成图片（并发 + 限流 + 重试）
+        
+        Returns:
+            与 prompts 一一对应的结果；部分失败时其余结果照常返回，调用方可用已成功的部分继续渲染
+        """
+        results: List[Optional[APIResponse]] = [None] * len(prompts)
+        for index, result in self.iter_generate_images(prompts, size, max_concurrency):
+            results[index] = result
         return results
 
 
@@ -191,8 +403,10 @@ class TianapiClient(APIClient):
     def get_douyin_hot(self) -> APIResponse:
         """获取抖音热搜榜"""
         try:
-            response = self._session.post(
+            response = self._transport.post(
                 f"{self._base_url}/douyinhot/index",
+                endpoint="tianapi:douyinhot",
+                retry=DEFAULT_RETRY,                # 热搜查询无副作用，按幂等请求重试
                 data={"key": self._api_key},
                 headers=self._get_headers(),
                 timeout=10
@@ -211,8 +425,10 @@ class TianapiClient(APIClient):
     def get_weibo_hot(self) -> APIResponse:
         """获取微博热搜榜"""
         try:
-            response = self._session.post(
+            response = self._transport.post(
                 f"{self._base_url}/weibohot/index",
+                endpoint="tianapi:weibohot",
+                retry=DEFAULT_RETRY,                # 热搜查询无副作用，按幂等请求重试
                 data={"key": self._api_key},
                 headers=self._get_headers(),
                 timeout=10
@@ -238,7 +454,7 @@ class PexelsClient:
     def __init__(self, api_key: str):
         self._api_key = api_key
         self._base_url = "https://api.pexels.com"
-        self._session = requests.Session()
+        self._transport = get_transport()
     
     def search_videos(self, query: str, per_page: int = 5, 
                       orientation: str = "portrait") -> APIResponse:
@@ -251,8 +467,9 @@ class PexelsClient:
         }
         
         try:
-            response = self._session.get(
+            response = self._transport.get(
                 f"{self._base_url}/videos/search",
+                endpoint="pexels:videos/search",
                 headers=headers,
                 params=params,
                 timeout=10
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP 传输层 - 所有外部 API 共用的连接池、超时、重试与指标
+进程内只有一个 requests 会话，按主机保持 keep-alive 连接池，热搜这类短请求不再每次重新 TLS 握手；
+GET 等幂等请求对限流、服务端错误与网络异常按统一的 RetryPolicy 重试（遵循 Retry-After），
+POST 默认只重试限流（429）：超时或 5xx 时服务端可能已受理，重发会产生重复计费的生成；
+每个端点记录调用次数、重试、错误与耗时分位数，便于定位慢接口。
+OpenAI SDK 客户端按 (API Key, base_url) 缓存复用，其内部连接池随之复用，重试沿用 SDK 默认策略。
+
+说明：requests 只支持 HTTP/1.1，连接复用依靠 keep-alive；OpenAI SDK 自带的 HTTP 客户端按其自身能力协商协议。
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Deque, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .primitives import NO_RETRY, RetryPolicy, TokenBucket, percentile
+
+TimeoutSpec = Union[float, Tuple[float, float]]
+
+# 幂等请求的默认重试：限流 / 服务端错误 / 网络异常
+DEFAULT_RETRY = RetryPolicy()
+# 非幂等请求（POST）的默认重试：只重试明确未受理的限流响应
+POST_RETRY = RetryPolicy(retry_statuses=(429,), retry_network_errors=False)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+@dataclass(frozen=True)
+class TransportSettings:
+    """传输层参数"""
+    connect_timeout: float = 10.0           # 建连超时（秒）
+    read_timeout: float = 60.0              # 默认读取超时（秒）
+    llm_timeout: float = 180.0              # OpenAI SDK 客户端（长文本生成）的超时（秒）
+    pool_hosts: int = 16                    # 保持连接池的主机数
+    pool_maxsize: int = 16                  # 每个主机的最大连接数
+    retry: RetryPolicy = DEFAULT_RETRY          # 幂等请求（GET 等）
+    post_retry: RetryPolicy = POST_RETRY        # 非幂等请求（POST 等）
+    latency_samples: int = 200              # 每个端点保留的耗时样本数
+
+
+DEFAULT_TRANSPORT_SETTINGS = TransportSettings()
+
+
+@dataclass
+class EndpointMetrics:
+    """单个端点的调用统计"""
+    calls: int = 0                  # 逻辑调用次数（含重试只计一次）
+    attempts: int = 0               # 实际发出的请求数
+    retries: int = 0
+    errors: int = 0                 # 最终失败（网络异常或 HTTP 状态 >= 400）的调用数
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=200))   # 每次调用的总耗时（秒）
+
+    @property
+    def p50(self) -> float:
+        return percentile(self.latencies, 50)
+
+    @property
+    def p95(self) -> float:
+        return percentile(self.latencies, 95)
+
+
+class HttpTransport:
+    """
+    共享 HTTP 传输层
+    request() 负责超时补全、限流、重试与指标；响应的状态码由调用方自行检查（raise_for_status 等）。
+    """
+
+    def __init__(self, settings: TransportSettings = DEFAULT_TRANSPORT_SETTINGS):
+        self.settings = settings
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=settings.pool_hosts, pool_maxsize=settings.pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._metrics: Dict[str, EndpointMetrics] = {}
+        self._metrics_lock = threading.Lock()
+
+    def _timeout(self, timeout: Optional[TimeoutSpec]) -> Tuple[float, float]:
+        if timeout is None:
+            return self.settings.connect_timeout, self.settings.read_timeout
+        if isinstance(timeout, tuple):
+            return timeout
+        return min(self.settings.connect_timeout, timeout), timeout
+
+    def request(self, method: str, url: str, *, endpoint: Optional[str] = None,
+                retry: Optional[RetryPolicy] = None, limiter: Optional[TokenBucket] = None,
+                timeout: Optional[TimeoutSpec] = None, **kwargs) -> requests.Response:
+        """
+        发送请求
+
+        Args:
+            method: HTTP 方法
+            url: 完整 URL
+            endpoint: 指标中的端点名（默认 主机 + 路径）
+            retry: 重试策略（默认幂等方法用 settings.retry，其余用 settings.post_retry；NO_RETRY 关闭重试）
+            limiter: 提供时每次请求（含重试）先取令牌
+            timeout: 秒数（作为读取超时，建连超时取默认值与其较小者）或 (建连, 读取)
+            **kwargs: 透传给 requests（json / data / params / headers / stream 等）
+
+        Returns:
+            最后一次请求的响应（可能是重试耗尽后的错误状态）
+
+        Raises:
+            requests.RequestException：网络异常且重试耗尽
+        """
+        if retry is None:
+            retry = self.settings.retry if method.upper() in IDEMPOTENT_METHODS else self.settings.post_retry
+        if endpoint is None:
+            parts = urlsplit(url)
+            endpoint = f"{parts.netloc}{parts.path}"
+        timeout = self._timeout(timeout)
+
+        start = time.monotonic()
+        attempts = 0
+        try:
+            for attempt in range(retry.max_attempts):
+                last = attempt == retry.max_attempts - 1
+                if limiter is not None:
+                    limiter.acquire()
+                attempts += 1
+                try:
+                    response = self.session.request(method, url, timeout=timeout, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    if last or not retry.retry_network_errors:
+                        raise
+                    time.sleep(retry.delay(attempt))
+                    continue
+                if not last and response.status_code in retry.retry_statuses:
+                    response.close()
+                    time.sleep(retry.delay(attempt, response))
+                    continue
+                self._record(endpoint, start, attempts, response.status_code >= 400)
+                return response
+        except requests.exceptions.RequestException:
+            self._record(endpoint, start, attempts, True)
+            raise
+        raise AssertionError("unreachable")
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def download(self, url: str, output_path: str, *, endpoint: Optional[str] = None,
+                 timeout: Optional[TimeoutSpec] = None, chunk_size: int = 1 << 16, **kwargs) -> int:
+        """
+        流式下载到文件（先写临时文件，完成后原子替换，失败时不留下半个文件）
+
+        Returns:
+            写入的字节数
+
+        Raises:
+            requests.RequestException / OSError
+        """
+        tmp = f"{output_path}.part"
+        written = 0
+        try:
+            with self.get(url, endpoint=endpoint, timeout=timeout, stream=True, **kwargs) as response:
+                response.raise_for_status()
+                with open(tmp, "wb") as f:
+                    for chunk in response.iter_content(chunk_size):
+                        f.write(chunk)
+                        written += len(chunk)
+            os.replace(tmp, output_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return written
+
+    # ---------- 指标 ----------
+
+    def _record(self, endpoint: str, start: float, attempts: int, error: bool) -> None:
+        with self._metrics_lock:
+            metrics = self._metrics.get(endpoint)
+            if metrics is None:
+                metrics = self._metrics[endpoint] = EndpointMetrics(
+                    latencies=deque(maxlen=self.settings.latency_samples))
+            metrics.calls += 1
+            metrics.attempts += attempts
+            metrics.retries += max(0, attempts - 1)
+            metrics.errors += int(error)
+            metrics.latencies.append(time.monotonic() - start)
+
+    def metrics(self) -> Dict[str, EndpointMetrics]:
+        """各端点指标的快照"""
+        with self._metrics_lock:
+            return {name: EndpointMetrics(m.calls, m.attempts, m.retries, m.errors, deque(m.latencies))
+                    for name, m in self._metrics.items()}
+
+    def metrics_summary(self) -> List[str]:
+        """每个端点一行中文摘要（按调用次数降序）"""
+        lines = []
+        for name, m in sorted(self.metrics().items(), key=lambda item: -item[1].calls):
+            line = f"{name}: 调用 {m.calls} 次，耗时 p50 {m.p50:.2f}s / p95 {m.p95:.2f}s"
+            if m.retries:
+                line += f"，重试 {m.retries}"
+            if m.errors:
+                line += f"，失败 {m.errors}"
+            lines.append(line)
+        return lines
+
+    def reset_metrics(self) -> None:
+        with self._metrics_lock:
+            self._metrics.clear()
+
+
+@lru_cache(maxsize=1)
+def get_transport() -> HttpTransport:
+    """获取进程内共享的 HTTP 传输层"""
+    return HttpTransport()
+
+
+_openai_clients: Dict[Tuple[str, str], object] = {}
+_openai_clients_lock = threading.Lock()
+
+
+def get_openai_client(api_key: str, base_url: str = "https://api.deepseek.com/v1"):
+    """
+    获取（缓存的）OpenAI SDK 客户端，同一 (API Key, base_url) 复用同一个实例及其连接池
+    超时与传输层保持一致；保留 SDK 默认的重试（2 次，含 429 / 5xx / 网络异常）：
+    剧本 / 润色这类文本请求按 token 计费，超时后重发最多多付一次文本生成，远比整步失败划算
+    """
+    key = (api_key, base_url)
+    with _openai_clients_lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            from openai import OpenAI
+            settings = get_transport().settings
+            client = OpenAI(api_key=api_key, base_url=base_url, timeout=settings.llm_timeout)
+            _openai_clients[key] = client
+        return client
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+生成素材库 - 按提示词寻址的持久化图片 / 视频缓存
+键为 (模型, 尺寸, 最终提示词, 种子) 的哈希，命中时直接复制出文件，不再调用付费生成接口。
+每条记录带元数据（提示词、视觉锚点、风格、感知哈希）；文件按内容摘要存放，内容完全相同的素材共用同一个文件。
+总大小超限时按最近使用时间淘汰条目，无人引用的文件随之删除（LRU）。
+只改字幕等不影响画面的修改后重新渲染，图片阶段零调用、零等待。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from threading import Lock
+from typing import Dict, Optional, Set
+
+from .primitives import atomic_place
+
+# 缓存目录与容量可通过环境变量覆盖
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "videotaxi", "media")
+DEFAULT_MAX_MB = 2048
+
+_ENTRY_VERSION = 1
+
+
+def media_key(model: str, size: str, prompt: str, seed: Optional[int] = None) -> str:
+    """
+    计算素材键
+
+    Args:
+        model: 生成模型（cogview-4 / cogvideox-3）
+        size: 输出尺寸（接口未指定尺寸时传空字符串）
+        prompt: 发给接口的最终提示词（build_master_image_prompt 的结果）
+        seed: 随机种子（接口不支持时为 None）
+
+    Returns:
+        sha256 十六进制字符串
+    """
+    payload = json.dumps([model, size or "", prompt, seed], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def perceptual_hash(path: str) -> Optional[str]:
+    """
+    图片的感知哈希：64 位差值哈希（dHash，缩到 9x8 灰度后比较相邻像素明暗）+ 平均 RGB
+    只作为记录的元数据（便于排查相似画面），不参与去重：不同提示词的画面即使相似也各自保留
+
+    Returns:
+        22 位十六进制字符串（前 16 位 dHash，后 6 位平均颜色）；不是图片时返回 None
+    """
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            rgb = img.convert("RGB")
+            pixels = list(rgb.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+            mean = rgb.resize((1, 1), Image.BOX).getpixel((0, 0))
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{bits:016x}{mean[0]:02x}{mean[1]:02x}{mean[2]:02x}"
+
+
+@dataclass
+class MediaEntry:
+    """素材库中的一条记录"""
+    key: str
+    blob: str                       # 文件名（位于 blobs/ 下，可被多条记录共用）
+    model: str
+    size: str
+    prompt: str
+    seed: Optional[int] = None
+    anchor: str = ""                # 视觉锚点
+    style: str = ""                 # 风格描述
+    phash: Optional[str] = None     # 感知哈希（仅图片，元数据）
+    width: int = 0
+    height: int = 0
+    bytes: int = 0
+    created: float = 0.0
+
+
+class MediaStore:
+    """
+    生成素材库
+    记录按 <root>/entries/<键前两位>/<键>.json 存放，文件按 <root>/blobs/<内容摘要>.<扩展名> 存放；
+    命中时刷新记录的 mtime 作为 LRU 依据。
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        """
+        Args:
+            root: 素材库目录
+            max_bytes: 文件总大小上限（字节）
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+        self._entries: Optional[Dict[str, MediaEntry]] = None    # 首次访问时扫描一次
+        self._refs: Dict[str, Set[str]] = {}                       # 文件名 -> 引用它的键
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.deduped = 0            # 内容与已有文件完全相同、直接共用的次数
+
+    # ---------- 路径 ----------
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.root, "entries", key[:2], f"{key}.json")
+
+    def blob_path(self, blob: str) -> str:
+        return os.path.join(self.root, "blobs", blob)
+
+    # ---------- 查询 ----------
+
+    def get(self, key: str) -> Optional[MediaEntry]:
+        """查找记录（文件缺失的记录视为不存在）"""
+        with self._lock:
+            entry = self._index().get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(self.blob_path(entry.blob)):
+                self._drop(key)
+                return None
+            return entry
+
+    def lookup(self, key: str) -> Optional[str]:
+        """查找素材，命中时返回库中文件路径并刷新使用时间"""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        try:
+            os.utime(self._entry_path(key))
+        except OSError:
+            pass
+        return self.blob_path(entry.blob)
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """命中时把素材复制到 output_path（调用方可随意删除或覆盖该文件）"""
+        path = self.lookup(key)
+        if path is None:
+            self.misses += 1
+            return False
+        try:
+            atomic_place(path, output_path)
+        except OSError as e:
+            print(f"⚠️ 素材库读取失败: {e}")
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    # ---------- 写入 ----------
+
+    def store(self, key: str, source_path: str, model: str, size: str, prompt: str,
+              seed: Optional[int] = None, anchor: str = "", style: str = "") -> Optional[MediaEntry]:
+        """
+        把生成好的素材写入库（原子替换，写入后按需淘汰）
+        内容摘要与库中已有文件相同时，新记录直接指向该文件。
+
+        Returns:
+            MediaEntry；源文件无效或写入失败时返回 None
+        """
+        try:
+            size_bytes = os.path.getsize(source_path)
+        except OSError:
+            return None
+        if size_bytes == 0:
+            return None
+
+        extension = os.path.splitext(source_path)[1].lower()
+        phash = perceptual_hash(source_path)
+        width = height = 0
+        if phash is not None:
+            from PIL import Image
+            with Image.open(source_path) as img:
+                width, height = img.size
+
+        entry = MediaEntry(key=key, blob="", model=model, size=size or "", prompt=prompt, seed=seed,
+                           anchor=anchor or "", style=style or "", phash=phash,
+                           width=width, height=height, bytes=size_bytes, created=time.time())
+        with self._lock:
+            index = self._index()
+            try:
+                entry.blob = f"{_file_digest(source_path)}{extension}"
+                blob_path = self.blob_path(entry.blob)
+                if os.path.exists(blob_path):
+                    self.deduped += 1
+                else:
+                    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                    atomic_place(source_path, blob_path)
+                    self._size += size_bytes
+                self._write_entry(entry)
+            except OSError as e:
+                print(f"⚠️ 素材库写入失败: {e}")
+                return None
+
+            previous = index.get(key)
+            index[key] = entry
+            self._refs.setdefault(entry.blob, set()).add(key)
+            if previous is not None and previous.blob != entry.blob:
+                self._release(previous.blob, key)
+            if self._size > self.max_bytes:
+                self._evict()
+        return entry
+
+    def _write_entry(self, entry: MediaEntry) -> None:
+        path = self._entry_path(entry.key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = asdict(entry)
+        data["version"] = _ENTRY_VERSION
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    # ---------- 索引与淘汰（调用方持有锁） ----------
+
+    def _index(self) -> Dict[str, MediaEntry]:
+        if self._entries is None:
+            self._entries = {}
+            self._refs = {}
+            entries_dir = os.path.join(self.root, "entries")
+            for sub in os.listdir(entries_dir) if os.path.isdir(entries_dir) else []:
+                sub_dir = os.path.join(entries_dir, sub)
+                if not os.path.isdir(sub_dir):
+                    continue
+                for name in os.listdir(sub_dir):
+                    if not name.endswith(".json"):
+                        continue
+                    try:
+                        with open(os.path.join(sub_dir, name), encoding="utf-8") as f:
+                            data = json.load(f)
+                        if data.pop("version", None) != _ENTRY_VERSION:
+                            continue
+                        entry = MediaEntry(**data)
+                    except (OSError, ValueError, TypeError):
+                        continue
+                    self._entries[entry.key] = entry
+                    self._refs.setdefault(entry.blob, set()).add(entry.key)
+            self._size = 0
+            for blob in self._refs:
+                try:
+                    self._size += os.path.getsize(self.blob_path(blob))
+                except OSError:
+                    pass
+        return self._entries
+
+    def _release(self, blob: str, key: str) -> None:
+        """解除记录对文件的引用，文件无人引用时删除"""
+        refs = self._refs.get(blob)
+        if refs is None:
+            return
+        refs.discard(key)
+        if not refs:
+            del self._refs[blob]
+            try:
+                self._size -= os.path.getsize(self.blob_path(blob))
+                os.remove(self.blob_path(blob))
+            except OSError:
+                pass
+
+    def _drop(self, key: str) -> None:
+        """删除记录（及无人引用的文件）"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._release(entry.blob, key)
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """按记录的最近使用时间从旧到新删除，直到总大小回到上限的 90%"""
+        def last_used(key):
+            try:
+                return os.path.getmtime(self._entry_path(key))
+            except OSError:
+                return 0.0
+
+        target = int(self.max_bytes * 0.9)
+        for key in sorted(self._entries, key=last_used):
+            if self._size <= target:
+                break
+            self._drop(key)
+
+    def clear(self) -> None:
+        """清空素材库"""
+        with self._lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self._entries = {}
+            self._refs = {}
+            self._size = 0
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def get_media_store() -> MediaStore:
+    """
+    获取进程内共享的生成素材库
+    环境变量 VIDEOTAXI_MEDIA_STORE_DIR / VIDEOTAXI_MEDIA_STORE_MB 可覆盖目录与容量
+    """
+    root = os.environ.get("VIDEOTAXI_MEDIA_STORE_DIR", DEFAULT_STORE_DIR)
+    max_mb = int(os.environ.get("VIDEOTAXI_MEDIA_STORE_MB", DEFAULT_MAX_MB))
+    return MediaStore(root, max_mb * 1024 * 1024)
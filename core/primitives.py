@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+公共原语 - 重试策略、令牌桶、百分位数、原子文件替换
+HTTP 传输层、智谱生成配额、视频任务轮询、TTS 调度器与各类文件缓存共用同一份实现。
+"""
+
+import asyncio
+import math
+import os
+import random
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional, Sequence, Tuple
+
+
+def retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头（秒数或 HTTP 日期）
+
+    Returns:
+        需要等待的秒数（不小于 0）；没有该响应头或无法解析时返回 None
+    """
+    value = headers.get("Retry-After") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """可重试错误（限流 / 服务端错误 / 网络异常）的重试策略"""
+    max_attempts: int = 3                                   # 含首次请求
+    base_delay: float = 1.0                                 # 首次重试的退避上限（秒）
+    max_delay: float = 30.0                                 # 退避上限（秒），也限制 Retry-After
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+    # 网络异常 / 超时是否重试：请求可能已被服务端受理，计费类的非幂等请求应关闭
+    retry_network_errors: bool = True
+
+    def backoff(self, retry: int) -> float:
+        """第 retry 次重试（从 0 计）前的等待：U(0, min(max_delay, base_delay·2^retry))"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def delay(self, retry: int, response=None) -> float:
+        """重试前的等待：响应（requests / aiohttp 均可）带 Retry-After 时按其指示，否则全抖动指数退避"""
+        wait = retry_after(getattr(response, "headers", None))
+        if wait is not None:
+            return min(self.max_delay, wait)
+        return self.backoff(retry)
+
+
+# 不重试
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+class TokenBucket:
+    """
+    令牌桶（线程安全，不绑定事件循环）
+    先预约令牌（可透支），再等待到令牌可用的时刻，等待期间不占锁。
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """预约一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        """取一个令牌（阻塞当前线程）"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """取一个令牌（在事件循环中等待）"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """最近秩百分位数（q 取 0-100，空序列返回 0）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def atomic_place(source: str, target: str) -> None:
+    """
+    把 source 的内容原子地复制到 target：同目录临时文件 + os.replace
+    不用硬链接：TTS 引擎与分镜生成都会覆盖写输出路径，共享 inode 会破坏缓存
+    """
+    directory = os.path.dirname(os.path.abspath(target))
+    tmp = os.path.join(directory, f".{os.path.basename(target)}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+CogVideoX 视频生成任务客户端 - 提交 → 轮询 → 下载
+智谱视频生成是异步任务：POST videos/generations 返回任务 ID，再轮询 async-result/{id} 取结果。
+所有分镜的任务一次性提交，在同一个连接池上按自适应间隔轮询，完成一个下载一个；
+整批受总截止时间约束，超时或失败的分镜由调用方回退到静态图片。
+提交不因网络异常重试（避免重复计费）；轮询无副作用，服务端错误与网络异常按退避重试直到截止时间。
+整批耗时约等于一个任务的生成时间，而不是逐个分镜累加。
+"""
+
+import asyncio
+import os
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import aiohttp
+
+from .primitives import RetryPolicy, TokenBucket, retry_after
+
+ZHIPU_BASE_URL = "https://open.bigmodel.cn/api/paas/v4"
+
+# 轮询遇到服务端错误 / 网络异常 / 超时时的退避（次数不限，由整批截止时间兜底；429 另按 Retry-After 处理）
+DEFAULT_POLL_RETRY = RetryPolicy(base_delay=2.0, max_delay=20.0, retry_statuses=(500, 502, 503, 504))
+
+
+@dataclass(frozen=True)
+class VideoJobSettings:
+    """任务提交 / 轮询参数"""
+    model: str = "cogvideox-3"
+    deadline: float = 600.0             # 整批截止时间（秒），到时未完成的分镜回退
+    poll_initial: float = 5.0           # 首次轮询前的等待（秒）
+    poll_min: float = 2.0               # 轮询间隔下限（秒）
+    poll_max: float = 20.0              # 轮询间隔上限（秒）
+    poll_backoff: float = 1.5           # 没有耗时样本时每次轮询间隔的增长倍数
+    request_timeout: float = 30.0       # 单次提交 / 轮询请求超时（秒）
+    max_throttle_retries: int = 5       # 单次提交 / 轮询遇到限流（429）时的最多重试次数
+    poll_retry: RetryPolicy = DEFAULT_POLL_RETRY    # 轮询的瞬时错误重试（任务已提交计费，不能轻易放弃）
+    download_timeout: float = 120.0     # 单个视频下载超时（秒）
+    max_downloads: int = 4              # 同时下载数
+    max_connections: int = 8            # 连接池大小
+
+
+DEFAULT_VIDEO_JOB_SETTINGS = VideoJobSettings()
+
+
+@dataclass
+class VideoJob:
+    """一个分镜的视频生成任务"""
+    index: int
+    prompt: str
+    output_path: str
+    image_url: Optional[str] = None     # 图生视频的首帧（可选）
+    task_id: Optional[str] = None
+    status: str = "pending"             # pending / processing / success / failed / timeout
+    error: Optional[str] = None
+    elapsed: float = 0.0                # 提交到下载完成的耗时（秒）
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == "success"
+
+
+class VideoJobError(Exception):
+    """任务提交 / 轮询 / 下载失败（HTTP 错误时 status 为状态码）"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CogVideoClient:
+    """
+    CogVideoX 任务客户端（在事件循环内使用）
+
+        async with CogVideoClient(api_key) as client:
+            await client.run(jobs)
+    """
+
+    def __init__(self, api_key: str, base_url: str = ZHIPU_BASE_URL,
+                 settings: VideoJobSettings = DEFAULT_VIDEO_JOB_SETTINGS,
+                 limiter: Optional[TokenBucket] = None):
+        """
+        Args:
+            limiter: 提供时每次提交（含限流重试）先取令牌，与同一 API Key 的其他生成请求共用配额
+        """
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.settings = settings
+        self.limiter = limiter
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._latencies: List[float] = []       # 已完成任务的提交→成功耗时，决定轮询节奏
+
+    async def __aenter__(self) -> "CogVideoClient":
+        connector = aiohttp.TCPConnector(limit=self.settings.max_connections)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+        )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request_json(self, method: str, url: str, action: str,
+                            limiter: Optional[TokenBucket] = None, **kwargs) -> dict:
+        """
+        发送请求并解析 JSON 响应
+        限流（429）时按 Retry-After 等待后重试，最多 max_throttle_retries 次，之后按失败处理
+        """
+        timeout = aiohttp.ClientTimeout(total=self.settings.request_timeout)
+        for retry in range(self.settings.max_throttle_retries + 1):
+            if limiter is not None:
+                await limiter.acquire_async()
+            async with self._session.request(method, url, timeout=timeout, **kwargs) as response:
+                throttled = response.status == 429 and retry < self.settings.max_throttle_retries
+                if throttled:
+                    wait = retry_after(response.headers)
+                    if wait is None:
+                        wait = self.settings.poll_min
+                elif response.status >= 400:
+                    # 网关错误页多为 HTML，按文本读取
+                    body = await response.text()
+                    raise VideoJobError(f"{action}失败 (HTTP {response.status}): {body[:200]}",
+                                        status=response.status)
+                else:
+                    return await response.json(content_type=None)
+            await asyncio.sleep(wait)
+
+    async def submit(self, job: VideoJob) -> str:
+        """提交任务，返回任务 ID"""
+        payload = {"model": self.settings.model, "prompt": job.prompt}
+        if job.image_url:
+            payload["image_url"] = job.image_url
+        data = await self._request_json("POST", f"{self.base_url}/videos/generations", "任务提交",
+                                        limiter=self.limiter, json=payload)
+        if not data.get("id"):
+            raise VideoJobError(f"任务提交失败: {data}")
+        return data["id"]
+
+    async def poll(self, task_id: str) -> dict:
+        """
+        查询一次任务状态
+        限流时按 Retry-After 等待后重试；轮询无副作用，服务端错误 / 网络异常 / 超时按 poll_retry 退避重试，
+        不设次数上限（整批截止时间到时由 run 取消）
+        """
+        url = f"{self.base_url}/async-result/{task_id}"
+        policy = self.settings.poll_retry
+        retry = 0
+        while True:
+            try:
+                return await self._request_json("GET", url, "任务查询")
+            except VideoJobError as e:
+                if e.status not in policy.retry_statuses:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if not policy.retry_network_errors:
+                    raise
+            await asyncio.sleep(policy.backoff(retry))
+            retry += 1
+
+    def poll_interval(self, elapsed: float, polls: int) -> float:
+        """
+        下一次轮询前的等待：有完成样本时朝预计完成时刻逼近（剩余时间的一半），
+        否则按倍数递增；都限制在 [poll_min, poll_max]
+        """
+        s = self.settings
+        if self._latencies:
+            remaining = statistics.median(self._latencies) - elapsed
+            interval = remaining / 2 if remaining > 0 else s.poll_min * s.poll_backoff ** min(polls, 8)
+        else:
+            interval = s.poll_initial * s.poll_backoff ** polls
+        return min(s.poll_max, max(s.poll_min, interval))
+
+    async def download(self, url: str, output_path: str) -> None:
+        """流式下载到文件（先写临时文件再原子替换）"""
+        tmp = f"{output_path}.part"
+        timeout = aiohttp.ClientTimeout(total=self.settings.download_timeout)
+        try:
+            async with self._session.get(url, timeout=timeout) as response:
+                if response.status >= 400:
+                    raise VideoJobError(f"视频下载失败 (HTTP {response.status})")
+                with open(tmp, "wb") as f:
+                    async for chunk in response.content.iter_chunked(1 << 16):
+                        f.write(chunk)
+            os.replace(tmp, output_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    async def _run_one(self, job: VideoJob, downloads: asyncio.Semaphore,
+                       on_done: Optional[Callable[[VideoJob], None]]) -> None:
+        start = time.monotonic()
+        try:
+            job.task_id = await self.submit(job)
+            job.status = "processing"
+            polls = 0
+            while True:
+                await asyncio.sleep(self.poll_interval(time.monotonic() - start, polls))
+                polls += 1
+                data = await self.poll(job.task_id)
+                status = data.get("task_status")
+                if status == "SUCCESS":
+                    results = data.get("video_result") or []
+                    if not results or not results[0].get("url"):
+                        raise VideoJobError(f"任务成功但没有视频地址: {data}")
+                    self._latencies.append(time.monotonic() - start)
+                    async with downloads:
+                        await self.download(results[0]["url"], job.output_path)
+                    job.status = "success"
+                    break
+                if status == "FAIL":
+                    raise VideoJobError(f"任务失败: {data}")
+        except asyncio.CancelledError:
+            job.status = "timeout"
+            job.error = f"超过截止时间（{self.settings.deadline:.0f}秒）"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.elapsed = time.monotonic() - start
+        if on_done is not None:
+            on_done(job)
+
+    async def run(self, jobs: List[VideoJob],
+                  on_done: Optional[Callable[[VideoJob], None]] = None) -> List[VideoJob]:
+        """
+        一次性提交所有任务并等待完成（整批受 deadline 约束）
+
+        Args:
+            jobs: 任务列表（原地更新状态）
+            on_done: 每个任务成功或失败后回调（超时的任务不回调，由调用方按状态处理）
+
+        Returns:
+            jobs
+        """
+        if not jobs:
+            return jobs
+        downloads = asyncio.Semaphore(self.settings.max_downloads)
+        tasks = [asyncio.ensure_future(self._run_one(job, downloads, on_done)) for job in jobs]
+        _, pending = await asyncio.wait(tasks, timeout=self.settings.deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        return jobs
+
+
+def run_video_jobs_sync(api_key: str, jobs: List[VideoJob],
+                        settings: VideoJobSettings = DEFAULT_VIDEO_JOB_SETTINGS,
+                        base_url: str = ZHIPU_BASE_URL,
+                        on_done: Optional[Callable[[VideoJob], None]] = None,
+                        limiter: Optional[TokenBucket] = None) -> List[VideoJob]:
+    """run 的同步入口（整批只创建一次事件循环与连接池；limiter 见 CogVideoClient）"""
+    async def main():
+        async with CogVideoClient(api_key, base_url, settings, limiter) as client:
+            return await client.run(jobs, on_done)
+    return asyncio.run(main())
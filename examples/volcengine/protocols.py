@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+bidirection.py 使用的协议函数（实现位于 voices/volc_protocols.py）
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from voices.volc_protocols import *  # noqa: E402,F401,F403
+from voices.volc_protocols import __all__  # noqa: E402,F401
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+VideoTaxi 渲染内核 - 面向对象架构
+为 video_engine 提供高性能的运镜、合成与编码组件
+"""
+
+from .motion import (
+    MotionCurve, MotionEngine, AffineWarper, AxisTable, PreparedSource,
+    PyramidLevel, build_axis_table, centered_position, sample_scale_range
+)
+from .segments import (
+    SegmentCodec, SceneSegmentJob, DEFAULT_SEGMENT_CODEC,
+    scene_transition_fades, render_segments_parallel
+)
+from .ffmpeg_tools import get_ffmpeg_binary, run_ffmpeg, concat_segments, mux_video_audio
+from .compositor import (
+    OverlayLayer, PremultipliedTile, SceneLayers, FrameCompositor, fade_factor,
+    premultiply_rgba, resolve_position
+)
+from .frame_writer import (
+    FFmpegFrameWriter, RenderStats, RssSampler, current_rss_mb, stream_frames
+)
+from .subtitles import (
+    SubtitleStyle, SubtitleRasterizer, GlyphMetrics, DEFAULT_SUBTITLE_STYLE,
+    get_glyph_metrics, get_subtitle_rasterizer
+)
+from .transitions import (
+    TransitionKernel, TransitionScratch, TRANSITION_KERNELS, TRANSITION_DURATIONS,
+    RadialZoomGrid, get_transition_kernel, get_radial_zoom_grid, gaussian_blur_rows,
+    zoom_blur_scale
+)
+from .profiles import (
+    RenderProfile, FINAL_PROFILE, DRAFT_PROFILE, RENDER_PROFILES, get_render_profile
+)
+from .graph import (
+    SceneNode, TransitionNode, AudioTrack, AudioMixNode, RenderGraph, GraphScheduler,
+    fit_transition_duration
+)
+from .dataflow import ReadyScene, SceneReadyBarrier
+from .audio import (
+    SAMPLE_RATE, CHANNELS, AudioTimeline, decode_audio, encode_audio, loop_to_length
+)
+from .audio_assets import AudioAssetCache, LOOP_CROSSFADE, get_audio_asset_cache, loop_extend
+from .mix import (
+    MixSettings, MixReport, DEFAULT_MIX_SETTINGS, voice_envelope, duck_gain_curve,
+    integrated_loudness, soft_limit, master_mix
+)
+
+__all__ = [
+    'MotionCurve',
+    'MotionEngine',
+    'AffineWarper',
+    'AxisTable',
+    'PreparedSource',
+    'PyramidLevel',
+    'build_axis_table',
+    'centered_position',
+    'sample_scale_range',
+    'SegmentCodec',
+    'SceneSegmentJob',
+    'DEFAULT_SEGMENT_CODEC',
+    'scene_transition_fades',
+    'render_segments_parallel',
+    'get_ffmpeg_binary',
+    'run_ffmpeg',
+    'concat_segments',
+    'mux_video_audio',
+    'OverlayLayer',
+    'PremultipliedTile',
+    'SceneLayers',
+    'FrameCompositor',
+    'fade_factor',
+    'premultiply_rgba',
+    'resolve_position',
+    'FFmpegFrameWriter',
+    'RenderStats',
+    'RssSampler',
+    'current_rss_mb',
+    'stream_frames',
+    'SubtitleStyle',
+    'SubtitleRasterizer',
+    'GlyphMetrics',
+    'DEFAULT_SUBTITLE_STYLE',
+    'get_glyph_metrics',
+    'get_subtitle_rasterizer',
+    'TransitionKernel',
+    'TransitionScratch',
+    'TRANSITION_KERNELS',
+    'TRANSITION_DURATIONS',
+    'get_transition_kernel',
+    'gaussian_blur_rows',
+    'RadialZoomGrid',
+    'get_radial_zoom_grid',
+    'zoom_blur_scale',
+    'SceneNode',
+    'TransitionNode',
+    'AudioTrack',
+    'AudioMixNode',
+    'RenderGraph',
+    'GraphScheduler',
+    'fit_transition_duration',
+    'RenderProfile',
+    'FINAL_PROFILE',
+    'DRAFT_PROFILE',
+    'RENDER_PROFILES',
+    'get_render_profile',
+    'ReadyScene',
+    'SceneReadyBarrier',
+    'SAMPLE_RATE',
+    'CHANNELS',
+    'AudioTimeline',
+    'decode_audio',
+    'encode_audio',
+    'loop_to_length',
+    'AudioAssetCache',
+    'LOOP_CROSSFADE',
+    'get_audio_asset_cache',
+    'loop_extend',
+    'MixSettings',
+    'MixReport',
+    'DEFAULT_MIX_SETTINGS',
+    'voice_envelope',
+    'duck_gain_curve',
+    'integrated_loudness',
+    'soft_limit',
+    'master_mix'
+]
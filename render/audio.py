@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+PCM 音频引擎 - 在采样级精确的时间线上用 NumPy 混音
+每个输入只经 ffmpeg 解码一次为统一采样率 / 声道的 float32 PCM，
+片段按采样点叠加到时间线缓冲区，停顿是真正的零采样，整条音轨最后只编码一次。
+"""
+
+import os
+import subprocess
+from typing import Dict, Optional
+
+import numpy as np
+
+from .ffmpeg_tools import get_ffmpeg_binary
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+# 按输出扩展名选择编码器
+_CODECS_BY_EXTENSION = {
+    ".wav": "pcm_s16le",
+    ".mp3": "libmp3lame",
+    ".m4a": "aac",
+    ".aac": "aac",
+}
+
+
+def decode_audio(path: str, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS) -> np.ndarray:
+    """
+    用一次 ffmpeg 调用把音频（或视频中的音轨）解码为 PCM
+
+    Args:
+        path: 音频 / 视频文件路径
+        sample_rate: 目标采样率
+        channels: 目标声道数
+
+    Returns:
+        (采样数, 声道数) float32 只读数组，取值范围约 [-1, 1]
+
+    Raises:
+        RuntimeError: ffmpeg 解码失败
+    """
+    cmd = [
+        get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-i", path, "-vn",
+        "-f", "f32le", "-acodec", "pcm_f32le", "-ac", str(channels), "-ar", str(sample_rate), "-",
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode("utf-8", errors="ignore").strip()
+        raise RuntimeError(f"音频解码失败 ({path}): {stderr[-500:]}")
+    usable = len(proc.stdout) - len(proc.stdout) % (4 * channels)
+    return np.frombuffer(proc.stdout[:usable], dtype=np.float32).reshape(-1, channels)
+
+
+def loop_to_length(pcm: np.ndarray, samples: int) -> np.ndarray:
+    """首尾相接循环（或截断）到指定采样数"""
+    if len(pcm) >= samples:
+        return pcm[:samples]
+    if len(pcm) == 0:
+        return np.zeros((samples, pcm.shape[1]), dtype=np.float32)
+    repeats = -(-samples // len(pcm))
+    return np.tile(pcm, (repeats, 1))[:samples]
+
+
+def encode_audio(pcm: np.ndarray, output_path: str, sample_rate: int = SAMPLE_RATE,
+                 codec: Optional[str] = None, bitrate: Optional[str] = None) -> str:
+    """
+    把 PCM 编码写入文件（超出 [-1, 1] 的采样硬限幅）
+
+    Args:
+        pcm: (采样数, 声道数) float32
+        output_path: 输出路径
+        sample_rate: 采样率
+        codec: 音频编码器（默认按扩展名：wav→pcm_s16le，mp3→libmp3lame，其余 aac）
+        bitrate: 码率（无损编码时忽略）
+
+    Returns:
+        输出路径
+
+    Raises:
+        RuntimeError: ffmpeg 编码失败
+    """
+    extension = os.path.splitext(output_path)[1].lower()
+    codec = codec or _CODECS_BY_EXTENSION.get(extension, "aac")
+    data = np.clip(pcm, -1.0, 1.0).astype(np.float32, copy=False)
+
+    cmd = [
+        get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "f32le", "-ar", str(sample_rate), "-ac", str(data.shape[1]), "-i", "-",
+        "-c:a", codec,
+    ]
+    if bitrate and not codec.startswith("pcm_"):
+        cmd += ["-b:a", bitrate]
+    cmd.append(output_path)
+    proc = subprocess.run(cmd, input=np.ascontiguousarray(data).tobytes(),
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode("utf-8", errors="ignore").strip()
+        raise RuntimeError(f"音频编码失败 (code={proc.returncode}): {stderr[-500:]}")
+    return output_path
+
+
+class AudioTimeline:
+    """
+    采样级时间线
+    place() 把片段按起点叠加到缓冲区，append() 从游标处顺序拼接；
+    同一文件在一条时间线中只解码一次。
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.cursor = 0                     # append 的写入位置（采样）
+        self.length = 0                     # 已使用的长度（采样）
+        self._buffer = np.zeros((0, channels), dtype=np.float32)
+        self._decoded: Dict[str, np.ndarray] = {}
+
+    @property
+    def duration(self) -> float:
+        return self.length / self.sample_rate
+
+    def to_samples(self, seconds: float) -> int:
+        return int(round(seconds * self.sample_rate))
+
+    def load(self, path: str) -> np.ndarray:
+        """解码文件（同一路径只解码一次）"""
+        pcm = self._decoded.get(path)
+        if pcm is None:
+            pcm = decode_audio(path, self.sample_rate, self.channels)
+            self._decoded[path] = pcm
+        return pcm
+
+    def _grow(self, capacity: int) -> None:
+        if capacity > len(self._buffer):
+            grown = np.zeros((max(capacity, 2 * len(self._buffer)), self.channels), dtype=np.float32)
+            grown[:self.length] = self._buffer[:self.length]
+            self._buffer = grown
+
+    def _reserve(self, end: int) -> None:
+        self._grow(end)
+        self.length = max(self.length, end)
+
+    def place_samples(self, pcm: np.ndarray, offset: int, gain: float = 1.0) -> int:
+        """
+        在采样位置 offset 处叠加片段
+
+        Returns:
+            片段结束位置（采样）
+        """
+        if offset < 0:
+            pcm = pcm[-offset:]
+            offset = 0
+        end = offset + len(pcm)
+        self._reserve(end)
+        target = self._buffer[offset:end]
+        if gain == 1.0:
+            target += pcm
+        elif gain != 0.0:
+            target += pcm * np.float32(gain)
+        return end
+
+    def place(self, pcm: np.ndarray, start: float = 0.0, gain: float = 1.0) -> int:
+        """在 start 秒处叠加片段，返回结束位置（采样）"""
+        return self.place_samples(pcm, self.to_samples(start), gain)
+
+    def append(self, pcm: np.ndarray, gain: float = 1.0) -> int:
+        """从游标处拼接片段并移动游标，返回新的游标位置"""
+        self.cursor = self.place_samples(pcm, self.cursor, gain)
+        return self.cursor
+
+    def append_silence(self, seconds: float) -> int:
+        """在游标处插入零采样停顿，返回新的游标位置"""
+        self.cursor += self.to_samples(seconds)
+        self._reserve(self.cursor)
+        return self.cursor
+
+    def render(self, duration: Optional[float] = None) -> np.ndarray:
+        """
+        取出混音结果
+
+        Args:
+            duration: 输出时长（秒），默认为已使用的长度；更长时补零、更短时截断
+        """
+        samples = self.length if duration is None else self.to_samples(duration)
+        self._grow(samples)
+        return self._buffer[:samples]
+
+    def write(self, output_path: str, duration: Optional[float] = None,
+              codec: Optional[str] = None, bitrate: Optional[str] = None) -> str:
+        """混音结果编码写入文件（见 encode_audio）"""
+        return encode_audio(self.render(duration), output_path, self.sample_rate, codec, bitrate)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+BGM / 音效解码缓存 - 进程内共享，按需加载
+每个素材只解码一次，PCM 落盘为 .npy 旁路文件后以内存映射方式读取，
+源文件 mtime / 大小变化即失效；目录列表按目录 mtime 缓存。
+批量任务反复使用同一批 BGM 时不再重复解码。
+"""
+
+import hashlib
+import os
+import uuid
+from functools import lru_cache
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .audio import CHANNELS, SAMPLE_RATE, decode_audio, loop_to_length
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "videotaxi", "pcm")
+
+# 循环接缝处的交叉淡化时长（秒）
+LOOP_CROSSFADE = 0.5
+
+
+def loop_extend(pcm: np.ndarray, samples: int, crossfade: int) -> np.ndarray:
+    """
+    循环延长到指定采样数，接缝处做等功率交叉淡化
+
+    第一遍原样播放（去掉末尾 crossfade 个采样），之后每一遍的开头与上一遍的尾部交叉淡化，
+    因此循环单元首尾相接处是连续的。
+
+    Args:
+        pcm: (采样数, 声道数) float32
+        samples: 目标采样数
+        crossfade: 交叉淡化采样数（最多取素材长度的一半）
+
+    Returns:
+        (samples, 声道数) float32；素材足够长时直接返回截取的视图
+    """
+    length = len(pcm)
+    if length >= samples:
+        return pcm[:samples]
+    crossfade = min(crossfade, length // 2)
+    if crossfade <= 0:
+        return loop_to_length(pcm, samples)
+
+    body = length - crossfade
+    t = (np.arange(crossfade, dtype=np.float32) + 0.5) / crossfade
+    fade_in = np.sin(t * (np.pi / 2))[:, None]
+    fade_out = np.cos(t * (np.pi / 2))[:, None]
+    unit = np.array(pcm[:body], dtype=np.float32)
+    unit[:crossfade] = pcm[:crossfade] * fade_in + pcm[body:] * fade_out
+
+    out = np.empty((samples, pcm.shape[1]), dtype=np.float32)
+    out[:body] = pcm[:body]
+    out[body:] = loop_to_length(unit, samples - body)
+    return out
+
+
+class AudioAssetCache:
+    """
+    解码后的 BGM / 音效缓存
+    旁路文件按 <root>/<路径哈希>_<采样率>_<声道>_<mtime>_<大小>.npy 存放，
+    同一素材的旧版本在写入新版本时删除；目录不可写时退化为仅内存缓存。
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, sample_rate: int = SAMPLE_RATE,
+                 channels: int = CHANNELS):
+        """
+        Args:
+            root: 旁路文件目录
+            sample_rate: 解码采样率
+            channels: 解码声道数
+        """
+        self.root = root
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._lock = Lock()
+        self._arrays: Dict[str, Tuple[Tuple[int, int], np.ndarray]] = {}
+        self._listings: Dict[Tuple[str, Tuple[str, ...]], Tuple[int, List[str]]] = {}
+        self.decodes = 0
+        self.hits = 0
+
+    def _sidecar_prefix(self, path: str) -> str:
+        digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+        return f"{digest}_{self.sample_rate}_{self.channels}_"
+
+    def load(self, path: str) -> np.ndarray:
+        """
+        获取素材的 PCM（只读，可能是内存映射）
+
+        Raises:
+            OSError: 文件不存在
+            RuntimeError: 解码失败
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._arrays.get(path)
+            if cached and cached[0] == version:
+                self.hits += 1
+                return cached[1]
+
+            prefix = self._sidecar_prefix(path)
+            sidecar = os.path.join(self.root, f"{prefix}{version[0]}_{version[1]}.npy")
+            pcm = self._open_sidecar(sidecar)
+            if pcm is None:
+                pcm = decode_audio(path, self.sample_rate, self.channels)
+                self.decodes += 1
+                pcm = self._write_sidecar(sidecar, prefix, pcm)
+            else:
+                self.hits += 1
+            self._arrays[path] = (version, pcm)
+            return pcm
+
+    def _open_sidecar(self, sidecar: str) -> Optional[np.ndarray]:
+        try:
+            return np.load(sidecar, mmap_mode="r").view(np.ndarray)
+        except (OSError, ValueError):
+            return None
+
+    def _write_sidecar(self, sidecar: str, prefix: str, pcm: np.ndarray) -> np.ndarray:
+        """写入旁路文件（原子替换）并删除同一素材的旧版本，返回内存映射后的数组"""
+        tmp = f"{sidecar}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(tmp, "wb") as f:
+                np.save(f, pcm)
+            os.replace(tmp, sidecar)
+        except OSError as e:
+            print(f"⚠️ 音频解码缓存写入失败: {e}")
+            return pcm
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        name = os.path.basename(sidecar)
+        for other in os.listdir(self.root):
+            if other.startswith(prefix) and other != name and other.endswith(".npy"):
+                try:
+                    os.remove(os.path.join(self.root, other))
+                except OSError:
+                    pass
+        return self._open_sidecar(sidecar) if os.path.exists(sidecar) else pcm
+
+    def loop(self, path: str, seconds: float, crossfade: float = LOOP_CROSSFADE) -> np.ndarray:
+        """
+        取素材并循环延长 / 截取到 seconds 秒（接缝交叉淡化，见 loop_extend）
+        """
+        pcm = self.load(path)
+        samples = int(round(seconds * self.sample_rate))
+        return loop_extend(pcm, samples, int(round(crossfade * self.sample_rate)))
+
+    def list_files(self, directory: str, extensions: Sequence[str] = (".mp3", ".wav")) -> List[str]:
+        """
+        列出目录下的音频文件名（按目录 mtime 缓存，目录不存在返回空列表）
+        """
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return []
+        key = (os.path.abspath(directory), tuple(extensions))
+        cached = self._listings.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        files = sorted(f for f in os.listdir(directory) if f.endswith(tuple(extensions)))
+        self._listings[key] = (mtime, files)
+        return files
+
+    def clear(self) -> None:
+        """清空内存缓存（旁路文件保留）"""
+        with self._lock:
+            self._arrays.clear()
+            self._listings.clear()
+
+
+@lru_cache(maxsize=1)
+def get_audio_asset_cache() -> AudioAssetCache:
+    """
+    获取进程内共享的 BGM / 音效缓存
+    环境变量 VIDEOTAXI_PCM_CACHE_DIR 可覆盖旁路文件目录
+    """
+    return AudioAssetCache(os.environ.get("VIDEOTAXI_PCM_CACHE_DIR", DEFAULT_CACHE_DIR))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+分镜数据流 - 素材边生成边渲染
+每个分镜等待自己的一组素材（画面、配音）全部到齐即进入就绪队列，
+下游合成 / 编码按就绪顺序逐个消费，不必等整批素材生成完毕。
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+
+
+@dataclass
+class ReadyScene:
+    """素材已到齐的分镜"""
+    index: int
+    assets: Dict[str, Optional[str]] = field(default_factory=dict)   # 素材类型 -> 路径（失败为 None）
+    ready_at: float = 0.0                                            # 相对屏障创建时刻（秒）
+
+    def complete(self) -> bool:
+        """所有素材都生成成功"""
+        return all(self.assets.values())
+
+
+class SceneReadyBarrier:
+    """
+    分镜就绪屏障（只能在所属事件循环中调用 put）
+    `async for scene in barrier` 按就绪顺序产出 ReadyScene，全部分镜就绪后结束。
+    """
+
+    def __init__(self, count: int, kinds: Sequence[str] = ("image", "audio")):
+        """
+        Args:
+            count: 分镜总数
+            kinds: 每个分镜需要的素材类型
+        """
+        self.count = count
+        self.kinds = tuple(kinds)
+        self._pending: Dict[int, Dict[str, Optional[str]]] = {}
+        self._queue: "asyncio.Queue[ReadyScene]" = asyncio.Queue()
+        self._released = 0
+        self._consumed = 0
+        self._started = time.perf_counter()
+        self.first_ready_at: Optional[float] = None
+
+    def put(self, index: int, kind: str, path: Optional[str]) -> None:
+        """
+        登记分镜 index 的一项素材（失败传 None）；同类素材重复登记时以首次为准
+
+        Raises:
+            ValueError: 未知的素材类型
+        """
+        if kind not in self.kinds:
+            raise ValueError(f"未知的素材类型: {kind}")
+        assets = self._pending.setdefault(index, {})
+        if kind in assets:
+            return
+        assets[kind] = path
+        if len(assets) < len(self.kinds):
+            return
+
+        elapsed = time.perf_counter() - self._started
+        if self.first_ready_at is None:
+            self.first_ready_at = elapsed
+        self._released += 1
+        self._queue.put_nowait(ReadyScene(index, assets, elapsed))
+
+    @property
+    def done(self) -> bool:
+        return self._released >= self.count
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> ReadyScene:
+        if self._consumed >= self.count:
+            raise StopAsyncIteration
+        scene = await self._queue.get()
+        self._consumed += 1
+        return scene
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+FFmpeg 工具 - 直接调用 ffmpeg 二进制完成无需重编码的拼接与封装
+与 MoviePy 使用同一个 ffmpeg（FFMPEG_BINARY 环境变量 > imageio-ffmpeg 自带版本）
+"""
+
+import os
+import subprocess
+import tempfile
+from typing import List, Optional, Sequence
+
+
+def get_ffmpeg_binary() -> str:
+    """
+    获取 ffmpeg 可执行文件路径
+
+    Returns:
+        ffmpeg 路径
+    """
+    binary = os.environ.get("FFMPEG_BINARY")
+    if binary and binary != "ffmpeg-imageio":
+        return binary
+
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+
+def run_ffmpeg(args: Sequence[str]) -> None:
+    """
+    执行一条 ffmpeg 命令（覆盖输出、只输出错误日志）
+
+    Args:
+        args: ffmpeg 参数（不含可执行文件本身）
+
+    Raises:
+        RuntimeError: ffmpeg 返回非 0 状态码
+    """
+    cmd = [get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y", *args]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode("utf-8", errors="ignore").strip()
+        raise RuntimeError(f"ffmpeg 执行失败 (code={proc.returncode}): {stderr[-500:]}")
+
+
+def concat_segments(segment_paths: List[str], output_path: str) -> str:
+    """
+    用 concat demuxer 流拷贝拼接片段（不重编码）
+
+    所有片段必须使用完全相同的编码参数（见 render.segments.SegmentCodec）。
+
+    Args:
+        segment_paths: 按播放顺序排列的片段路径
+        output_path: 输出路径
+
+    Returns:
+        输出路径
+    """
+    if not segment_paths:
+        raise ValueError("没有可拼接的片段")
+
+    fd, list_path = tempfile.mkstemp(prefix="concat_", suffix=".txt")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for path in segment_paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path])
+    finally:
+        try:
+            os.remove(list_path)
+        except OSError:
+            pass
+
+    return output_path
+
+
+def mux_video_audio(video_path: str, audio_path: Optional[str], output_path: str,
+                    audio_codec: str = "aac", audio_bitrate: str = "192k") -> str:
+    """
+    视频流直接拷贝，音频编码一次后封装为最终文件
+
+    Args:
+        video_path: 视频来源（只取第一路视频流）
+        audio_path: 音频来源；为 None 时使用 video_path 自带的音频
+        output_path: 输出路径
+        audio_codec: 音频编码器
+        audio_bitrate: 音频码率
+
+    Returns:
+        输出路径
+    """
+    args = ["-i", video_path]
+    if audio_path:
+        args += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+    else:
+        args += ["-map", "0:v:0", "-map", "0:a:0?"]
+
+    args += ["-c:v", "copy", "-c:a", audio_codec, "-b:a", audio_bitrate,
+             "-movflags", "+faststart", output_path]
+    run_ffmpeg(args)
+    return output_path
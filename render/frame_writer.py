@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+流式帧写入器 - 原始 RGB 帧直接写入 ffmpeg 标准输入
+合成线程与写入线程之间用有界队列 + 固定数量的复用缓冲区做背压，
+内存占用与视频时长无关；同时统计真实吞吐（帧/秒）与峰值内存。
+"""
+
+import os
+import queue
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from .ffmpeg_tools import get_ffmpeg_binary
+
+
+def current_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """
+    读取进程当前常驻内存（MB）
+
+    Linux 读取 /proc/<pid>/statm；其他平台只能返回本进程的历史峰值（ru_maxrss）。
+
+    Args:
+        pid: 进程号，None 表示当前进程
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    if pid is not None:
+        return None
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位是字节，Linux 是 KB
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except Exception:
+        return None
+
+
+@dataclass
+class RenderStats:
+    """一次导出的性能统计"""
+    frames: int = 0
+    seconds: float = 0.0
+    peak_rss_mb: Optional[float] = None          # 渲染进程峰值内存
+    encoder_peak_rss_mb: Optional[float] = None  # ffmpeg 子进程峰值内存
+    path: str = ""
+
+    @property
+    def fps(self) -> float:
+        """实际吞吐（帧/秒）"""
+        return self.frames / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        """一行中文摘要"""
+        text = f"{self.path} 导出 {self.frames} 帧，用时 {self.seconds:.1f}s（{self.fps:.1f} 帧/秒）"
+        if self.peak_rss_mb is not None:
+            text += f"，峰值内存 {self.peak_rss_mb:.0f} MB"
+        if self.encoder_peak_rss_mb is not None:
+            text += f" + ffmpeg {self.encoder_peak_rss_mb:.0f} MB"
+        return text
+
+
+class RssSampler:
+    """
+    后台采样峰值内存（上下文管理器）
+    用于给 MoviePy write_videofile 等黑盒导出路径补充同口径的统计
+    """
+
+    def __init__(self, interval: float = 0.2, pid: Optional[int] = None):
+        self.interval = interval
+        self.pid = pid
+        self.peak_mb: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> None:
+        """立即采样一次"""
+        rss = current_rss_mb(self.pid)
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self) -> "RssSampler":
+        self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.sample()
+        return False
+
+
+class FFmpegFrameWriter:
+    """
+    ffmpeg 原始帧编码器
+    以 rawvideo rgb24 从标准输入读帧，可同时封装一路外部音频
+    """
+
+    def __init__(self, output_path: str, size: Tuple[int, int], fps: float = 24,
+                 codec: str = "libx264", preset: str = "ultrafast", threads: Optional[int] = None,
+                 audio_path: Optional[str] = None, audio_codec: str = "aac",
+                 audio_bitrate: str = "192k", ffmpeg_params: Optional[List[str]] = None):
+        """
+        Args:
+            output_path: 输出路径
+            size: 画面尺寸 (width, height)
+            fps: 帧率
+            codec: 视频编码器
+            preset: x264 预设
+            threads: 编码线程数（None 表示由 ffmpeg 决定）
+            audio_path: 需要一并封装的音频文件
+            audio_codec: 音频编码器
+            audio_bitrate: 音频码率
+            ffmpeg_params: 额外的输出参数
+        """
+        width, height = size
+        self.output_path = output_path
+        self.frame_bytes = width * height * 3
+
+        cmd = [
+            get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-vcodec", "rawvideo",
+            "-s", f"{width}x{height}", "-pix_fmt", "rgb24", "-r", f"{fps:.02f}",
+            "-i", "-",
+        ]
+        if audio_path:
+            cmd += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0",
+                    "-c:a", audio_codec, "-b:a", audio_bitrate]
+        else:
+            cmd += ["-an"]
+        cmd += ["-c:v", codec, "-preset", preset, "-pix_fmt", "yuv420p"]
+        if threads:
+            cmd += ["-threads", str(threads)]
+        cmd += list(ffmpeg_params or [])
+        cmd += ["-movflags", "+faststart", output_path]
+
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        # stderr 在后台读取，避免 ffmpeg 日志写满管道导致死锁
+        self._stderr: List[bytes] = []
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_thread.start()
+
+    @property
+    def pid(self) -> int:
+        return self._proc.pid
+
+    def _drain_stderr(self):
+        for line in self._proc.stderr:
+            self._stderr.append(line)
+
+    def write(self, frame: np.ndarray) -> None:
+        """写入一帧 (height, width, 3) uint8"""
+        try:
+            self._proc.stdin.write(memoryview(frame).cast("B"))
+        except BrokenPipeError:
+            raise RuntimeError(f"ffmpeg 提前退出: {self._error_text()}")
+
+    def _error_text(self) -> str:
+        self._stderr_thread.join(timeout=1)
+        return b"".join(self._stderr).decode("utf-8", errors="ignore").strip()[-500:]
+
+    def close(self) -> None:
+        """结束输入并等待编码完成"""
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        code = self._proc.wait()
+        if code != 0:
+            raise RuntimeError(f"ffmpeg 编码失败 (code={code}): {self._error_text()}")
+
+    def abort(self) -> None:
+        """异常时终止 ffmpeg"""
+        try:
+            self._proc.stdin.close()
+        except Exception:
+            pass
+        self._proc.kill()
+        self._proc.wait()
+
+
+def stream_frames(compose: Callable[[int, np.ndarray], np.ndarray], frame_count: int,
+                  writer: FFmpegFrameWriter, new_buffer: Callable[[], np.ndarray],
+                  queue_size: int = 3,
+                  on_progress: Optional[Callable[[int, int], None]] = None) -> RenderStats:
+    """
+    合成线程 + 写入线程流水线
+
+    合成线程从空闲池取缓冲区合成帧，写入线程把帧送进 ffmpeg 后归还缓冲区；
+    空闲池只有 queue_size 块缓冲区，合成跑得比编码快时自动阻塞（背压）。
+
+    Args:
+        compose: 合成函数 compose(帧序号, 缓冲区)
+        frame_count: 总帧数
+        writer: ffmpeg 写入器
+        new_buffer: 分配帧缓冲区的函数
+        queue_size: 复用缓冲区数量（同时也是队列上限）
+        on_progress: 进度回调 (已写帧数, 总帧数)，在主线程调用
+
+    Returns:
+        RenderStats
+    """
+    free: "queue.Queue[np.ndarray]" = queue.Queue()
+    for _ in range(max(1, queue_size)):
+        free.put(new_buffer())
+    ready: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+    errors: List[BaseException] = []
+    stop = threading.Event()
+    sentinel = object()
+
+    def compose_loop():
+        try:
+            for index in range(frame_count):
+                buffer = free.get()
+                if stop.is_set():
+                    return
+                compose(index, buffer)
+                ready.put(buffer)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            ready.put(sentinel)
+
+    stats = RenderStats(path="流式写入")
+    sampler = RssSampler()
+    encoder_sampler = RssSampler(pid=writer.pid)
+    start = time.time()
+    composer = threading.Thread(target=compose_loop, daemon=True)
+    composer.start()
+
+    try:
+        while True:
+            buffer = ready.get()
+            if buffer is sentinel:
+                break
+            writer.write(buffer)
+            free.put(buffer)
+            stats.frames += 1
+            if stats.frames % 24 == 0:
+                sampler.sample()
+                encoder_sampler.sample()
+                if on_progress:
+                    on_progress(stats.frames, frame_count)
+        if errors:
+            raise errors[0]
+        encoder_sampler.sample()
+        writer.close()
+    except BaseException:
+        stop.set()
+        # 清空队列并补一块缓冲区，唤醒可能阻塞在 put/get 上的合成线程
+        while not ready.empty():
+            ready.get_nowait()
+        free.put(new_buffer())
+        writer.abort()
+        raise
+    finally:
+        composer.join(timeout=5)
+
+    sampler.sample()
+    stats.seconds = time.time() - start
+    stats.peak_rss_mb = sampler.peak_mb
+    stats.encoder_peak_rss_mb = encoder_sampler.peak_mb
+    return stats
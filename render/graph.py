@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+渲染图 - 把导演时间轴（Manifest）编译为显式的节点图再逐帧求值
+节点：场景（画面来源 + 运镜效果 + 字幕图层）、转场（分镜边界上的窗口）、音频混音。
+调度器在一条扁平时间线上求值：每个输出帧中每个场景最多计算一次，
+转场直接复用相邻场景已经算好的尾帧 / 首帧，超出场景范围的定格帧只计算一次。
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .compositor import BackgroundSource, OverlayLayer
+from .transitions import TransitionKernel, TransitionScratch, get_transition_kernel
+
+
+@dataclass
+class SceneNode:
+    """场景节点：[start, end) 时间范围内的画面"""
+    index: int
+    start: float
+    end: float
+    background: BackgroundSource        # 来源 + 运镜效果，写入缓冲区
+    overlays: List[OverlayLayer] = field(default_factory=list)
+    vibe: str = ""
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def render(self, t: float, out: np.ndarray) -> np.ndarray:
+        """渲染场景内 t 时刻（相对场景起点）的画面"""
+        self.background(t, out)
+        for layer in self.overlays:
+            layer.blend_into(out, t)
+        return out
+
+
+@dataclass
+class TransitionNode:
+    """转场节点：以 boundary 为中心的窗口"""
+    kind: str
+    boundary: float                     # 窗口中心（通常为后一分镜的起始时刻）
+    duration: float
+    before: int                         # 前一分镜在 scenes 中的下标
+    after: int                          # 后一分镜在 scenes 中的下标
+
+    @property
+    def start(self) -> float:
+        return self.boundary - self.duration / 2
+
+    @property
+    def end(self) -> float:
+        return self.boundary + self.duration / 2
+
+    @property
+    def kernel(self) -> TransitionKernel:
+        return get_transition_kernel(self.kind)
+
+
+@dataclass
+class AudioTrack:
+    """音频轨：在时间线 start 处开始播放的音频文件"""
+    path: str
+    start: float = 0.0
+    volume: float = 1.0
+    kind: str = "voice"                 # voice / sfx / bgm
+
+
+@dataclass
+class AudioMixNode:
+    """音频混音节点"""
+    tracks: List[AudioTrack] = field(default_factory=list)
+    duration: float = 0.0
+
+
+@dataclass
+class RenderGraph:
+    """编译后的渲染图"""
+    scenes: List[SceneNode]
+    transitions: List[TransitionNode]
+    audio: AudioMixNode
+    size: Tuple[int, int] = (1080, 1920)
+    fps: float = 24
+
+    @property
+    def duration(self) -> float:
+        return self.scenes[-1].end if self.scenes else 0.0
+
+    def describe(self) -> str:
+        """人类可读的图结构摘要（调试用）"""
+        lines = [f"RenderGraph {self.size[0]}x{self.size[1]}@{self.fps}fps, {self.duration:.2f}s"]
+        for scene in self.scenes:
+            lines.append(f"  scene#{scene.index} [{scene.start:.2f}, {scene.end:.2f}) vibe={scene.vibe}")
+        for tr in self.transitions:
+            lines.append(f"  transition {tr.kind} @ {tr.boundary:.2f}s ({tr.duration:.2f}s)")
+        for track in self.audio.tracks:
+            lines.append(f"  audio {track.kind} @ {track.start:.2f}s x{track.volume}: {track.path}")
+        return "\n".join(lines)
+
+
+def fit_transition_duration(duration: float, before: SceneNode, after: SceneNode) -> float:
+    """限制转场窗口：边界两侧各占一半，每一侧都不超过对应场景时长的一半"""
+    return max(0.0, min(duration, before.duration, after.duration))
+
+
+class GraphScheduler:
+    """
+    渲染图调度器
+    compose() 与 FrameCompositor 接口一致，可直接交给 stream_frames 流式导出
+    """
+
+    def __init__(self, graph: RenderGraph):
+        if not graph.scenes:
+            raise ValueError("渲染图中没有场景")
+        self.graph = graph
+        self.size = tuple(graph.size)
+        self.fps = graph.fps
+        self.frame_count = len(np.arange(0, graph.duration, 1.0 / graph.fps))
+
+        self._scene_starts = [scene.start for scene in graph.scenes]
+        self._transitions = sorted(graph.transitions, key=lambda tr: tr.start)
+        self._transition_starts = [tr.start for tr in self._transitions]
+
+        self._frame_a = self.new_buffer()
+        self._frame_b = self.new_buffer()
+        self._scratch = TransitionScratch()
+        # 定格帧缓存：(场景下标, 'head' / 'tail') -> 帧，只保留当前转场用到的
+        self._held: Dict[Tuple[int, str], np.ndarray] = {}
+        self.scene_evaluations = 0
+
+    def new_buffer(self) -> np.ndarray:
+        """分配一块输出尺寸的 uint8 帧缓冲区"""
+        width, height = self.size
+        return np.zeros((height, width, 3), dtype=np.uint8)
+
+    def _transition_at(self, t: float) -> Optional[TransitionNode]:
+        i = bisect_right(self._transition_starts, t) - 1
+        if i >= 0:
+            tr = self._transitions[i]
+            if tr.duration > 0 and t < tr.end:
+                return tr
+        return None
+
+    def _scene_at(self, t: float) -> int:
+        return max(bisect_right(self._scene_starts, t) - 1, 0)
+
+    def _render_scene(self, scene_idx: int, t: float, out: np.ndarray) -> np.ndarray:
+        """渲染场景在全局时刻 t 的画面；超出场景范围时复用定格的首帧 / 尾帧"""
+        scene = self.graph.scenes[scene_idx]
+        local = t - scene.start
+        if 0 <= local < scene.duration:
+            self.scene_evaluations += 1
+            return scene.render(local, out)
+
+        key = (scene_idx, 'head' if local < 0 else 'tail')
+        held = self._held.get(key)
+        if held is None:
+            self.scene_evaluations += 1
+            held = scene.render(0.0 if local < 0 else scene.duration, self.new_buffer())
+            # 只保留与当前场景相邻的定格帧
+            for old in [k for k in self._held if abs(k[0] - scene_idx) > 1]:
+                del self._held[old]
+            self._held[key] = held
+        return held
+
+    def compose(self, index: int, out: np.ndarray) -> np.ndarray:
+        """
+        合成第 index 帧
+
+        Args:
+            index: 帧序号
+            out: (height, width, 3) uint8 缓冲区
+        """
+        return self.compose_at(index / self.fps, out)
+
+    def compose_at(self, t: float, out: np.ndarray) -> np.ndarray:
+        """
+        合成时间线 t 时刻的画面
+
+        转场窗口内前后两个场景各求值一次，由转场内核原地混合进 out。
+
+        Args:
+            t: 时间线上的时刻（秒）
+            out: (height, width, 3) uint8 缓冲区
+        """
+        tr = self._transition_at(t)
+        if tr is None:
+            frame = self._render_scene(self._scene_at(t), t, out)
+            if frame is not out:
+                np.copyto(out, frame)
+            return out
+
+        elapsed = t - tr.start
+        progress = elapsed / tr.duration
+        kernel = tr.kernel
+        need_a, need_b = kernel.sources(progress)
+        a = self._render_scene(tr.before, t, self._frame_a) if need_a else None
+        b = self._render_scene(tr.after, t, self._frame_b) if need_b else None
+        kernel.render(a, b, progress, elapsed, out, self._scratch)
+        return out
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+混音母带处理 - 编码前一次性算好的闪避与响度归一化
+人声包络由分块 RMS 一次向量化求得，据此生成 BGM 的侧链闪避增益曲线；
+整体响度按 ITU-R BS.1770（K 加权 + 双重门限）测量后归一化到目标 LUFS，
+峰值超过上限的少量采样用软削波收住，导出前就能确定混音是否合格。
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .audio import SAMPLE_RATE
+
+
+@dataclass(frozen=True)
+class MixSettings:
+    """闪避与响度参数"""
+    duck_depth_db: float = -10.0        # 人声出现时 BGM 的衰减量
+    duck_threshold_db: float = -40.0    # 人声分块 RMS 高于此值（dBFS）视为在说话
+    window: float = 0.05                # 包络分块时长（秒）
+    hold: float = 0.3                   # 人声停顿短于此值时保持衰减（秒）
+    ramp: float = 0.2                   # 衰减 / 恢复的过渡时长（秒）
+    target_lufs: float = -14.0          # 目标综合响度
+    ceiling_db: float = -1.0            # 峰值上限（dBFS）
+    max_gain_db: float = 20.0           # 归一化最大提升量
+
+
+DEFAULT_MIX_SETTINGS = MixSettings()
+
+
+@dataclass
+class MixReport:
+    """一次混音的测量结果"""
+    loudness_before: float = float("-inf")     # 归一化前综合响度（LUFS）
+    loudness_after: float = float("-inf")      # 归一化后综合响度（LUFS）
+    gain_db: float = 0.0                       # 归一化增益
+    ducked_ratio: float = 0.0                  # BGM 处于闪避状态的时长占比
+    limited_samples: int = 0                   # 被软削波的采样数
+
+    def summary(self) -> str:
+        """一行中文摘要"""
+        if not np.isfinite(self.loudness_before):
+            return "响度：静音，未归一化"
+        text = (f"响度 {self.loudness_before:.1f} → {self.loudness_after:.1f} LUFS"
+                f"（{self.gain_db:+.1f} dB）")
+        if self.ducked_ratio > 0:
+            text += f"，BGM 闪避 {self.ducked_ratio:.0%} 时长"
+        if self.limited_samples:
+            text += f"，削峰 {self.limited_samples} 个采样"
+        return text
+
+
+def _db_to_gain(db: float) -> float:
+    return float(10 ** (db / 20))
+
+
+def _moving_average(values: np.ndarray, size: int) -> np.ndarray:
+    """居中滑动平均（两端按边缘值延拓）"""
+    if size <= 1:
+        return values
+    padded = np.pad(values, (size // 2, size - 1 - size // 2), mode="edge")
+    return np.convolve(padded, np.full(size, 1.0 / size, dtype=np.float32), mode="valid")
+
+
+def voice_envelope(voice: np.ndarray, sample_rate: int = SAMPLE_RATE, window: float = 0.05) -> np.ndarray:
+    """
+    人声分块 RMS 包络（dBFS）
+
+    Args:
+        voice: (采样数, 声道数) float32
+        sample_rate: 采样率
+        window: 分块时长（秒）
+
+    Returns:
+        每块一个值的 float32 数组
+    """
+    block = max(1, int(round(window * sample_rate)))
+    count = -(-len(voice) // block)
+    power = np.zeros(count * block, dtype=np.float32)
+    power[:len(voice)] = np.square(voice).mean(axis=1)
+    mean_square = power.reshape(count, block).mean(axis=1)
+    return (10 * np.log10(mean_square + 1e-12)).astype(np.float32)
+
+
+def duck_gain_curve(voice: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                    settings: MixSettings = DEFAULT_MIX_SETTINGS) -> np.ndarray:
+    """
+    由人声包络生成 BGM 逐采样增益（侧链闪避）
+
+    说话的分块向前扩展半个过渡、向后保持 hold，再做滑动平均得到平滑的衰减 / 恢复；
+    人声开口时 BGM 已经压到位。
+
+    Returns:
+        长度与 voice 相同的 float32 增益数组
+    """
+    if len(voice) == 0:
+        return np.ones(0, dtype=np.float32)
+    envelope = voice_envelope(voice, sample_rate, settings.window)
+    active = envelope > settings.duck_threshold_db
+
+    ramp = max(1, int(round(settings.ramp / settings.window)))
+    before = ramp // 2 + 1
+    after = max(0, int(round(settings.hold / settings.window)))
+    # 区间 [i - after, i + before] 内有人声即视为闪避（前缀和实现的膨胀）
+    counts = np.concatenate(([0], np.cumsum(active, dtype=np.int64)))
+    index = np.arange(len(active))
+    lo = np.clip(index - after, 0, len(active))
+    hi = np.clip(index + before + 1, 0, len(active))
+    ducked = counts[hi] - counts[lo] > 0
+
+    target = np.where(ducked, _db_to_gain(settings.duck_depth_db), 1.0).astype(np.float32)
+    smoothed = _moving_average(target, ramp)
+
+    block = settings.window * sample_rate
+    centers = (np.arange(len(smoothed)) + 0.5) * block
+    return np.interp(np.arange(len(voice)), centers, smoothed).astype(np.float32)
+
+
+def _biquad_power(b, a, cos_w: np.ndarray, cos_2w: np.ndarray) -> np.ndarray:
+    """二阶节的功率响应 |H(e^jw)|^2（只用实数余弦，避免逐频点复数运算）"""
+    def power(c):
+        return (c[0] ** 2 + c[1] ** 2 + c[2] ** 2 + 2 * (c[0] * c[1] + c[1] * c[2]) * cos_w
+                + 2 * c[0] * c[2] * cos_2w)
+    return power(b) / power(a)
+
+
+def k_weighting_response(frequencies: np.ndarray, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    BS.1770 K 加权（高搁架 +4 dB @ 1.5 kHz 与 38 Hz 高通）的幅频响应
+    """
+    w = 2 * np.pi * frequencies / sample_rate
+    cos_w = np.cos(w)
+    cos_2w = 2 * cos_w * cos_w - 1
+
+    # 第一级：高搁架
+    gain = 10 ** (4.0 / 40)
+    w0 = 2 * np.pi * 1500.0 / sample_rate
+    alpha = np.sin(w0) / (2 * (1 / np.sqrt(2)))
+    cos_w0 = np.cos(w0)
+    sqrt_gain = np.sqrt(gain)
+    shelf_b = (gain * ((gain + 1) + (gain - 1) * cos_w0 + 2 * sqrt_gain * alpha),
+               -2 * gain * ((gain - 1) + (gain + 1) * cos_w0),
+               gain * ((gain + 1) + (gain - 1) * cos_w0 - 2 * sqrt_gain * alpha))
+    shelf_a = ((gain + 1) - (gain - 1) * cos_w0 + 2 * sqrt_gain * alpha,
+               2 * ((gain - 1) - (gain + 1) * cos_w0),
+               (gain + 1) - (gain - 1) * cos_w0 - 2 * sqrt_gain * alpha)
+
+    # 第二级：高通
+    w0 = 2 * np.pi * 38.0 / sample_rate
+    alpha = np.sin(w0) / (2 * 0.5)
+    cos_w0 = np.cos(w0)
+    highpass_b = ((1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2)
+    highpass_a = (1 + alpha, -2 * cos_w0, 1 - alpha)
+
+    power = _biquad_power(shelf_b, shelf_a, cos_w, cos_2w) * _biquad_power(highpass_b, highpass_a, cos_w, cos_2w)
+    return np.sqrt(np.maximum(power, 0.0))
+
+
+def _fft_size(length: int) -> int:
+    """不小于 length 的最小 2^a·3^b·5^c（FFT 最快的长度）"""
+    best = 1 << (length - 1).bit_length()
+    power5 = 1
+    while power5 < best:
+        power35 = power5
+        while power35 < best:
+            size = power35
+            while size < length:
+                size *= 2
+            best = min(best, size)
+            power35 *= 3
+        power5 *= 5
+    return best
+
+
+def integrated_loudness(pcm: np.ndarray, sample_rate: int = SAMPLE_RATE) -> float:
+    """
+    按 BS.1770 测量综合响度（LUFS）
+
+    K 加权在频域一次完成（只影响能量，相位无关）；400 ms 分块、75% 重叠，
+    先做 -70 LUFS 绝对门限，再做相对 -10 LU 门限。
+
+    Returns:
+        LUFS；静音返回 -inf
+    """
+    length = len(pcm)
+    if length == 0:
+        return float("-inf")
+
+    # 补零到快速长度，同时避免循环卷积把尾部卷回开头
+    size = _fft_size(length + sample_rate // 10)
+    spectrum = np.fft.rfft(np.ascontiguousarray(pcm.T), n=size, axis=1)
+    spectrum *= k_weighting_response(np.fft.rfftfreq(size, 1.0 / sample_rate), sample_rate)
+    weighted = np.fft.irfft(spectrum, n=size, axis=1)[:, :length].T
+
+    # 各声道逐块均方（前缀和）
+    energy = np.concatenate((np.zeros((1, pcm.shape[1])), np.cumsum(np.square(weighted), axis=0)))
+    block = int(round(0.4 * sample_rate))
+    step = int(round(0.1 * sample_rate))
+    if length < block:
+        starts = np.array([0])
+        block = length
+    else:
+        starts = np.arange(0, length - block + 1, step)
+    mean_square = (energy[starts + block] - energy[starts]) / block
+    block_power = mean_square.sum(axis=1)
+    block_loudness = -0.691 + 10 * np.log10(block_power + 1e-12)
+
+    gated = block_loudness > -70.0
+    if not gated.any():
+        return float("-inf")
+    relative = -0.691 + 10 * np.log10(block_power[gated].mean()) - 10.0
+    gated &= block_loudness > relative
+    return float(-0.691 + 10 * np.log10(block_power[gated].mean()))
+
+
+def soft_limit(pcm: np.ndarray, ceiling_db: float = -1.0) -> int:
+    """
+    超过上限的采样用 tanh 软削波压到 1.0 以内（原地修改）
+
+    Returns:
+        被处理的采样数
+    """
+    ceiling = _db_to_gain(ceiling_db)
+    magnitude = np.abs(pcm)
+    over = magnitude > ceiling
+    count = int(over.sum())
+    if count:
+        headroom = 1.0 - ceiling
+        limited = ceiling + headroom * np.tanh((magnitude[over] - ceiling) / headroom)
+        pcm[over] = np.copysign(limited, pcm[over])
+    return count
+
+
+def master_mix(voice: np.ndarray, bgm: Optional[np.ndarray] = None, extra: Optional[np.ndarray] = None,
+               sample_rate: int = SAMPLE_RATE,
+               settings: MixSettings = DEFAULT_MIX_SETTINGS) -> Tuple[np.ndarray, MixReport]:
+    """
+    人声 + 闪避后的 BGM + 其他轨（音效等）混合，并归一化到目标响度
+
+    Args:
+        voice: 人声总线 (采样数, 声道数)，同时作为闪避的侧链
+        bgm: BGM 总线（长度不同时按人声长度截断 / 补零）
+        extra: 不参与闪避的其他总线
+        sample_rate: 采样率
+        settings: MixSettings
+
+    Returns:
+        (混音结果, MixReport)
+    """
+    report = MixReport()
+    mix = np.array(voice, dtype=np.float32)
+
+    if bgm is not None and len(bgm):
+        gain = duck_gain_curve(voice, sample_rate, settings)
+        length = min(len(mix), len(bgm))
+        mix[:length] += bgm[:length] * gain[:length, None]
+        duck_floor = (1 + _db_to_gain(settings.duck_depth_db)) / 2
+        report.ducked_ratio = float((gain < duck_floor).mean()) if len(gain) else 0.0
+    if extra is not None and len(extra):
+        length = min(len(mix), len(extra))
+        mix[:length] += extra[:length]
+
+    report.loudness_before = integrated_loudness(mix, sample_rate)
+    if np.isfinite(report.loudness_before):
+        report.gain_db = min(settings.target_lufs - report.loudness_before, settings.max_gain_db)
+        mix *= np.float32(_db_to_gain(report.gain_db))
+        report.limited_samples = soft_limit(mix, settings.ceiling_db)
+        # 增益是线性的，未削峰时无需重新测量
+        if report.limited_samples:
+            report.loudness_after = integrated_loudness(mix, sample_rate)
+        else:
+            report.loudness_after = report.loudness_before + report.gain_db
+    return mix, report
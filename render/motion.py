@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+运镜引擎 - 统一的缩放+平移仿射变换
+所有镜头运动效果都描述为随时间变化的 (scale, tx, ty) 曲线，
+由 AffineWarper 用一次可分离双线性插值直接写入预分配的输出缓冲区，
+取代逐帧 PIL LANCZOS 放大 + 裁剪。
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+# 运镜曲线：输入时间 t（秒），返回 (scale, tx, ty)
+#   scale: 画面相对输出尺寸的缩放倍数（1.0 = 刚好铺满）
+#   tx, ty: 缩放后画面左上角在输出画面中的位置（像素，可为小数）
+MotionCurve = Callable[[float], Tuple[float, float, float]]
+
+# 定点插值权重的精度（7 位小数，保证 (b - a) * w 不溢出 int16）
+_WEIGHT_BITS = 7
+_WEIGHT_ONE = 1 << _WEIGHT_BITS
+
+
+def centered_position(width: int, height: int, scale: float) -> Tuple[float, float]:
+    """
+    计算居中缩放时画面左上角的位置
+
+    Args:
+        width: 输出宽度
+        height: 输出高度
+        scale: 缩放倍数
+
+    Returns:
+        (tx, ty)
+    """
+    return (width - width * scale) / 2.0, (height - height * scale) / 2.0
+
+
+@dataclass(frozen=True)
+class AxisTable:
+    """单个坐标轴的插值查找表（源索引 + 定点权重）"""
+    index0: np.ndarray     # 左/上采样点索引
+    index1: np.ndarray     # 右/下采样点索引
+    weight: np.ndarray     # index1 的权重（int16，0 ~ 128）
+    valid: np.ndarray      # 输出像素是否落在画面内（超出部分填黑）
+    all_valid: bool
+
+
+def build_axis_table(out_len: int, src_len: int, scale: float, offset: float) -> AxisTable:
+    """
+    预计算一个坐标轴上的采样位置与插值权重
+
+    源图被概念性地拉伸到 out_len * scale 像素，并放在 offset 处；
+    按像素中心对齐，与 PIL resize + crop 的几何一致。
+
+    Args:
+        out_len: 输出长度（像素）
+        src_len: 源图长度（像素）
+        scale: 相对输出尺寸的缩放倍数
+        offset: 缩放后画面起点在输出中的位置
+
+    Returns:
+        AxisTable
+    """
+    scaled_len = out_len * scale
+    centers = np.arange(out_len, dtype=np.float64) + 0.5
+    valid = (centers >= offset) & (centers < offset + scaled_len)
+
+    src_pos = (centers - offset) * (src_len / scaled_len) - 0.5
+    np.clip(src_pos, 0.0, src_len - 1, out=src_pos)
+    index0 = np.floor(src_pos).astype(np.intp)
+    index1 = np.minimum(index0 + 1, src_len - 1)
+    weight = np.rint((src_pos - index0) * _WEIGHT_ONE).astype(np.int16)
+
+    return AxisTable(
+        index0=index0,
+        index1=index1,
+        weight=weight,
+        valid=valid,
+        all_valid=bool(valid.all()),
+    )
+
+
+def _lerp(a: np.ndarray, b: np.ndarray, weight: np.ndarray,
+          diff: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """定点线性插值 out = a + ((b - a) * weight >> 7)，全部写入给定缓冲区"""
+    np.subtract(b, a, out=diff, dtype=np.int16)
+    np.multiply(diff, weight, out=diff)
+    np.right_shift(diff, _WEIGHT_BITS, out=diff)
+    np.add(diff, a, out=out, casting='unsafe')
+    return out
+
+
+class AffineWarper:
+    """
+    缩放+平移仿射变换器
+    可分离双线性插值：先横向（只处理实际用到的源图行），再纵向，
+    像素按 (H, W*3) 平铺处理，全部中间结果复用预分配缓冲区。
+    """
+
+    def __init__(self, out_size: Tuple[int, int]):
+        """
+        Args:
+            out_size: 输出尺寸 (width, height)
+        """
+        self.out_w, self.out_h = out_size
+        row_len = self.out_w * 3
+        self._out = np.zeros((self.out_h, self.out_w, 3), dtype=np.uint8)
+        self._rows_a = np.empty((self.out_h, row_len), dtype=np.uint8)
+        self._rows_b = np.empty((self.out_h, row_len), dtype=np.uint8)
+        self._channel = np.arange(3, dtype=np.intp)
+        # 横向插值缓冲区依赖源图高度，按需分配
+        self._src_buffers: Dict[int, Tuple[np.ndarray, ...]] = {}
+
+    def _get_src_buffers(self, src_h: int) -> Tuple[np.ndarray, ...]:
+        buffers = self._src_buffers.get(src_h)
+        if buffers is None:
+            row_len = self.out_w * 3
+            buffers = (
+                np.empty((src_h, row_len), dtype=np.uint8),
+                np.empty((src_h, row_len), dtype=np.uint8),
+                np.empty((src_h, row_len), dtype=np.uint8),
+                np.empty((max(src_h, self.out_h), row_len), dtype=np.int16),
+            )
+            self._src_buffers[src_h] = buffers
+        return buffers
+
+    def warp(self, src: np.ndarray, scale: float, tx: float, ty: float,
+             out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        对源图做一次缩放+平移变换
+
+        Args:
+            src: 源图 (H, W, 3) uint8，分辨率可与输出不同
+            scale: 相对输出尺寸的缩放倍数
+            tx, ty: 缩放后画面左上角位置
+            out: 可选的输出缓冲区 (out_h, out_w, 3) uint8，默认复用内部缓冲区
+
+        Returns:
+            (out_h, out_w, 3) uint8 帧。默认返回内部缓冲区，
+            下一次 warp 会覆盖其内容，需要保留时请自行 copy。
+        """
+        if src.ndim == 2:
+            src = np.repeat(src[:, :, None], 3, axis=2)
+        elif src.shape[2] == 4:
+            src = src[:, :, :3]
+        src = np.ascontiguousarray(src, dtype=np.uint8)
+        src_h, src_w = src.shape[:2]
+        flat_src = src.reshape(src_h, src_w * 3)
+        frame = (self._out if out is None else out).reshape(self.out_h, self.out_w, 3)
+
+        # 无缩放无位移：直接拷贝
+        if scale == 1.0 and tx == 0 and ty == 0 and (src_w, src_h) == (self.out_w, self.out_h):
+            np.copyto(frame, src)
+            return frame
+
+        table_x = build_axis_table(self.out_w, src_w, scale, tx)
+        table_y = build_axis_table(self.out_h, src_h, scale, ty)
+        cols0 = (table_x.index0[:, None] * 3 + self._channel).ravel()
+        cols1 = (table_x.index1[:, None] * 3 + self._channel).ravel()
+        weight_x = np.repeat(table_x.weight, 3)
+        weight_y = table_y.weight[:, None]
+
+        # 只对纵向实际采样到的源图行做横向插值
+        row_lo = int(table_y.index0[0])
+        row_hi = int(table_y.index1[-1]) + 1
+        n_rows = row_hi - row_lo
+        cols_a, cols_b, rows, diff = self._get_src_buffers(src_h)
+        used = flat_src[row_lo:row_hi]
+        np.take(used, cols0, axis=1, out=cols_a[:n_rows], mode='clip')
+        np.take(used, cols1, axis=1, out=cols_b[:n_rows], mode='clip')
+        _lerp(cols_a[:n_rows], cols_b[:n_rows], weight_x, diff[:n_rows], rows[:n_rows])
+
+        # 纵向插值：整行 gather，开销很小
+        np.take(rows, table_y.index0 - row_lo, axis=0, out=self._rows_a, mode='clip')
+        np.take(rows, table_y.index1 - row_lo, axis=0, out=self._rows_b, mode='clip')
+        flat_out = frame.reshape(self.out_h, self.out_w * 3)
+        _lerp(self._rows_a, self._rows_b, weight_y, diff[:self.out_h], flat_out)
+
+        # 画面未覆盖的区域填黑（与旧版 paste 到黑底的效果一致）
+        if not table_y.all_valid:
+            frame[~table_y.valid] = 0
+        if not table_x.all_valid:
+            frame[:, ~table_x.valid] = 0
+        return frame
+
+
+def sample_scale_range(curve: MotionCurve, duration: float, fps: float = 24) -> Tuple[float, float]:
+    """
+    按帧率采样运镜曲线，得到整段运镜的缩放范围
+
+    Args:
+        curve: 运镜曲线
+        duration: 时长（秒）
+        fps: 采样帧率
+
+    Returns:
+        (min_scale, max_scale)
+    """
+    n_frames = max(1, int(math.ceil(duration * fps)))
+    scales = [curve(min(i / fps, duration))[0] for i in range(n_frames + 1)]
+    return min(scales), max(scales)
+
+
+@dataclass(frozen=True)
+class PyramidLevel:
+    """金字塔中的一层：预先以 LANCZOS 缩小到 scale 倍输出尺寸的画面（顶层为源图本身）"""
+    scale: float
+    pixels: np.ndarray
+
+
+class PreparedSource:
+    """
+    静态画面的预处理金字塔（构建后不可变）
+    只为需要缩小的缩放倍数预先缩小源图：顶层是源图本身，往下每层缩小 LEVEL_STEP 倍，
+    直到覆盖最小缩放倍数。逐帧从最近的上一层做一次亚像素裁剪 + 缩小，
+    横向插值只处理输出实际用到的行，大图不再逐帧全分辨率采样。
+    源图不大于输出所需分辨率时（分镜图已按输出尺寸裁好）金字塔只有源图一层，
+    逐帧开销与通用路径相同，也没有构建开销。
+    """
+
+    # 相邻两层的缩放比（逐帧最多只需缩小这么多倍）
+    LEVEL_STEP = 2 ** 0.25
+
+    def __init__(self, image: np.ndarray, out_size: Tuple[int, int],
+                 min_scale: float, max_scale: float):
+        """
+        Args:
+            image: 静态源画面 (H, W, 3) uint8
+            out_size: 输出尺寸 (width, height)
+            min_scale: 运镜最小缩放倍数
+            max_scale: 运镜最大缩放倍数
+        """
+        if image.ndim == 2:
+            image = np.repeat(image[:, :, None], 3, axis=2)
+        elif image.shape[2] == 4:
+            image = image[:, :, :3]
+        pixels = np.ascontiguousarray(image, dtype=np.uint8)
+        src_h, src_w = pixels.shape[:2]
+        out_w, out_h = out_size
+
+        # 源图按原分辨率使用时对应的缩放倍数；更大的缩放倍数只能放大，直接用源图
+        native = min(src_w / out_w, src_h / out_h)
+        pixels = pixels.view()              # 只读视图，不改动调用方的数组
+        pixels.flags.writeable = False
+        levels: List[PyramidLevel] = [PyramidLevel(scale=native, pixels=pixels)]
+
+        def add_level(scale: float) -> None:
+            size = (max(1, int(math.ceil(out_w * scale))), max(1, int(math.ceil(out_h * scale))))
+            upper = levels[-1].pixels
+            if size[0] >= upper.shape[1] or size[1] >= upper.shape[0]:
+                return
+            # 从上一层缩小：每层只缩小 LEVEL_STEP 倍左右，比每层都从大图缩小快得多
+            level = np.array(Image.fromarray(upper).resize(size, Image.LANCZOS))
+            level.flags.writeable = False
+            levels.append(PyramidLevel(scale=scale, pixels=level))
+
+        scale = min(max_scale, native)
+        if scale < native:
+            add_level(scale)
+        while scale > min_scale:
+            scale = max(scale / self.LEVEL_STEP, min_scale)
+            add_level(scale)
+
+        # 从小到大排列，便于查找
+        self._levels: Tuple[PyramidLevel, ...] = tuple(reversed(levels))
+
+    @property
+    def levels(self) -> Tuple[PyramidLevel, ...]:
+        return self._levels
+
+    def level_for(self, scale: float) -> PyramidLevel:
+        """返回不小于 scale 的最近一层（保证逐帧只做缩小）"""
+        for level in self._levels:
+            if level.scale >= scale - 1e-9:
+                return level
+        return self._levels[-1]
+
+
+class MotionEngine:
+    """
+    运镜引擎
+    把运镜曲线绑定到帧来源上，逐帧输出变换后的画面
+    """
+
+    def __init__(self, frame_source: Callable[[float], np.ndarray],
+                 curve: MotionCurve, out_size: Tuple[int, int]):
+        """
+        Args:
+            frame_source: 帧来源函数，输入 t 返回源帧
+            curve: 运镜曲线
+            out_size: 输出尺寸 (width, height)
+        """
+        self._frame_source = frame_source
+        self._curve = curve
+        self._out_size = tuple(out_size)
+        self._warper = AffineWarper(self._out_size)
+        self._static_image: Optional[np.ndarray] = None
+        self._scale_range: Optional[Tuple[float, float]] = None
+        self._prepared: Optional[PreparedSource] = None
+
+    @classmethod
+    def from_static(cls, image: np.ndarray, curve: MotionCurve, out_size: Tuple[int, int],
+                    duration: float, fps: float = 24) -> "MotionEngine":
+        """
+        静态画面快速通道：首帧时构建一次 PreparedSource 金字塔，
+        之后每帧不再取源帧，只做亚像素裁剪 + 一次缩小
+
+        Args:
+            image: 静态源画面
+            curve: 运镜曲线
+            out_size: 输出尺寸 (width, height)
+            duration: 运镜时长（用于求最大缩放倍数）
+            fps: 采样帧率
+        """
+        engine = cls(lambda t: image, curve, out_size)
+        engine._static_image = image
+        engine._scale_range = sample_scale_range(curve, duration, fps)
+        return engine
+
+    @property
+    def prepared_source(self) -> Optional[PreparedSource]:
+        """静态画面的金字塔（尚未渲染或非静态来源时为 None）"""
+        return self._prepared
+
+    def make_frame(self, t: float, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        渲染 t 时刻的画面（MoviePy make_frame 接口）
+
+        Args:
+            t: 时间（秒）
+            out: 可选的输出缓冲区，流式导出时直接写入合成缓冲区
+        """
+        scale, tx, ty = self._curve(t)
+        if self._static_image is None:
+            return self._warper.warp(self._frame_source(t), scale, tx, ty, out=out)
+
+        if self._prepared is None:
+            min_scale, max_scale = self._scale_range
+            self._prepared = PreparedSource(self._static_image, self._out_size, min_scale, max_scale)
+        level = self._prepared.level_for(scale)
+        return self._warper.warp(level.pixels, scale, tx, ty, out=out)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+渲染档位 - 同一条管线按不同分辨率 / 帧率 / 编码参数出片
+正式导出为 1080x1920@24fps；草稿预览为 360x640@12fps，
+运镜、字幕、转场按同一套分镜与效果配置在低分辨率下求值，几秒内出预览。
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+# 效果参数（字幕尺寸等）以正式导出的宽度为基准
+REFERENCE_WIDTH = 1080
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    """渲染档位"""
+    name: str
+    size: Tuple[int, int]
+    fps: float
+    preset: str = "ultrafast"
+    crf: int = 23
+    threads: int = 4
+    audio_bitrate: str = "192k"
+
+    @property
+    def scale(self) -> float:
+        """相对正式导出的缩放比例"""
+        return self.size[0] / REFERENCE_WIDTH
+
+    @property
+    def is_draft(self) -> bool:
+        return self.name == "draft"
+
+    def scaled(self, value: float, minimum: int = 1) -> int:
+        """把以正式导出为基准的像素尺寸换算到本档位"""
+        return max(int(round(value * self.scale)), minimum)
+
+    def ffmpeg_params(self) -> List[str]:
+        """附加的 x264 参数"""
+        return ["-crf", str(self.crf)]
+
+
+FINAL_PROFILE = RenderProfile(name="final", size=(1080, 1920), fps=24)
+
+# 草稿：1/3 边长、半帧率，画质让位于速度
+DRAFT_PROFILE = RenderProfile(name="draft", size=(360, 640), fps=12, crf=30, threads=2,
+                              audio_bitrate="96k")
+
+RENDER_PROFILES: Dict[str, RenderProfile] = {
+    FINAL_PROFILE.name: FINAL_PROFILE,
+    DRAFT_PROFILE.name: DRAFT_PROFILE,
+}
+
+
+def get_render_profile(name: str) -> RenderProfile:
+    """按名称获取渲染档位，未知名称按正式导出处理"""
+    return RENDER_PROFILES.get(name, FINAL_PROFILE)
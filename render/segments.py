@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+分镜并行渲染 - 每个分镜在独立进程中编码为中间片段，再无损拼接
+片段统一使用 SegmentCodec 描述的固定编码参数，保证 concat demuxer 可以直接流拷贝；
+音频在片段中保存为 PCM，拼接后只做一次 AAC 编码，避免逐段 AAC 编码带来的首尾静音。
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class SegmentCodec:
+    """中间片段的确定性编码参数（所有片段必须一致）"""
+    fps: int = 24
+    codec: str = "libx264"
+    preset: str = "ultrafast"
+    profile: str = "high"
+    level: str = "4.1"
+    gop: int = 48
+    audio_codec: str = "pcm_s16le"
+    audio_fps: int = 44100
+    extension: str = "mkv"
+
+    def ffmpeg_params(self) -> List[str]:
+        """额外的 ffmpeg 参数：固定 profile/level/GOP，关闭场景切换关键帧"""
+        return [
+            "-profile:v", self.profile,
+            "-level", self.level,
+            "-g", str(self.gop),
+            "-sc_threshold", "0",
+            "-pix_fmt", "yuv420p",
+        ]
+
+    def moviepy_kwargs(self, threads: int = 1) -> Dict:
+        """
+        生成 MoviePy write_videofile 的参数
+
+        Args:
+            threads: x264 编码线程数
+        """
+        return {
+            "fps": self.fps,
+            "codec": self.codec,
+            "preset": self.preset,
+            "audio_codec": self.audio_codec,
+            "audio_fps": self.audio_fps,
+            "threads": threads,
+            "ffmpeg_params": self.ffmpeg_params(),
+            "logger": None,
+        }
+
+
+DEFAULT_SEGMENT_CODEC = SegmentCodec()
+
+
+@dataclass
+class SceneSegmentJob:
+    """单个分镜的渲染任务（需可 pickle，传给子进程）"""
+    index: int
+    audio_path: str
+    image_path: Optional[str]
+    narration: str
+    style_name: Optional[str]
+    output_path: str
+    fade_in: float = 0.0
+    fade_out: float = 0.0
+    threads: int = 1
+    codec: SegmentCodec = DEFAULT_SEGMENT_CODEC
+
+
+def scene_transition_fades(index: int, count: int,
+                           transition_duration: float = 0.5) -> Tuple[float, float]:
+    """
+    计算分镜间淡入淡出时长（首段只淡出、末段只淡入、中间段两者都有）
+
+    Args:
+        index: 分镜序号
+        count: 分镜总数
+        transition_duration: 转场时长(秒)
+
+    Returns:
+        (fade_in, fade_out)
+    """
+    if count <= 1:
+        return 0.0, 0.0
+    fade_in = transition_duration if index > 0 else 0.0
+    fade_out = transition_duration if index < count - 1 else 0.0
+    return fade_in, fade_out
+
+
+def default_worker_count(job_count: int) -> int:
+    """默认进程数：不超过 CPU 核数与任务数"""
+    return max(1, min(job_count, os.cpu_count() or 1))
+
+
+def render_segments_parallel(worker: Callable[[SceneSegmentJob], str],
+                             jobs: List[SceneSegmentJob],
+                             max_workers: Optional[int] = None,
+                             on_done: Optional[Callable[[SceneSegmentJob], None]] = None) -> List[str]:
+    """
+    用进程池并行渲染所有分镜片段
+
+    Args:
+        worker: 模块级渲染函数（子进程中执行），返回片段路径
+        jobs: 渲染任务列表
+        max_workers: 最大进程数（默认按 CPU 核数）
+        on_done: 每个片段完成后在主进程中回调
+
+    Returns:
+        与 jobs 顺序一致的片段路径列表
+
+    Raises:
+        子进程中的任何异常都会原样抛出
+    """
+    if not jobs:
+        return []
+
+    workers = max_workers or default_worker_count(len(jobs))
+    # spawn 避免 fork 带走 Streamlit 主进程的线程与锁
+    context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(worker, job) for job in jobs]
+        results = []
+        for job, future in zip(jobs, futures):
+            results.append(future.result())
+            if on_done:
+                on_done(job)
+
+    return results
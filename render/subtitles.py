@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+字幕光栅化 - 字体缓存 + 字宽表换行 + 原生描边 + 成品 LRU 缓存
+同一进程内（Streamlit 每次 rerun）相同字幕只绘制一次，
+对话微调脚本后重新渲染时，未改动分镜的字幕直接命中缓存。
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+@dataclass(frozen=True)
+class SubtitleStyle:
+    """字幕样式（作为缓存键的一部分，必须可哈希）"""
+    fill: Tuple[int, int, int, int] = (255, 255, 255, 255)
+    stroke_fill: Tuple[int, int, int, int] = (0, 0, 0, 255)
+    stroke_width: int = 2
+    line_spacing: int = 20
+    margin: int = 50
+
+
+DEFAULT_SUBTITLE_STYLE = SubtitleStyle()
+
+
+class GlyphMetrics:
+    """单个字体（路径 + 字号）的字宽表：每个字符只测量一次"""
+
+    def __init__(self, font: ImageFont.ImageFont):
+        self.font = font
+        self._advances: Dict[str, float] = {}
+
+    def advance(self, char: str) -> float:
+        """字符的步进宽度（像素）"""
+        width = self._advances.get(char)
+        if width is None:
+            width = self.font.getlength(char)
+            self._advances[char] = width
+        return width
+
+    def wrap(self, text: str, max_width: float) -> List[str]:
+        """
+        按字宽逐字累加换行（线性复杂度）
+
+        Args:
+            text: 文本
+            max_width: 每行最大宽度
+
+        Returns:
+            行列表
+        """
+        lines = []
+        current = []
+        current_width = 0.0
+        for char in text:
+            width = self.advance(char)
+            if current and current_width + width > max_width:
+                lines.append("".join(current))
+                current = [char]
+                current_width = width
+            else:
+                current.append(char)
+                current_width += width
+        if current:
+            lines.append("".join(current))
+        return lines
+
+
+@lru_cache(maxsize=32)
+def get_glyph_metrics(font_path: Optional[str], fontsize: int) -> GlyphMetrics:
+    """
+    获取 (字体路径, 字号) 对应的字体与字宽表（进程内缓存）
+
+    Args:
+        font_path: 字体路径，None 表示 Pillow 默认字体
+        fontsize: 字号
+
+    Raises:
+        OSError: 字体文件无法加载
+    """
+    if font_path is None:
+        return GlyphMetrics(ImageFont.load_default())
+    return GlyphMetrics(ImageFont.truetype(font_path, fontsize))
+
+
+class SubtitleRasterizer:
+    """
+    字幕光栅化器
+    成品 RGBA 数组按 (文本, 宽, 高, 字号, 样式) 做 LRU 缓存，返回只读数组
+    """
+
+    def __init__(self, font_path: Optional[str], cache_size: int = 256):
+        """
+        Args:
+            font_path: 字体路径，None 表示 Pillow 默认字体
+            cache_size: 缓存的字幕数量上限
+        """
+        self.font_path = font_path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text: str, width: int = 1080, height: int = 400, fontsize: int = 70,
+               style: SubtitleStyle = DEFAULT_SUBTITLE_STYLE) -> np.ndarray:
+        """
+        绘制字幕（白字黑边，多行水平垂直居中）
+
+        Returns:
+            (height, width, 4) uint8 RGBA 只读数组
+        """
+        key = (text, width, height, fontsize, style)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        rgba = self._rasterize(text, width, height, fontsize, style)
+        rgba.flags.writeable = False
+
+        with self._lock:
+            self._cache[key] = rgba
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rgba
+
+    def _rasterize(self, text: str, width: int, height: int, fontsize: int,
+                   style: SubtitleStyle) -> np.ndarray:
+        metrics = get_glyph_metrics(self.font_path, fontsize)
+        font = metrics.font
+
+        img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+
+        lines = metrics.wrap(text, width - 2 * style.margin)
+        line_height = fontsize + style.line_spacing
+        start_y = (height - len(lines) * line_height) // 2
+
+        for i, line in enumerate(lines):
+            bbox = draw.textbbox((0, 0), line, font=font)
+            x = (width - (bbox[2] - bbox[0])) // 2
+            y = start_y + i * line_height
+            # Pillow 原生描边：一次绘制完成黑边 + 白字
+            draw.text((x, y), line, font=font, fill=style.fill,
+                      stroke_width=style.stroke_width, stroke_fill=style.stroke_fill)
+
+        return np.array(img)
+
+    def clear(self) -> None:
+        """清空成品缓存"""
+        with self._lock:
+            self._cache.clear()
+
+
+@lru_cache(maxsize=8)
+def get_subtitle_rasterizer(font_path: Optional[str]) -> SubtitleRasterizer:
+    """获取字体对应的共享光栅化器（进程内单例）"""
+    return SubtitleRasterizer(font_path)
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+转场内核 - 在帧级别描述分镜之间的转场
+每个内核接收前一分镜的尾帧 a、后一分镜的首帧 b 与转场进度，把结果写入 out；
+前后帧由调度器各计算一次后传入，内核自身不再取帧，
+中间结果全部写入 TransitionScratch 中按帧尺寸复用的缓冲区（定点整数运算）。
+"""
+
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+
+class TransitionScratch:
+    """转场内核共用的复用缓冲区（按名称 + 形状懒分配，单线程使用）"""
+
+    def __init__(self):
+        self._buffers: Dict[Tuple[str, tuple, str], np.ndarray] = {}
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.uint16) -> np.ndarray:
+        """获取指定名称与形状的缓冲区（内容未初始化）"""
+        key = (name, tuple(shape), np.dtype(dtype).str)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[key] = buffer
+        return buffer
+
+
+# 转场内核：(尾帧 a, 首帧 b, 进度 0~1, 转场内已过时间秒, 输出缓冲区, 复用缓冲区) -> None
+KernelFunc = Callable[[Optional[np.ndarray], Optional[np.ndarray], float, float,
+                       np.ndarray, TransitionScratch], None]
+
+
+@dataclass(frozen=True)
+class TransitionKernel:
+    """转场内核及其取帧需求"""
+    render: KernelFunc
+    uses_both: bool = False   # 整个窗口内都需要前后两帧（如交叉淡化）
+    uses_none: bool = False   # 不需要任何源帧（如白场）
+
+    def sources(self, progress: float) -> Tuple[bool, bool]:
+        """
+        当前进度下需要哪些源帧
+
+        Returns:
+            (需要尾帧 a, 需要首帧 b)
+        """
+        if self.uses_none:
+            return False, False
+        if self.uses_both:
+            return True, True
+        return progress < 0.5, progress >= 0.5
+
+
+def _pick(a: Optional[np.ndarray], b: Optional[np.ndarray], progress: float) -> np.ndarray:
+    """前半段取尾帧，后半段取首帧"""
+    return a if progress < 0.5 else b
+
+
+def _scale_into(src: np.ndarray, factor: float, out: np.ndarray, scratch: TransitionScratch) -> None:
+    """out = src * factor（定点 8 位）"""
+    acc = scratch.get("acc", src.shape)
+    np.multiply(src, int(round(factor * 256)), out=acc, dtype=np.uint16)
+    acc >>= 8
+    np.copyto(out, acc, casting='unsafe')
+
+
+def cut_kernel(a, b, progress, elapsed, out, scratch):
+    """硬切：窗口中点切换"""
+    src = _pick(a, b, progress)
+    if src is not out:
+        np.copyto(out, src)
+
+
+def crossfade_kernel(a, b, progress, elapsed, out, scratch):
+    """交叉淡化：out = a * (1 - p) + b * p（定点 8 位）"""
+    k = int(round(progress * 256))
+    acc = scratch.get("acc", a.shape)
+    tmp = scratch.get("tmp", a.shape)
+    np.multiply(a, 256 - k, out=acc, dtype=np.uint16)
+    np.multiply(b, k, out=tmp, dtype=np.uint16)
+    acc += tmp
+    acc >>= 8
+    np.copyto(out, acc, casting='unsafe')
+
+
+def fade_black_kernel(a, b, progress, elapsed, out, scratch):
+    """黑场：前半段淡出到黑，后半段从黑淡入"""
+    if progress < 0.5:
+        _scale_into(a, 1.0 - 2.0 * progress, out, scratch)
+    else:
+        _scale_into(b, 2.0 * progress - 1.0, out, scratch)
+
+
+def flash_white_kernel(a, b, progress, elapsed, out, scratch):
+    """白场闪烁"""
+    out.fill(255)
+
+
+def glitch_kernel(a, b, progress, elapsed, out, scratch):
+    """
+    故障艺术：横向错位叠加（模拟 RGB 分离）
+    out = frame * 0.7 + roll(frame, shift) * 0.3，错位直接按列切片写入，不生成 roll 副本
+    """
+    frame = _pick(a, b, progress)
+    shift = int(10 * math.sin(elapsed * 50)) % frame.shape[1]
+    acc = scratch.get("acc", frame.shape)
+    tmp = scratch.get("tmp", frame.shape)
+
+    np.multiply(frame, 179, out=acc, dtype=np.uint16)          # 0.7 * 256
+    if shift:
+        np.multiply(frame[:, :-shift], 77, out=tmp[:, shift:], dtype=np.uint16)  # 0.3 * 256
+        np.multiply(frame[:, -shift:], 77, out=tmp[:, :shift], dtype=np.uint16)
+    else:
+        np.multiply(frame, 77, out=tmp, dtype=np.uint16)
+    acc += tmp
+    acc >>= 8
+    np.copyto(out, acc, casting='unsafe')
+
+
+def _box_blur_rows(src: np.ndarray, radius: int, out: np.ndarray, scratch: TransitionScratch) -> None:
+    """
+    沿横向做一次盒式模糊（边缘像素延伸），累加和实现，耗时与半径无关
+
+    Args:
+        src: (H, W, C) uint8
+        radius: 半径（窗口宽 2r+1）
+        out: (H, W, C) uint8，可与 src 相同
+    """
+    h, w, c = src.shape
+    width = 2 * radius + 1
+    padded = scratch.get("blur_pad", (h, w + 2 * radius, c), np.uint8)
+    csum = scratch.get("blur_sum", (h, w + 2 * radius + 1, c), np.int32)
+
+    padded[:, radius:radius + w] = src
+    padded[:, :radius] = src[:, :1]
+    padded[:, radius + w:] = src[:, -1:]
+    csum[:, 0] = 0
+    np.cumsum(padded, axis=1, dtype=np.int32, out=csum[:, 1:])
+
+    diff = scratch.get("blur_diff", (h, w, c), np.int32)
+    np.subtract(csum[:, width:], csum[:, :w], out=diff)
+    diff += width // 2
+    diff //= width
+    np.copyto(out, diff, casting='unsafe')
+
+
+def gaussian_blur_rows(src: np.ndarray, sigma: float, out: np.ndarray,
+                       scratch: TransitionScratch, passes: int = 3) -> None:
+    """
+    横向高斯模糊近似：连续 passes 次盒式模糊（中心极限定理）
+
+    Args:
+        src: (H, W, C) uint8
+        sigma: 高斯标准差（像素）
+        out: 输出缓冲区，可与 src 相同
+    """
+    # n 次宽度为 w 的盒式模糊方差为 n * (w^2 - 1) / 12
+    radius = int(round((math.sqrt(12.0 * sigma * sigma / passes + 1.0) - 1.0) / 2.0))
+    if radius < 1:
+        if src is not out:
+            np.copyto(out, src)
+        return
+    _box_blur_rows(src, radius, out, scratch)
+    for _ in range(passes - 1):
+        _box_blur_rows(out, radius, out, scratch)
+
+
+def whip_pan_kernel(a, b, progress, elapsed, out, scratch):
+    """快速摇镜：横向运动模糊，越接近窗口末尾越强"""
+    frame = _pick(a, b, progress)
+    ease = 1 - math.pow(1 - progress, 3)
+    gaussian_blur_rows(frame, 5 * ease, out, scratch)
+
+
+class RadialZoomGrid:
+    """
+    中心缩放采样表（每个输出分辨率只计算一次）
+    以画面中心缩放是可分离的：缩放 s 倍时，输出第 y 行取源图第 cy + (y - cy) / s 行，列同理。
+    把 [1, max_scale] 量化为 levels 级，预先算好每一级的行 / 列下标（最近邻）。
+    """
+
+    def __init__(self, height: int, width: int, levels: int = 96, max_scale: float = 1.5):
+        self.height = height
+        self.width = width
+        self.levels = levels
+        self.max_scale = max_scale
+        scales = np.linspace(1.0, max_scale, levels)
+        self.rows = self._axis_indices(height, scales)
+        self.cols = self._axis_indices(width, scales)
+
+    @staticmethod
+    def _axis_indices(length: int, scales: np.ndarray) -> np.ndarray:
+        center = (length - 1) / 2.0
+        coords = np.arange(length, dtype=np.float64)
+        src = center + (coords[None, :] - center) / scales[:, None]
+        return np.clip(np.rint(src), 0, length - 1).astype(np.intp)
+
+    def level(self, scale: float) -> int:
+        """缩放倍数对应的量化级别"""
+        pos = (scale - 1.0) / (self.max_scale - 1.0) * (self.levels - 1)
+        return int(min(max(round(pos), 0), self.levels - 1))
+
+
+@lru_cache(maxsize=4)
+def get_radial_zoom_grid(height: int, width: int) -> RadialZoomGrid:
+    """获取分辨率对应的共享采样表"""
+    return RadialZoomGrid(height, width)
+
+
+# 径向模糊：倍增次数（2^n 个等比采样点）与最大拖影比例（相对当前缩放倍数）
+ZOOM_BLUR_PASSES = 3
+ZOOM_BLUR_SPREAD = 0.06
+
+
+def zoom_blur_scale(progress: float) -> float:
+    """缩放曲线：前半段放大到 1.25 倍，后半段回落"""
+    if progress < 0.5:
+        return 1.0 + progress * 0.5
+    return 1.25 - (progress - 0.5) * 0.5
+
+
+def _zoom_gather(src: np.ndarray, grid: RadialZoomGrid, level: int, out: np.ndarray,
+                 scratch: TransitionScratch) -> None:
+    """按采样表中心缩放：先按行 gather，再按列 gather（整像素搬运）"""
+    rows = scratch.get("zoom_rows", src.shape, np.uint8)
+    np.take(src, grid.rows[level], axis=0, out=rows)
+    pixel = 'V%d' % src.shape[2]
+    np.take(rows.view(pixel), grid.cols[level], axis=1, out=out.view(pixel))
+
+
+def zoom_blur_kernel(a, b, progress, elapsed, out, scratch):
+    """
+    径向缩放模糊：快速放大后切换，再回落
+    先按缩放曲线取样，再做 ZOOM_BLUR_PASSES 次倍增：每次把当前结果与其再放大
+    R^(1/2^k) 倍的结果取平均，得到 2^n 个等比分布的径向采样（R = 1 + 拖影比例）。
+    拖影强度在切换点（缩放最快处）最大，两端退化为单次采样。
+    """
+    frame = _pick(a, b, progress)
+    h, w = frame.shape[:2]
+    grid = get_radial_zoom_grid(h, w)
+    spread = ZOOM_BLUR_SPREAD * math.sin(math.pi * progress)
+
+    # 拖影在画面边缘不足 1 像素时只取一次样
+    if spread * max(h, w) / 2 < 1.0:
+        _zoom_gather(frame, grid, grid.level(zoom_blur_scale(progress)), out, scratch)
+        return
+
+    tap = scratch.get("zoom_tap", frame.shape, np.uint8)
+    half = scratch.get("zoom_half", frame.shape, np.uint8)
+    _zoom_gather(frame, grid, grid.level(zoom_blur_scale(progress)), out, scratch)
+    for k in range(1, ZOOM_BLUR_PASSES + 1):
+        step = (1.0 + spread) ** (1.0 / 2 ** k)
+        _zoom_gather(out, grid, grid.level(step), tap, scratch)
+        # 四舍五入平均，不升位宽：(x | y) - ((x ^ y) >> 1)
+        np.bitwise_xor(out, tap, out=half)
+        half >>= 1
+        out |= tap
+        out -= half
+
+
+TRANSITION_KERNELS: Dict[str, TransitionKernel] = {
+    "cut": TransitionKernel(cut_kernel),
+    "shake_cut": TransitionKernel(cut_kernel),
+    "crossfade": TransitionKernel(crossfade_kernel, uses_both=True),
+    "slow_fade": TransitionKernel(crossfade_kernel, uses_both=True),
+    "fade_black": TransitionKernel(fade_black_kernel),
+    "flash_white": TransitionKernel(flash_white_kernel, uses_none=True),
+    "glitch": TransitionKernel(glitch_kernel),
+    "whip_pan": TransitionKernel(whip_pan_kernel),
+    "zoom_blur": TransitionKernel(zoom_blur_kernel),
+}
+
+# 各转场的默认时长（秒）；未列出的使用 apply_style_transition 的默认 0.3
+TRANSITION_DURATIONS: Dict[str, float] = {
+    "slow_fade": 0.6,
+    "flash_white": 0.1,
+}
+
+
+def get_transition_kernel(kind: str) -> TransitionKernel:
+    """按名称获取转场内核，未知类型按硬切处理"""
+    return TRANSITION_KERNELS.get(kind, TRANSITION_KERNELS["cut"])
@@ -377,6 +377,11 @@ class SchedulerTower:
         for m in missions:
             print(f"   🔥 {m['topic']} (策略评分: {m['strategy_score']:.0f})")
         
+        # 预热音色：凭证校验与火山引擎建连在开工前完成，不计入首个视频的合成耗时
+        from voices import VoiceFactory
+        ready = VoiceFactory.warm_up()
+        print(f"🎙️ 音色预热完成: {sum(ready.values())}/{len(ready)} 可用")
+        
         # 2. 逐个生成视频
         for i, mission in enumerate(missions):
             print(f"\n📦 任务 {i+1}/{len(missions)}: {mission['topic']}")
@@ -406,6 +411,9 @@ class SchedulerTower:
         success_count = sum(1 for r in results if r['status'] == 'success')
         print(f"\n{'='*60}")
         print(f"📊 任务总结: 成功 {success_count}/{len(results)}")
+        from core.http_transport import get_transport
+        for line in get_transport().metrics_summary():
+            print(f"   🌐 {line}")
         print(f"{'='*60}\n")
         
         return results
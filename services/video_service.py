@@ -7,8 +7,9 @@
 from typing import Optional, Dict, Any, List
 from models import ScriptVersion, Scene
 from core import ConfigManager, ZhipuClient
-from voices import VoiceFactory
+from voices import VoiceFactory, audio_duration
 from workflow import WorkflowEngine
+import asyncio
 import os
 
 
@@ -37,10 +38,14 @@ class VideoService:
         """
         为场景生成图片
         
+        各场景经 ZhipuClient 批量接口并发生成（限流 + 重试），部分失败时返回已成功的部分。
+        视频模式下所有场景作为同一批任务提交，视频失败 / 超时的场景回退到静态图片。
+        
         Returns:
             {
-                'success': bool,
-                'image_paths': List[str],
+                'success': bool,              # 至少一个场景成功
+                'image_paths': List[str],     # 成功场景的文件（按场景顺序）
+                'failed': List[int],          # 失败的场景序号
                 'error': str
             }
         """
@@ -48,41 +53,32 @@ class VideoService:
             return {
                 'success': False,
                 'error': '智谱API未配置',
-                'image_paths': []
+                'image_paths': [],
+                'failed': []
             }
         
-        image_paths = []
+        ext = 'mp4' if use_video_model else 'jpg'
+        os.makedirs("output", exist_ok=True)
+        targets = [(i, scene) for i, scene in enumerate(scenes) if scene.image_prompt]
+        items = [(scene.image_prompt, f"output/scene_{i+1}.{ext}") for i, scene in targets]
         
-        for i, scene in enumerate(scenes):
-            if not scene.image_prompt:
-                continue
-            
-            if use_video_model:
-                response = self._zhipu.generate_video(scene.image_prompt)
-            else:
-                response = self._zhipu.generate_image(scene.image_prompt)
-            
+        done = {}
+        failed = []
+        # 生成并下载（提示词未变时直接取素材库中的文件），按完成先后处理
+        for k, response in self._zhipu.iter_generate_media_files(items, use_video_model):
+            i, scene = targets[k]
             if response.success:
-                # 下载图片/视频
-                media_url = self._extract_media_url(response.data)
-                if media_url:
-                    ext = 'mp4' if use_video_model else 'jpg'
-                    save_path = f"output/scene_{i+1}.{ext}"
-                    os.makedirs("output", exist_ok=True)
-                    
-                    import urllib.request
-                    try:
-                        urllib.request.urlretrieve(media_url, save_path)
-                        image_paths.append(save_path)
-                        scene.image_path = save_path
-                    except Exception as e:
-                        print(f"下载媒体失败: {e}")
+                scene.image_path = response.data
+                done[i] = response.data
             else:
+                failed.append(i)
                 print(f"生成场景{i+1}失败: {response.error}")
         
+        image_paths = [done[i] for i in sorted(done)]
         return {
             'success': len(image_paths) > 0,
             'image_paths': image_paths,
+            'failed': sorted(failed),
             'error': None if image_paths else '所有图片生成失败'
         }
     
@@ -102,7 +98,8 @@ class VideoService:
         voice_id = voice_id or self._config.default_voice
         
         try:
-            voice = VoiceFactory.create(voice_id)
+            # 池化实例：凭证与可用性检查已在预热 / 首次使用时完成
+            voice = VoiceFactory.create_with_fallback(voice_id)
         except Exception as e:
             return {
                 'success': False,
@@ -110,26 +107,27 @@ class VideoService:
                 'audio_paths': []
             }
         
+        os.makedirs("output", exist_ok=True)
+        jobs = [(i, scene, f"output/scene_{i+1}.mp3") for i, scene in enumerate(scenes) if scene.content]
+        
+        async def synthesize_all():
+            return await asyncio.gather(
+                *(voice.synthesize(scene.content, save_path) for _, scene, save_path in jobs),
+                return_exceptions=True
+            )
+        
         audio_paths = []
         
-        for i, scene in enumerate(scenes):
-            if not scene.content:
-                continue
-            
-            save_path = f"output/scene_{i+1}.mp3"
-            os.makedirs("output", exist_ok=True)
-            
-            try:
-                result = voice.synthesize(scene.content, save_path)
-                if result.get('success'):
-                    audio_paths.append(save_path)
-                    scene.audio_path = save_path
-                    # 更新场景时长
-                    scene.duration = result.get('duration', 5.0)
-                else:
-                    print(f"合成场景{i+1}音频失败: {result.get('error')}")
-            except Exception as e:
-                print(f"合成场景{i+1}音频异常: {e}")
+        for (i, scene, save_path), result in zip(jobs, asyncio.run(synthesize_all())):
+            if isinstance(result, Exception):
+                print(f"合成场景{i+1}音频异常: {result}")
+            elif result:
+                audio_paths.append(save_path)
+                scene.audio_path = save_path
+                # 更新场景时长（读时间戳旁路文件 / MP3 帧头，不解码）
+                scene.duration = audio_duration(save_path) or 5.0
+            else:
+                print(f"合成场景{i+1}音频失败")
         
         return {
             'success': len(audio_paths) > 0,
@@ -243,7 +241,9 @@ class VideoService:
             }
         
         if progress_callback:
-            progress_callback('images', 100, '图片生成完成')
+            failed = image_result.get('failed', [])
+            message = f"图片生成完成（{len(failed)} 个失败，渲染时使用占位）" if failed else '图片生成完成'
+            progress_callback('images', 100, message)
         
         # Step 2: 生成音频
         if progress_callback:
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+render.motion 黄金测试：AffineWarper / build_axis_table 与 PIL resize + crop 的参考结果对比
+定点插值权重只有 7 位，逐像素允许 ±3 的取整误差，平均误差需在 1.5/255 以内。
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render.motion import AffineWarper, build_axis_table
+
+OUT_SIZE = (180, 320)
+MAX_ERROR = 3
+MAX_MEAN_ERROR = 1.5
+
+
+@pytest.fixture(scope="module")
+def source():
+    """平滑的随机画面（与真实分镜图一样以低频内容为主）"""
+    rng = np.random.default_rng(0)
+    noise = (rng.random((40, 23, 3)) * 255).astype(np.uint8)
+    return np.array(Image.fromarray(noise).resize(OUT_SIZE, Image.BICUBIC))
+
+
+def pil_reference(src: np.ndarray, scale: float, tx: float, ty: float) -> np.ndarray:
+    """PIL 参考：把源图放大到 scale 倍输出尺寸，再从 (-tx, -ty) 处裁出输出画面"""
+    out_w, out_h = OUT_SIZE
+    scaled = Image.fromarray(src).resize((round(out_w * scale), round(out_h * scale)), Image.BILINEAR)
+    return np.array(scaled.crop((-tx, -ty, out_w - tx, out_h - ty)))
+
+
+def pil_subpixel_reference(src: np.ndarray, scale: float, tx: float, ty: float) -> np.ndarray:
+    """PIL 参考（亚像素位置）：resize 的 box 参数一次完成裁剪 + 缩放"""
+    out_w, out_h = OUT_SIZE
+    box = (-tx / scale, -ty / scale, (out_w - tx) / scale, (out_h - ty) / scale)
+    return np.array(Image.fromarray(src).resize(OUT_SIZE, Image.BILINEAR, box=box))
+
+
+def assert_close(actual: np.ndarray, expected: np.ndarray):
+    error = np.abs(actual.astype(np.int16) - expected.astype(np.int16))
+    assert error.max() <= MAX_ERROR
+    assert error.mean() <= MAX_MEAN_ERROR
+
+
+def test_identity_is_exact_copy(source):
+    warper = AffineWarper(OUT_SIZE)
+    assert np.array_equal(warper.warp(source, 1.0, 0, 0), source)
+
+
+@pytest.mark.parametrize("scale, tx, ty", [
+    (1.1, -9, -16),
+    (1.2, -18, -32),
+    (1.5, -45, -80),
+    (1.5, 0, -160),          # 贴左边缘
+    (1.2, -36, 0),           # 贴上边缘
+])
+def test_warp_matches_pil_resize_crop(source, scale, tx, ty):
+    warper = AffineWarper(OUT_SIZE)
+    assert_close(warper.warp(source, scale, tx, ty), pil_reference(source, scale, tx, ty))
+
+
+@pytest.mark.parametrize("scale, tx, ty", [
+    (1.25, -20.5, -40.25),
+    (1.05, -4.3, -9.9),
+])
+def test_warp_matches_pil_at_subpixel_offsets(source, scale, tx, ty):
+    warper = AffineWarper(OUT_SIZE)
+    assert_close(warper.warp(source, scale, tx, ty), pil_subpixel_reference(source, scale, tx, ty))
+
+
+def test_uncovered_area_is_black(source):
+    """画面平移后露出的区域填黑，其余部分与 PIL 贴到黑底的结果一致"""
+    out_w, out_h = OUT_SIZE
+    scale, tx, ty = 1.2, 12, -20
+    canvas = Image.new("RGB", OUT_SIZE)
+    scaled = Image.fromarray(source).resize((round(out_w * scale), round(out_h * scale)), Image.BILINEAR)
+    canvas.paste(scaled, (tx, ty))
+
+    frame = AffineWarper(OUT_SIZE).warp(source, scale, tx, ty)
+    assert not frame[:, :tx].any()
+    assert_close(frame[:, tx:], np.array(canvas)[:, tx:])
+
+
+def test_warp_writes_into_given_buffer(source):
+    out = np.empty((OUT_SIZE[1], OUT_SIZE[0], 3), dtype=np.uint8)
+    frame = AffineWarper(OUT_SIZE).warp(source, 1.2, -18, -32, out=out)
+    assert np.shares_memory(frame, out)
+    assert_close(out, pil_reference(source, 1.2, -18, -32))
+
+
+def test_axis_table_geometry():
+    """像素中心对齐：源图拉伸 2 倍时输出像素交替落在源像素的 1/4 与 3/4 处"""
+    table = build_axis_table(8, 4, 1.0, 0.0)
+    assert table.index0.tolist() == [0, 0, 0, 1, 1, 2, 2, 3]
+    assert table.index1.tolist() == [1, 1, 1, 2, 2, 3, 3, 3]
+    assert table.weight.tolist() == [0, 32, 96, 32, 96, 32, 96, 0]
+    assert table.all_valid
+
+
+def test_axis_table_marks_uncovered_pixels():
+    table = build_axis_table(10, 10, 1.0, 3.0)
+    assert table.valid.tolist() == [False] * 3 + [True] * 7
+    assert not table.all_valid
+
+
+def test_axis_table_matches_pil_row():
+    """单行渐变：查找表插值结果与 PIL 放大后裁剪一致"""
+    row = np.linspace(0, 255, 40).astype(np.uint8)
+    out_len, scale, offset = 64, 1.25, -7.0
+    table = build_axis_table(out_len, row.size, scale, offset)
+    a = row[table.index0].astype(np.int16)
+    b = row[table.index1].astype(np.int16)
+    ours = a + (((b - a) * table.weight) >> 7)
+
+    scaled = Image.fromarray(row[None, :]).resize((round(out_len * scale), 1), Image.BILINEAR)
+    reference = np.array(scaled)[0, int(-offset):int(-offset) + out_len]
+    assert np.abs(ours - reference.astype(np.int16)).max() <= MAX_ERROR
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+core.video_jobs 测试：进程内 aiohttp 服务器模拟智谱视频任务接口
+按提示词决定任务结局：ok（轮询两次后成功）、fail（失败）、slow（一直处理中）、
+throttle（首次提交被 429 限流）、always-429（提交一直被限流）、flaky-poll（首次轮询返回 502）
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.primitives import RetryPolicy
+from core.video_jobs import CogVideoClient, VideoJob, VideoJobSettings
+
+VIDEO_BYTES = b"\x00\x00\x00\x18ftypmp42" + b"v" * 4096
+
+FAST_SETTINGS = VideoJobSettings(
+    deadline=5.0, poll_initial=0.02, poll_min=0.02, poll_max=0.05,
+    request_timeout=2.0, max_throttle_retries=3,
+    poll_retry=RetryPolicy(base_delay=0.02, max_delay=0.05, retry_statuses=(500, 502, 503, 504)),
+)
+
+
+class FakeZhipu:
+    """记录请求次数的假智谱接口"""
+
+    def __init__(self):
+        self.tasks = {}
+        self.submits = 0
+        self.polls = 0
+        self.throttled = set()
+        self.base_url = ""
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/videos/generations", self.submit)
+        app.router.add_get("/async-result/{task_id}", self.poll)
+        app.router.add_get("/files/{task_id}.mp4", self.download)
+        return app
+
+    async def submit(self, request):
+        self.submits += 1
+        prompt = (await request.json())["prompt"]
+        if prompt == "always-429" or (prompt == "throttle" and prompt not in self.throttled):
+            self.throttled.add(prompt)
+            return web.json_response({"error": "rate limited"}, status=429, headers={"Retry-After": "0.2"})
+        task_id = f"task-{len(self.tasks)}"
+        self.tasks[task_id] = {"prompt": prompt, "polls": 0}
+        return web.json_response({"id": task_id, "task_status": "PROCESSING"})
+
+    async def poll(self, request):
+        self.polls += 1
+        task_id = request.match_info["task_id"]
+        task = self.tasks[task_id]
+        task["polls"] += 1
+        if task["prompt"] == "flaky-poll" and task["polls"] == 1:
+            return web.Response(status=502, text="<html>Bad Gateway</html>", content_type="text/html")
+        if task["prompt"] == "fail":
+            return web.json_response({"task_status": "FAIL"})
+        if task["prompt"] == "slow" or task["polls"] < 2:
+            return web.json_response({"task_status": "PROCESSING"})
+        return web.json_response({
+            "task_status": "SUCCESS",
+            "video_result": [{"url": f"{self.base_url}/files/{task_id}.mp4"}],
+        })
+
+    async def download(self, request):
+        return web.Response(body=VIDEO_BYTES, content_type="video/mp4")
+
+
+def run_jobs(tmp_path, prompts, settings=FAST_SETTINGS):
+    """启动假服务器并运行一批任务，返回 (jobs, 已回调的序号, 假服务器, 耗时)"""
+    fake = FakeZhipu()
+    jobs = [VideoJob(index=i, prompt=prompt, output_path=str(tmp_path / f"scene_{i}.mp4"))
+            for i, prompt in enumerate(prompts)]
+    done = []
+
+    async def main():
+        server = TestServer(fake.app(), host="127.0.0.1")
+        await server.start_server()
+        fake.base_url = str(server.make_url("")).rstrip("/")
+        try:
+            start = time.monotonic()
+            async with CogVideoClient("test-key", fake.base_url, settings) as client:
+                await client.run(jobs, on_done=lambda job: done.append(job.index))
+            return time.monotonic() - start
+        finally:
+            await server.close()
+
+    elapsed = asyncio.run(main())
+    return jobs, done, fake, elapsed
+
+
+def test_submit_poll_success_downloads_clip(tmp_path):
+    jobs, done, fake, _ = run_jobs(tmp_path, ["ok", "ok"])
+    assert [job.status for job in jobs] == ["success", "success"]
+    assert sorted(done) == [0, 1]
+    assert fake.submits == 2
+    assert fake.polls >= 4                       # 每个任务先 PROCESSING 再 SUCCESS
+    for job in jobs:
+        assert job.task_id in fake.tasks
+        with open(job.output_path, "rb") as f:
+            assert f.read() == VIDEO_BYTES
+        assert not os.path.exists(f"{job.output_path}.part")
+
+
+def test_failed_task_is_reported_without_file(tmp_path):
+    jobs, done, _, _ = run_jobs(tmp_path, ["fail", "ok"])
+    assert jobs[0].status == "failed"
+    assert "任务失败" in jobs[0].error
+    assert not os.path.exists(jobs[0].output_path)
+    assert jobs[1].status == "success"
+    assert sorted(done) == [0, 1]
+
+
+def test_submit_honours_retry_after(tmp_path):
+    jobs, _, fake, elapsed = run_jobs(tmp_path, ["throttle"])
+    assert jobs[0].status == "success"
+    assert fake.submits == 2                     # 429 一次后重新提交
+    assert elapsed >= 0.2                        # 按 Retry-After 等待
+
+
+def test_persistent_throttling_is_bounded(tmp_path):
+    jobs, _, fake, elapsed = run_jobs(tmp_path, ["always-429"])
+    assert jobs[0].status == "failed"
+    assert "HTTP 429" in jobs[0].error
+    assert fake.submits == FAST_SETTINGS.max_throttle_retries + 1
+    assert elapsed < FAST_SETTINGS.deadline      # 不会一直重试到整批截止时间
+
+
+def test_deadline_marks_pending_jobs_timeout(tmp_path):
+    settings = VideoJobSettings(deadline=0.3, poll_initial=0.02, poll_min=0.02, poll_max=0.05)
+    jobs, done, _, elapsed = run_jobs(tmp_path, ["slow", "ok"], settings)
+    assert jobs[0].status == "timeout"
+    assert jobs[1].status == "success"
+    assert done == [1]                           # 超时的任务不回调
+    assert elapsed < 1.0
+    assert not os.path.exists(jobs[0].output_path)
+
+
+def test_transient_poll_error_is_retried(tmp_path):
+    jobs, done, fake, _ = run_jobs(tmp_path, ["flaky-poll"])
+    assert jobs[0].status == "success"           # 502 后继续轮询，已计费的任务不丢弃
+    assert done == [0]
+    assert fake.submits == 1                     # 不重新提交
+    assert fake.polls >= 2
+    with open(jobs[0].output_path, "rb") as f:
+        assert f.read() == VIDEO_BYTES
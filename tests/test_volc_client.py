@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+voices.volc_client 测试：进程内 WebSocket 服务器模拟火山引擎 V3 双向流式 TTS
+服务器按协议回应建连 / 会话事件，把文本拆成多个音频分块下发，并记录收到的每一帧。
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+from websockets.asyncio.server import serve
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voices.volc_client import VolcTTSClient
+from voices.volc_protocols import EventType, Message, MsgType, MsgTypeFlagBits
+
+
+def audio_chunks(text: str):
+    """服务器为一段文本下发的音频分块"""
+    raw = text.encode("utf-8")
+    return [b"ID3\x03", raw[:4], raw[4:], b"\xff\xfb-tail"]
+
+
+class FakeVolcServer:
+    """假火山引擎 TTS 服务：每条连接记录收到的事件"""
+
+    def __init__(self, fail_text: str = ""):
+        self.fail_text = fail_text
+        self.connections = []       # 服务端 WebSocket 连接
+        self.events = []            # 每条连接收到的事件号列表
+        self.headers = []
+        self.requests = []          # 收到的 StartSession / TaskRequest 负载
+        self.url = ""
+
+    async def _send(self, ws, event, session_id="", payload=b"{}", msg_type=MsgType.FullServerResponse):
+        msg = Message(type=msg_type, flag=MsgTypeFlagBits.WithEvent, event=event,
+                      session_id=session_id, connect_id="fake-connect", payload=payload)
+        await ws.send(msg.marshal())
+
+    async def handler(self, ws):
+        self.connections.append(ws)
+        self.headers.append(ws.request.headers)
+        events = []
+        self.events.append(events)
+        text = ""
+        async for data in ws:
+            msg = Message.from_bytes(data)
+            events.append(msg.event)
+            if msg.event == EventType.StartConnection:
+                await self._send(ws, EventType.ConnectionStarted)
+            elif msg.event == EventType.StartSession:
+                self.requests.append(json.loads(msg.payload))
+                await self._send(ws, EventType.SessionStarted, msg.session_id)
+            elif msg.event == EventType.TaskRequest:
+                request = json.loads(msg.payload)
+                self.requests.append(request)
+                text = request["req_params"]["text"]
+            elif msg.event == EventType.FinishSession:
+                if text == self.fail_text:
+                    await self._send(ws, EventType.SessionFailed, msg.session_id, b'{"error": "bad text"}')
+                    continue
+                await self._send(ws, EventType.TTSSentenceStart, msg.session_id)
+                for chunk in audio_chunks(text):
+                    await self._send(ws, EventType.TTSResponse, msg.session_id, chunk,
+                                     msg_type=MsgType.AudioOnlyServer)
+                sentence = {"text": text, "words": [{"word": text, "startTime": 0.0, "endTime": 0.5}]}
+                await self._send(ws, EventType.TTSSentenceEnd, msg.session_id,
+                                 json.dumps(sentence).encode())
+                await self._send(ws, EventType.SessionFinished, msg.session_id)
+            elif msg.event == EventType.FinishConnection:
+                await self._send(ws, EventType.ConnectionFinished)
+
+
+def run_with_server(scenario, fake=None):
+    """启动假服务器，scenario(client, fake) 为协程函数；结束后关闭客户端与服务器"""
+    fake = fake or FakeVolcServer()
+
+    async def main():
+        async with serve(fake.handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            fake.url = f"ws://127.0.0.1:{port}"
+            client = VolcTTSClient("test-app", "test-token", endpoint=fake.url)
+            try:
+                return await scenario(client, fake)
+            finally:
+                await client.close()
+
+    return asyncio.run(main()), fake
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_session_frames_and_chunk_assembly(tmp_path):
+    out = str(tmp_path / "a.mp3")
+    text = "你好，火山引擎"
+
+    async def scenario(client, fake):
+        return await client.synthesize(text, "zh_female_test", out)
+
+    written, fake = run_with_server(scenario)
+    expected = b"".join(audio_chunks(text))
+    assert written == len(expected)
+    assert read(out) == expected                         # 多个音频分块按序拼接
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+    # 一条连接上：建连 → 开会话 → 发送文本 → 结束会话；关闭客户端时结束连接
+    assert fake.events == [[EventType.StartConnection, EventType.StartSession, EventType.TaskRequest,
+                            EventType.FinishSession, EventType.FinishConnection]]
+    assert fake.headers[0]["X-Api-App-Key"] == "test-app"
+    assert fake.headers[0]["X-Api-Access-Key"] == "test-token"
+    start_request, task = fake.requests
+    assert start_request["event"] == EventType.StartSession
+    assert start_request["req_params"]["speaker"] == "zh_female_test"
+    assert task["req_params"]["text"] == text
+
+
+def test_connection_reused_across_calls(tmp_path):
+    async def scenario(client, fake):
+        for k, text in enumerate(["第一段", "第二段", "第三段"]):
+            await client.synthesize(text, "zh_female_test", str(tmp_path / f"{k}.mp3"))
+        return client.connections_opened, client.sessions
+
+    (opened, sessions), fake = run_with_server(scenario)
+    assert (opened, sessions) == (1, 3)
+    assert len(fake.connections) == 1
+    assert fake.events[0].count(EventType.StartConnection) == 1
+    assert fake.events[0].count(EventType.StartSession) == 3
+    assert read(tmp_path / "2.mp3") == b"".join(audio_chunks("第三段"))
+
+
+def test_concurrent_calls_use_separate_connections(tmp_path):
+    async def scenario(client, fake):
+        texts = ["并发一", "并发二", "并发三"]
+        await asyncio.gather(*(client.synthesize(text, "zh_female_test", str(tmp_path / f"{k}.mp3"))
+                               for k, text in enumerate(texts)))
+        return client.connections_opened
+
+    opened, fake = run_with_server(scenario)
+    assert opened == 3                                   # max_connections 默认 3
+    for k, text in enumerate(["并发一", "并发二", "并发三"]):
+        assert read(tmp_path / f"{k}.mp3") == b"".join(audio_chunks(text))
+
+
+def test_closed_idle_connection_is_replaced(tmp_path):
+    async def scenario(client, fake):
+        await client.synthesize("第一段", "zh_female_test", str(tmp_path / "a.mp3"))
+        # 服务端关闭空闲连接（如超时回收）
+        await fake.connections[0].close()
+        await asyncio.sleep(0.05)
+        await client.synthesize("第二段", "zh_female_test", str(tmp_path / "b.mp3"))
+        return client.connections_opened
+
+    opened, fake = run_with_server(scenario)
+    assert opened == 2
+    assert len(fake.connections) == 2
+    assert read(tmp_path / "b.mp3") == b"".join(audio_chunks("第二段"))
+
+
+def test_failed_session_discards_connection(tmp_path):
+    async def scenario(client, fake):
+        with pytest.raises(RuntimeError, match="会话失败"):
+            await client.synthesize("坏文本", "zh_female_test", str(tmp_path / "bad.mp3"))
+        await client.synthesize("好文本", "zh_female_test", str(tmp_path / "good.mp3"))
+        return client.connections_opened
+
+    opened, fake = run_with_server(scenario, FakeVolcServer(fail_text="坏文本"))
+    assert opened == 2                                   # 失败会话所在的连接不再复用
+    assert not os.path.exists(tmp_path / "bad.mp3")
+    assert read(tmp_path / "good.mp3") == b"".join(audio_chunks("好文本"))
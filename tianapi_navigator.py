@@ -9,6 +9,8 @@ import random
 from typing import List, Dict, Optional, Tuple
 import streamlit as st
 
+from core.http_transport import DEFAULT_RETRY, get_openai_client, get_transport
+
 
 class TianapiNavigator:
     """
@@ -72,8 +74,10 @@ class TianapiNavigator:
             原始热点数据列表
         """
         try:
-            response = requests.post(
+            response = get_transport().post(
                 self.url,
+                endpoint="tianapi:douyinhot",
+                retry=DEFAULT_RETRY,                # 热搜查询无副作用，按幂等请求重试
                 data={"key": self.api_key},
                 headers={"Content-type": "application/x-www-form-urlencoded"},
                 timeout=10
@@ -203,9 +207,7 @@ class TianapiNavigator:
         Returns:
             扩充后的背景信息
         """
-        from openai import OpenAI
-        
-        client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com/v1")
+        client = get_openai_client(api_key, "https://api.deepseek.com/v1")
         
         expansion_prompt = f"""你是一位资深的社会观察家和短视频内容策划。
 
@@ -14,18 +14,34 @@ import requests
 import json
 import base64
 import uuid
-import subprocess
-import sys
 import random
 import re
 import math
-from PIL import Image, ImageDraw, ImageFont
+import time
+import shutil
+import tempfile
+import threading
+from PIL import Image
 import streamlit as st
 from moviepy.editor import (
     AudioFileClip, ImageClip, ColorClip, CompositeVideoClip, 
-    concatenate_videoclips, CompositeAudioClip, afx, concatenate_audioclips,
-    vfx, TextClip
+    concatenate_videoclips, CompositeAudioClip, TextClip
 )
+from render import (
+    MotionEngine, centered_position, SceneSegmentJob, scene_transition_fades,
+    render_segments_parallel, concat_segments, mux_video_audio,
+    OverlayLayer, SceneLayers, FrameCompositor, FFmpegFrameWriter, RenderStats,
+    RssSampler, resolve_position, stream_frames, get_subtitle_rasterizer,
+    SceneNode, TransitionNode, AudioTrack, AudioMixNode, RenderGraph, GraphScheduler,
+    TRANSITION_DURATIONS, fit_transition_duration, FINAL_PROFILE, DRAFT_PROFILE,
+    SceneReadyBarrier, AudioTimeline, decode_audio, encode_audio, get_audio_asset_cache, master_mix
+)
+from voices.tts_cache import get_tts_cache, tts_cache_key
+from voices.speech_timing import (
+    audio_duration, iter_timing_files, load_speech_timing, save_with_timing, sentence_spans, timing_path
+)
+from voices.volc_client import volcengine_synthesize
+from voices.tts_scheduler import SynthesisRoute, SynthesisScheduler, SynthesisTask
 
 # ==================== MoviePy 2.x 兼容性修复 ====================
 
@@ -121,10 +137,45 @@ def clean_ssml_for_subtitle(text):
 
 # ==================== 视频动画效果 ====================
 
+# 背景电影感淡入淡出时长（秒）
+BACKGROUND_FADE_DURATION = 0.4
+# 字幕入场（上滑 + 淡入）时长（秒）
+TEXT_FADE_DURATION = 0.3
+
+def render_motion_clip(clip, duration, curve, fps=None):
+    """
+    用统一运镜引擎把 (scale, tx, ty) 曲线应用到 clip 上
+    所有镜头运动效果共用一次仿射变换，不再逐帧 PIL 放大 + 裁剪。
+    静态 ImageClip（AI 绘画 / 黑屏占位）走快速通道：每个场景只构建一次
+    预缩小金字塔（源图不大于输出时即源图本身），逐帧不再调用 get_frame。
+
+    Args:
+        clip: ImageClip 或 VideoClip 对象
+        duration: 视频时长
+        curve: 运镜曲线，输入 t 返回 (scale, tx, ty)
+        fps: 输出帧率，None 表示不设置
+
+    Returns:
+        运镜后的 VideoClip
+    """
+    from moviepy.video.VideoClip import VideoClip
+
+    if isinstance(clip, ImageClip):
+        engine = MotionEngine.from_static(clip.img, curve, tuple(clip.size), duration, fps or 24)
+    else:
+        engine = MotionEngine(clip.get_frame, curve, tuple(clip.size))
+    new_clip = VideoClip(engine.make_frame, duration=duration)
+    if fps:
+        new_clip = new_clip.set_fps(fps)
+    # 流式导出时直接把运镜写入合成缓冲区
+    new_clip.motion_engine = engine
+    return new_clip
+
+
 def apply_ken_burns_effect(clip, duration, zoom_factor=1.15, direction='in'):
     """
     Ken Burns 效果 - 缓慢缩放平移，让静态图片产生动态感
-    使用 Pillow 预处理避免 MoviePy resize 的 ANTIALIAS 兼容性问题
+    使用统一运镜引擎（仿射变换）避免 MoviePy resize 的 ANTIALIAS 兼容性问题
     
     Args:
         clip: ImageClip 对象
@@ -134,29 +185,15 @@ def apply_ken_burns_effect(clip, duration, zoom_factor=1.15, direction='in'):
     """
     w, h = clip.size
     
-    def make_frame(t):
+    def curve(t):
         progress = t / duration
         if direction == 'in':
             scale = 1 + (zoom_factor - 1) * progress
         else:
             scale = zoom_factor - (zoom_factor - 1) * progress
-        
-        frame = clip.get_frame(t)
-        pil_img = Image.fromarray(frame)
-        new_w, new_h = int(w * scale), int(h * scale)
-        pil_img = pil_img.resize((new_w, new_h), Image.LANCZOS)
-        
-        # 裁剪回原始尺寸（居中）
-        left = (new_w - w) // 2
-        top = (new_h - h) // 2
-        right = left + w
-        bottom = top + h
-        pil_img = pil_img.crop((left, top, right, bottom))
-        
-        return np.array(pil_img)
+        return (scale,) + centered_position(w, h, scale)
     
-    from moviepy.video.VideoClip import VideoClip
-    return VideoClip(make_frame, duration=duration).set_fps(clip.fps if hasattr(clip, 'fps') else 24)
+    return render_motion_clip(clip, duration, curve, fps=clip.fps if hasattr(clip, 'fps') else 24)
 
 
 def apply_subtle_pan(clip, duration, pan_direction='horizontal'):
@@ -202,7 +239,7 @@ def apply_fade_transition(clip, duration, fade_in=0.5, fade_out=0.5):
 def apply_subtle_zoom_pulse(clip, duration, pulse_count=2):
     """
     轻微呼吸感缩放 - 模拟心跳/呼吸节奏
-    使用 Pillow 预处理避免 MoviePy resize 的 ANTIALIAS 兼容性问题
+    使用统一运镜引擎（仿射变换）避免 MoviePy resize 的 ANTIALIAS 兼容性问题
     
     Args:
         clip: ImageClip 对象
@@ -211,81 +248,152 @@ def apply_subtle_zoom_pulse(clip, duration, pulse_count=2):
     """
     w, h = clip.size
     
-    def make_frame(t):
+    def curve(t):
         pulse = math.sin(2 * math.pi * pulse_count * t / duration)
         scale = 1.0 + 0.03 * pulse
-        
-        frame = clip.get_frame(t)
-        pil_img = Image.fromarray(frame)
-        new_w, new_h = int(w * scale), int(h * scale)
-        pil_img = pil_img.resize((new_w, new_h), Image.LANCZOS)
-        
-        # 裁剪回原始尺寸（居中）
-        left = (new_w - w) // 2
-        top = (new_h - h) // 2
-        right = left + w
-        bottom = top + h
-        pil_img = pil_img.crop((left, top, right, bottom))
-        
-        return np.array(pil_img)
+        return (scale,) + centered_position(w, h, scale)
     
-    from moviepy.video.VideoClip import VideoClip
-    return VideoClip(make_frame, duration=duration).set_fps(clip.fps if hasattr(clip, 'fps') else 24)
+    return render_motion_clip(clip, duration, curve, fps=clip.fps if hasattr(clip, 'fps') else 24)
 
 
-def create_animated_scene(bg_clip, txt_clip, duration, style_name=None, scene_index=0):
+def select_scene_motion(bg_clip, duration, style_name=None, scene_index=0):
     """
-    为场景添加动画效果组合
+    根据风格为背景选择运镜效果
     
     Args:
         bg_clip: 背景图片 clip
-        txt_clip: 字幕 clip
         duration: 场景时长
         style_name: 风格名称，用于选择不同动画
         scene_index: 场景索引，用于交替动画方向
     
     Returns:
-        合成后的动画场景
+        运镜后的背景 clip
     """
     # 根据风格选择动画策略 - 5大升级版爆款风格
     if style_name and "治愈系" in style_name:
         # 治愈系·观察者：低角度缓慢推进，营造电影质感
-        bg_animated = apply_cinematic_ken_burns(bg_clip, duration, zoom_factor=1.06, direction='in')
+        return apply_cinematic_ken_burns(bg_clip, duration, zoom_factor=1.06, direction='in')
         
     elif style_name and "认知重塑" in style_name:
         # 认知重塑·破壁人：稳定推进，营造科技感和权威感
-        bg_animated = apply_cinematic_push(bg_clip, duration, intensity=1.12)
+        return apply_cinematic_push(bg_clip, duration, intensity=1.12)
         
     elif style_name and "逆袭见证" in style_name:
         # 逆袭见证·养成系：真实Vlog感，轻微手持晃动
-        bg_animated = apply_gentle_float(bg_clip, duration)
+        return apply_gentle_float(bg_clip, duration)
         
     elif style_name and "情绪过山车" in style_name:
         # 情绪过山车·发疯艺术家：从压抑到爆发的视觉转变
         if scene_index < 3:
             # 前期：震动 + 快速剪辑感（压抑）
-            bg_animated = apply_shake_effect(bg_clip, duration, intensity=0.02)
+            return apply_shake_effect(bg_clip, duration, intensity=0.02)
         else:
             # 后期：爆发式缩放（幻想世界）
-            bg_animated = apply_zoom_pulse(bg_clip, duration, pulse_count=3, intensity=0.08)
+            return apply_zoom_pulse(bg_clip, duration, pulse_count=3, intensity=0.08)
         
     elif style_name and "萌即正义" in style_name:
         # 萌即正义·哲学大师：快速切换感，配合洗脑节奏
-        bg_animated = apply_meme_zoom(bg_clip, duration)
+        return apply_meme_zoom(bg_clip, duration)
         
-    else:
-        # 默认：电影感 Ken Burns 效果，交替方向
-        direction = 'in' if scene_index % 2 == 0 else 'out'
-        bg_animated = apply_cinematic_ken_burns(bg_clip, duration, zoom_factor=1.12, direction=direction)
+    # 默认：电影感 Ken Burns 效果，交替方向
+    direction = 'in' if scene_index % 2 == 0 else 'out'
+    return apply_cinematic_ken_burns(bg_clip, duration, zoom_factor=1.12, direction=direction)
+
+
+def create_animated_scene(bg_clip, txt_clip, duration, style_name=None, scene_index=0):
+    """
+    为场景添加动画效果组合
+    
+    Args:
+        bg_clip: 背景图片 clip
+        txt_clip: 字幕 clip，或逐句字幕 clip 列表（subtitle_clips_from_cues 的结果，各自带起点）
+        duration: 场景时长
+        style_name: 风格名称，用于选择不同动画
+        scene_index: 场景索引，用于交替动画方向
+    
+    Returns:
+        合成后的动画场景
+    """
+    bg_animated = select_scene_motion(bg_clip, duration, style_name, scene_index)
     
     # 添加电影级淡入淡出
-    bg_animated = apply_cinematic_fade(bg_animated, duration, fade_in=0.4, fade_out=0.4)
+    bg_animated = apply_cinematic_fade(bg_animated, duration, fade_in=BACKGROUND_FADE_DURATION,
+                                       fade_out=BACKGROUND_FADE_DURATION)
     
-    # 字幕动态入场
-    txt_clip = apply_text_entrance(txt_clip, duration)
+    # 字幕动态入场（逐句字幕每句各自入场）
+    txt_clips = txt_clip if isinstance(txt_clip, list) else [txt_clip]
+    txt_clips = [apply_text_entrance(clip, clip.duration) for clip in txt_clips]
     
     # 合成场景
-    return CompositeVideoClip([bg_animated, txt_clip])
+    return CompositeVideoClip([bg_animated] + txt_clips)
+
+
+def build_scene_layers(bg_clip, subtitle_cues, duration, style_name=None, scene_index=0,
+                       fade_in=0.0, fade_out=0.0):
+    """
+    生成与 create_animated_scene 画面一致的图层描述，供流式导出直接合成
+    
+    Args:
+        bg_clip: 背景图片 clip
+        subtitle_cues: 字幕 [(起点, 终点, RGBA)]（scene_subtitle_cues 的结果）
+        duration: 场景时长
+        style_name: 风格名称
+        scene_index: 场景索引
+        fade_in: 分镜间转场淡入时长
+        fade_out: 分镜间转场淡出时长
+    
+    Returns:
+        SceneLayers
+    """
+    bg_animated = select_scene_motion(bg_clip, duration, style_name, scene_index)
+    engine = getattr(bg_animated, 'motion_engine', None)
+    if engine is not None:
+        background = lambda t, out: engine.make_frame(t, out=out)
+    else:
+        background = _clip_background_source(bg_animated)
+    
+    return SceneLayers(
+        duration=duration,
+        background=background,
+        overlays=subtitle_overlays(subtitle_cues),
+        background_fade_in=BACKGROUND_FADE_DURATION,
+        background_fade_out=BACKGROUND_FADE_DURATION,
+        fade_in=fade_in,
+        fade_out=fade_out
+    )
+
+
+def subtitle_overlays(subtitle_cues):
+    """
+    字幕 [(起点, 终点, RGBA)] 转为叠加图层：预乘 Alpha 图块，每句的位置与淡入同 apply_text_entrance
+    （set_position 传函数时 MoviePy 按像素而非相对比例定位）；末句一直显示到分镜结束（含转场）
+    """
+    overlays = []
+    for k, (start, end, rgba) in enumerate(subtitle_cues):
+        overlays.append(OverlayLayer.from_rgba(
+            rgba,
+            position=text_entrance_position,
+            relative=False,
+            fade_in=TEXT_FADE_DURATION,
+            start=start,
+            end=end if k < len(subtitle_cues) - 1 else float('inf')
+        ))
+    return overlays
+
+
+def _clip_background_source(clip):
+    """非运镜引擎的背景（如 set_position 震动）：按 MoviePy 定位规则贴到黑底上"""
+    def render(t, out):
+        out.fill(0)
+        frame = clip.get_frame(t)
+        frame_h, frame_w = out.shape[:2]
+        h, w = frame.shape[:2]
+        x, y = resolve_position(clip.pos(t), clip.relative_pos, (frame_w, frame_h), (w, h))
+        fx1, fy1 = max(x, 0), max(y, 0)
+        fx2, fy2 = min(x + w, frame_w), min(y + h, frame_h)
+        if fx1 < fx2 and fy1 < fy2:
+            out[fy1:fy2, fx1:fx2] = frame[fy1 - y:fy2 - y, fx1 - x:fx2 - x, :3]
+    return render
 
 
 # ==================== AI 级转场动画效果 ====================
@@ -293,53 +401,30 @@ def create_animated_scene(bg_clip, txt_clip, duration, style_name=None, scene_in
 def apply_cinematic_push(clip, duration, intensity=1.15):
     """
     电影级镜头推进效果 - 模拟专业摄像机的推进镜头
-    使用 Pillow 预处理避免 MoviePy resize 的 ANTIALIAS 兼容性问题
+    使用统一运镜引擎（仿射变换）避免 MoviePy resize 的 ANTIALIAS 兼容性问题
     """
     w, h = clip.size
     
-    def make_frame(t):
+    def curve(t):
         progress = t / duration
         ease = 1 - math.pow(1 - progress, 3)
         scale = 1.0 + (intensity - 1.0) * ease
         
         center_x = w * 0.02 * progress
         center_y = h * 0.01 * progress
-        pos_x, pos_y = -center_x, -center_y
-        
-        frame = clip.get_frame(t)
-        pil_img = Image.fromarray(frame)
-        new_w, new_h = int(w * scale), int(h * scale)
-        pil_img = pil_img.resize((new_w, new_h), Image.LANCZOS)
-        
-        # 裁剪回原始尺寸
-        left = max(0, int(-pos_x))
-        top = max(0, int(-pos_y))
-        right = min(new_w, left + w)
-        bottom = min(new_h, top + h)
-        
-        result = Image.new('RGB', (w, h), (0, 0, 0))
-        crop = pil_img.crop((left, top, right, bottom))
-        paste_x = max(0, int(pos_x))
-        paste_y = max(0, int(pos_y))
-        result.paste(crop, (paste_x, paste_y))
-        
-        return np.array(result)
+        return scale, -center_x, -center_y
     
-    from moviepy.video.VideoClip import VideoClip
-    return VideoClip(make_frame, duration=duration).set_fps(clip.fps if hasattr(clip, 'fps') else 24)
+    return render_motion_clip(clip, duration, curve, fps=clip.fps if hasattr(clip, 'fps') else 24)
 
 
 def apply_cinematic_ken_burns(clip, duration, zoom_factor=1.12, direction='in'):
     """
     电影级 Ken Burns 效果 - 更平滑的缩放和移动
-    使用 Pillow 预处理避免 MoviePy resize 的 ANTIALIAS 兼容性问题
+    使用统一运镜引擎（仿射变换）避免 MoviePy resize 的 ANTIALIAS 兼容性问题
     """
-    from PIL import Image as PILImage
-    
     w, h = clip.size
     
-    # 预生成关键帧，使用 Pillow 进行高质量缩放
-    def make_frame(t):
+    def curve(t):
         progress = t / duration
         
         # 计算缩放因子
@@ -355,33 +440,9 @@ def apply_cinematic_ken_burns(clip, duration, zoom_factor=1.12, direction='in'):
         else:
             pos_x, pos_y = w * (offset - 0.03), -h * offset * 0.5
         
-        # 获取原始帧
-        frame = clip.get_frame(t)
-        
-        # 使用 Pillow 进行高质量缩放
-        pil_img = PILImage.fromarray(frame)
-        new_w, new_h = int(w * scale), int(h * scale)
-        pil_img = pil_img.resize((new_w, new_h), PILImage.LANCZOS)
-        
-        # 裁剪回原始尺寸
-        left = max(0, int(-pos_x))
-        top = max(0, int(-pos_y))
-        right = min(new_w, left + w)
-        bottom = min(new_h, top + h)
-        
-        # 创建黑色背景
-        result = PILImage.new('RGB', (w, h), (0, 0, 0))
-        
-        # 粘贴缩放后的图像
-        crop = pil_img.crop((left, top, right, bottom))
-        paste_x = max(0, int(pos_x))
-        paste_y = max(0, int(pos_y))
-        result.paste(crop, (paste_x, paste_y))
-        
-        return np.array(result)
+        return scale, pos_x, pos_y
     
-    from moviepy.video.io.VideoFileClip import VideoClip
-    return VideoClip(make_frame, duration=duration)
+    return render_motion_clip(clip, duration, curve)
 
 
 def apply_shake_effect(clip, duration, intensity=0.02):
@@ -400,137 +461,70 @@ def apply_shake_effect(clip, duration, intensity=0.02):
 def apply_zoom_pulse(clip, duration, pulse_count=2, intensity=0.05):
     """
     心跳式缩放 - 强调节奏感
-    使用 Pillow 预处理避免 MoviePy resize 的 ANTIALIAS 兼容性问题
+    使用统一运镜引擎（仿射变换）避免 MoviePy resize 的 ANTIALIAS 兼容性问题
     """
     w, h = clip.size
     
-    def make_frame(t):
+    def curve(t):
         progress = t / duration
         pulse = math.sin(2 * math.pi * pulse_count * progress)
         scale = 1.0 + intensity * (pulse + 1) / 2
-        
-        frame = clip.get_frame(t)
-        pil_img = Image.fromarray(frame)
-        new_w, new_h = int(w * scale), int(h * scale)
-        pil_img = pil_img.resize((new_w, new_h), Image.LANCZOS)
-        
-        # 裁剪回原始尺寸（居中）
-        left = (new_w - w) // 2
-        top = (new_h - h) // 2
-        right = left + w
-        bottom = top + h
-        pil_img = pil_img.crop((left, top, right, bottom))
-        
-        return np.array(pil_img)
+        return (scale,) + centered_position(w, h, scale)
     
-    from moviepy.video.VideoClip import VideoClip
-    return VideoClip(make_frame, duration=duration).set_fps(clip.fps if hasattr(clip, 'fps') else 24)
+    return render_motion_clip(clip, duration, curve, fps=clip.fps if hasattr(clip, 'fps') else 24)
 
 
 def apply_first_person_walk(clip, duration, speed=1.0):
     """
     第一人称行走效果 - 模拟 POV 镜头移动
-    使用 Pillow 预处理避免 MoviePy resize 的 ANTIALIAS 兼容性问题
+    使用统一运镜引擎（仿射变换）避免 MoviePy resize 的 ANTIALIAS 兼容性问题
     """
     w, h = clip.size
     
-    def make_frame(t):
+    def curve(t):
         progress = t / duration
         scale = 1.0 + 0.08 * progress
         sway = math.sin(progress * 4 * math.pi) * 0.01 * w
         bob = math.sin(progress * 8 * math.pi) * 0.005 * h
-        pos_x, pos_y = sway, bob
-        
-        frame = clip.get_frame(t)
-        pil_img = Image.fromarray(frame)
-        new_w, new_h = int(w * scale), int(h * scale)
-        pil_img = pil_img.resize((new_w, new_h), Image.LANCZOS)
-        
-        # 裁剪回原始尺寸
-        left = max(0, int(-pos_x))
-        top = max(0, int(-pos_y))
-        right = min(new_w, left + w)
-        bottom = min(new_h, top + h)
-        
-        result = Image.new('RGB', (w, h), (0, 0, 0))
-        crop = pil_img.crop((left, top, right, bottom))
-        paste_x = max(0, int(pos_x))
-        paste_y = max(0, int(pos_y))
-        result.paste(crop, (paste_x, paste_y))
-        
-        return np.array(result)
+        return scale, sway, bob
     
-    from moviepy.video.VideoClip import VideoClip
-    return VideoClip(make_frame, duration=duration).set_fps(clip.fps if hasattr(clip, 'fps') else 24)
+    return render_motion_clip(clip, duration, curve, fps=clip.fps if hasattr(clip, 'fps') else 24)
 
 
 def apply_gentle_float(clip, duration):
     """
     轻柔漂浮效果 - 适合生活类、治愈类内容
-    使用 Pillow 预处理避免 MoviePy resize 的 ANTIALIAS 兼容性问题
+    使用统一运镜引擎（仿射变换）避免 MoviePy resize 的 ANTIALIAS 兼容性问题
     """
     w, h = clip.size
     
-    def make_frame(t):
+    def curve(t):
         progress = t / duration
         scale = 1.0 + 0.03 * math.sin(progress * 2 * math.pi)
         radius = 0.02
         pos_x = math.cos(progress * 2 * math.pi) * radius * w
         pos_y = math.sin(progress * 2 * math.pi) * radius * h * 0.5
-        
-        frame = clip.get_frame(t)
-        pil_img = Image.fromarray(frame)
-        new_w, new_h = int(w * scale), int(h * scale)
-        pil_img = pil_img.resize((new_w, new_h), Image.LANCZOS)
-        
-        # 裁剪回原始尺寸
-        left = max(0, int(-pos_x))
-        top = max(0, int(-pos_y))
-        right = min(new_w, left + w)
-        bottom = min(new_h, top + h)
-        
-        result = Image.new('RGB', (w, h), (0, 0, 0))
-        crop = pil_img.crop((left, top, right, bottom))
-        paste_x = max(0, int(pos_x))
-        paste_y = max(0, int(pos_y))
-        result.paste(crop, (paste_x, paste_y))
-        
-        return np.array(result)
+        return scale, pos_x, pos_y
     
-    from moviepy.video.VideoClip import VideoClip
-    return VideoClip(make_frame, duration=duration).set_fps(clip.fps if hasattr(clip, 'fps') else 24)
+    return render_motion_clip(clip, duration, curve, fps=clip.fps if hasattr(clip, 'fps') else 24)
 
 
 def apply_meme_zoom(clip, duration):
     """
     Meme 风格快速缩放 - 强调冲击力
-    使用 Pillow 预处理避免 MoviePy resize 的 ANTIALIAS 兼容性问题
+    使用统一运镜引擎（仿射变换）避免 MoviePy resize 的 ANTIALIAS 兼容性问题
     """
     w, h = clip.size
     
-    def make_frame(t):
+    def curve(t):
         progress = t / duration
         if progress < 0.1:
             scale = 1.0 + 0.1 * (progress / 0.1)
         else:
             scale = 1.1
-        
-        frame = clip.get_frame(t)
-        pil_img = Image.fromarray(frame)
-        new_w, new_h = int(w * scale), int(h * scale)
-        pil_img = pil_img.resize((new_w, new_h), Image.LANCZOS)
-        
-        # 裁剪回原始尺寸（居中）
-        left = (new_w - w) // 2
-        top = (new_h - h) // 2
-        right = left + w
-        bottom = top + h
-        pil_img = pil_img.crop((left, top, right, bottom))
-        
-        return np.array(pil_img)
+        return (scale,) + centered_position(w, h, scale)
     
-    from moviepy.video.VideoClip import VideoClip
-    return VideoClip(make_frame, duration=duration).set_fps(clip.fps if hasattr(clip, 'fps') else 24)
+    return render_motion_clip(clip, duration, curve, fps=clip.fps if hasattr(clip, 'fps') else 24)
 
 
 def apply_cinematic_fade(clip, duration, fade_in=0.4, fade_out=0.4):
@@ -540,19 +534,21 @@ def apply_cinematic_fade(clip, duration, fade_in=0.4, fade_out=0.4):
     return clip.fadein(fade_in).fadeout(fade_out)
 
 
+def text_entrance_position(t):
+    """字幕入场的上滑位置曲线（MoviePy set_position 写法）"""
+    if t < TEXT_FADE_DURATION:
+        progress = t / TEXT_FADE_DURATION
+        ease = 1 - math.pow(1 - progress, 3)
+        return ('center', 0.75 + 0.05 * (1 - ease))
+    return ('center', 0.75)
+
+
 def apply_text_entrance(txt_clip, duration):
     """
     字幕动态入场效果
     """
-    def slide_up(t):
-        if t < 0.3:
-            progress = t / 0.3
-            ease = 1 - math.pow(1 - progress, 3)
-            return ('center', 0.75 + 0.05 * (1 - ease))
-        return ('center', 0.75)
-    
-    txt_clip = txt_clip.set_position(slide_up)
-    txt_clip = txt_clip.fadein(0.3)
+    txt_clip = txt_clip.set_position(text_entrance_position)
+    txt_clip = txt_clip.fadein(TEXT_FADE_DURATION)
     
     return txt_clip
 
@@ -575,12 +571,12 @@ def add_scene_transitions(clips, transition_type='fade', transition_duration=0.5
     result_clips = []
     
     for i, clip in enumerate(clips):
-        if i == 0:
-            result_clips.append(clip.fadeout(transition_duration))
-        elif i == len(clips) - 1:
-            result_clips.append(clip.fadein(transition_duration))
-        else:
-            result_clips.append(clip.fadein(transition_duration).fadeout(transition_duration))
+        fade_in, fade_out = scene_transition_fades(i, len(clips), transition_duration)
+        if fade_in:
+            clip = clip.fadein(fade_in)
+        if fade_out:
+            clip = clip.fadeout(fade_out)
+        result_clips.append(clip)
     
     return result_clips
 
@@ -707,16 +703,15 @@ except:
     pass  # 非 Streamlit 环境下忽略
 
 # 🎵 BGM 风格路由系统
-def get_bgm_by_style(style_name, video_duration):
+def get_bgm_path_by_style(style_name):
     """
-    根据风格随机抽取一首 BGM，并根据视频时长自动循环和调整音量
+    根据风格随机抽取一首 BGM 文件
     
     Args:
         style_name: 风格名称（如 "🗡️ 认知刺客流（冲击力+优越感）"）
-        video_duration: 视频总时长（秒）
     
     Returns:
-        AudioFileClip: 处理后的 BGM 音频剗辑，已调整音量和时长
+        str: BGM 路径，找不到时返回 None
     """
     # 风格与文件夹的映射
     # 风格与文件夹的映射 - 5大升级版爆款风格
@@ -731,9 +726,9 @@ def get_bgm_by_style(style_name, video_duration):
     folder_name = style_folder_map.get(style_name, "assassin")
     bgm_dir = os.path.join("assets", "bgm", folder_name)
     
-    # 从目录下随机选一首歌
+    # 从目录下随机选一首歌（目录列表按 mtime 缓存）
     if os.path.exists(bgm_dir):
-        bgm_files = [f for f in os.listdir(bgm_dir) if f.endswith(('.mp3', '.wav'))]
+        bgm_files = get_audio_asset_cache().list_files(bgm_dir)
         if bgm_files:
             selected_bgm = random.choice(bgm_files)
             bgm_path = os.path.join(bgm_dir, selected_bgm)
@@ -756,36 +751,55 @@ def get_bgm_by_style(style_name, video_duration):
             st.error("❌ 未找到 BGM 文件！请在 assets 目录下添加 bgm.mp3")
             return None
     
+    return bgm_path
+
+def get_bgm_volume(style_name):
+    """BGM 基准音量（通常设为 0.08 - 0.30）；说话时的闪避与整体响度由混音阶段自动处理"""
+    # 与各风格 STYLE_CONFIGS 中 bgm_style 描述的音量一致
+    volume_map = {
+        "治愈系·观察者": 0.12,
+        "认知重塑·破壁人": 0.15,
+        "逆袭见证·养成系": 0.08,
+        "情绪过山车·发疯艺术家": 0.30,
+        "萌即正义·哲学大师": 0.20
+    }
+    
+    # 兼容带 emoji 前缀的风格名（如 "🎬 治愈系·观察者"）
+    name = (style_name or "").strip()
+    return volume_map.get(name, volume_map.get(name.split(" ", 1)[-1], 0.1))
+
+def get_bgm_by_style(style_name, video_duration):
+    """
+    根据风格随机抽取一首 BGM，并根据视频时长自动循环和调整音量
+    
+    Args:
+        style_name: 风格名称（如 "🗡️ 认知刺客流（冲击力+优越感）"）
+        video_duration: 视频总时长（秒）
+    
+    Returns:
+        np.ndarray: 已循环（接缝交叉淡化）/ 截断到视频时长并乘以风格音量的 PCM，失败返回 None
+    """
+    bgm_path = get_bgm_path_by_style(style_name)
+    if not bgm_path:
+        return None
+    
     try:
-        # 加载音频
-        bgm_clip = AudioFileClip(bgm_path)
+        # 核心处理 1：BGM 短于视频时循环播放，否则截取所需长度（解码结果进程内共享）
+        bgm = get_audio_asset_cache().loop(bgm_path, video_duration)
         
-        # 核心处理 1：如果 BGM 短于视频，则循环播放
-        if bgm_clip.duration < video_duration:
-            # 使用 afx.audio_loop 循环播放
-            bgm_clip = afx.audio_loop(bgm_clip, duration=video_duration)
-        else:
-            # 截取所需长度
-            bgm_clip = bgm_clip.subclip(0, video_duration)
-            
-        # 核心处理 2：设置 BGM 音量（通常设为 0.08 - 0.25，避免盖过人声）
-        volume_map = {
-            "认知刺客 - 冲击力+优越感": 0.15,
-            "听劝养成 - 互动率04+评论爆炸": 0.08,
-            "POV沉浸 - 第一人称+代入感": 0.12,
-            "情绪宣泄 - 极致反转+发疯文学": 0.25,
-            "Meme抗象 - 低成本+病毒传播": 0.20
-        }
-        
-        volume = volume_map.get(style_name, 0.1)
-        return bgm_clip.volumex(volume)
+        # 核心处理 2：设置 BGM 音量
+        return bgm * np.float32(get_bgm_volume(style_name))
         
     except Exception as e:
         st.error(f"❌ BGM 加载失败: {e}")
         return None
 
 def create_subtitle_image(text, width=1080, height=400, fontsize=70):
-    """🎨 用 Pillow 手工绘制字幕图片（彻底绕过 ImageMagick）"""
+    """🎨 用 Pillow 手工绘制字幕图片（彻底绕过 ImageMagick）
+    
+    字体、字宽与成品 RGBA 都有进程内缓存，相同字幕重复渲染直接命中；
+    返回的数组为只读，需要修改时请先 copy。
+    """
     # 确保文本是字符串类型
     if not isinstance(text, str):
         text = str(text) if text else ""
@@ -796,68 +810,19 @@ def create_subtitle_image(text, width=1080, height=400, fontsize=70):
     if not FONT_PATH:
         raise FileNotFoundError("未找到字体文件！请确保 font.ttf 存在于仓库根目录")
     
-    # 创建透明背景图片
-    img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-    
     # 加载字体 - 使用更健壮的加载方式
     try:
-        font = ImageFont.truetype(FONT_PATH, fontsize)
-    except Exception as e:
+        return get_subtitle_rasterizer(FONT_PATH).render(text, width, height, fontsize)
+    except OSError as e:
         st.error(f"字体加载失败: {e}")
         # 尝试使用默认字体
-        try:
-            font = ImageFont.load_default()
-            st.warning("使用默认字体，中文字符可能显示为方框")
-        except:
-            raise
-    
-    # 文本自动换行
-    lines = []
-    words = text
-    max_width = width - 100  # 左右边距50px
-    
-    # 简单换行逻辑：按字符宽度切分
-    current_line = ""
-    for char in words:
-        test_line = current_line + char
-        bbox = draw.textbbox((0, 0), test_line, font=font)
-        if bbox[2] - bbox[0] > max_width and current_line:
-            lines.append(current_line)
-            current_line = char
-        else:
-            current_line = test_line
-    if current_line:
-        lines.append(current_line)
-    
-    # 计算总高度并居中
-    line_height = fontsize + 20
-    total_height = len(lines) * line_height
-    start_y = (height - total_height) // 2
-    
-    # 绘制每行文字（先画黑边，再画白字）
-    for i, line in enumerate(lines):
-        bbox = draw.textbbox((0, 0), line, font=font)
-        text_width = bbox[2] - bbox[0]
-        x = (width - text_width) // 2
-        y = start_y + i * line_height
-        
-        # 黑色描边（stroke效果）
-        for offset_x in [-2, 0, 2]:
-            for offset_y in [-2, 0, 2]:
-                if offset_x != 0 or offset_y != 0:
-                    draw.text((x + offset_x, y + offset_y), line, font=font, fill=(0, 0, 0, 255))
-        
-        # 白色主文字
-        draw.text((x, y), line, font=font, fill=(255, 255, 255, 255))
-    
-    # 转为 numpy 数组供 MoviePy 使用
-    return np.array(img)
+        st.warning("使用默认字体，中文字符可能显示为方框")
+        return get_subtitle_rasterizer(None).render(text, width, height, fontsize)
 
-def call_volcengine_tts(text, voice_id, output_path):
+async def call_volcengine_tts(text, voice_id, output_path):
     """
-    通过调用官方 V3 bidirection.py 脚本来生成豆包大模型音频
-    支持 WebSocket 流式传输，适用于豆包语音合成模型 2.0
+    通过进程内 WebSocket 客户端生成豆包大模型音频（V3 双向流式协议）
+    长连接常驻复用，每段只开一个会话，音频分块边收边写盘；多段可并发合成
     """
     try:
         # 1. 安全获取鉴权信息
@@ -868,51 +833,29 @@ def call_volcengine_tts(text, voice_id, output_path):
             # 如果没有配置火山引擎，回退到 Edge TTS
             return False
         
-        # 2. 官方脚本路径
-        script_path = os.path.join(os.path.dirname(__file__), "examples", "volcengine", "bidirection.py")
-        
-        if not os.path.exists(script_path):
-            st.error(f"❌ 找不到火山引擎 V3 脚本: {script_path}")
-            return False
+        # TTS 缓存命中则跳过合成
+        cache_key = tts_cache_key("volc", voice_id, text)
+        if get_tts_cache().fetch(cache_key, output_path):
+            return True
         
         st.info(f"🚀 正在调用豆包语音合成大模型: {voice_id}...")
         
-        # 3. 构建命令行指令
-        command = [
-            sys.executable,  # 使用当前 Python 解释器
-            script_path,
-            "--appid", appid,
-            "--access_token", access_token,
-            "--voice_type", voice_id,
-            "--text", text,
-            "--encoding", "mp3",
-            "--output", output_path  # 指定输出路径
-        ]
+        # 2. 在常驻长连接上合成
+        await volcengine_synthesize(appid, access_token, text, voice_id, output_path,
+                                    encoding="mp3", timeout=60)
         
-        # 4. 执行脚本
-        result = subprocess.run(
-            command, 
-            check=True, 
-            capture_output=True, 
-            text=True,
-            timeout=60  # 60秒超时
-        )
-        
-        # 5. 验证输出文件
+        # 3. 验证输出文件
         if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
             st.success(f"✅ 豆包大模型音频流接收完毕！音频已保存至: {output_path}")
+            get_tts_cache().store(cache_key, output_path)
             return True
         else:
             st.error(f"❌ 输出文件未生成或为空: {output_path}")
             return False
             
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         st.error("❌ 火山引擎 TTS 超时（60秒）")
         return False
-    except subprocess.CalledProcessError as e:
-        st.error(f"❌ 火山大模型合成失败，官方脚本报错信息：")
-        st.error(e.stderr)
-        return False
     except Exception as e:
         st.error(f"❌ 火山引擎 TTS 调用异常: {e}")
         return False
@@ -924,7 +867,7 @@ async def text_to_mp3(text, filename, voice_id="zh-CN-YunxiNeural"):
     if voice_id.startswith("volc_"):
         # 去掉前缀，获取真实的音色 ID
         real_voice_id = voice_id.replace("volc_", "")
-        success = call_volcengine_tts(text, real_voice_id, filename)
+        success = await call_volcengine_tts(text, real_voice_id, filename)
         if success:
             return True
         else:
@@ -933,15 +876,21 @@ async def text_to_mp3(text, filename, voice_id="zh-CN-YunxiNeural"):
             voice_id = "zh-CN-YunxiNeural"  # 使用默认男声
     
     # 🎹️ 路由 2：Edge TTS (免费兼底)
+    cache_key = tts_cache_key("edge", voice_id, text, rate="+10%")
+    if get_tts_cache().fetch(cache_key, filename):
+        return True
+    
     for attempt in range(3):
         try:
             # 🎵 支持SSML情绪标签：如果文本中包含<prosody>标签，Edge TTS会自动识别
             # 注意：Edge TTS原生支持SSML，直接传入包含<prosody>的文本即可
             communicate = edge_tts.Communicate(text, voice_id, rate="+10%")
-            await communicate.save(filename)
+            # 流式写盘，同时记录句子时间戳（字幕逐句对齐、读取时长都不必再解码）
+            await save_with_timing(communicate, filename)
             
             # 🔥 新增：验证文件是否生成成功
             if os.path.exists(filename) and os.path.getsize(filename) > 0:
+                get_tts_cache().store(cache_key, filename)
                 return True
             else:
                 st.error(f"❌ 音频文件生成失败或为空: {filename}")
@@ -974,11 +923,15 @@ async def synthesize_emotional_segment(text, vibe, output_file, use_volcengine=F
     if use_volcengine:
         # 使用火山引擎：直接调用，通过音色切换实现情绪
         voice_id = vibe_config["volc_voice"]
-        success = call_volcengine_tts(text, voice_id, output_file)
+        success = await call_volcengine_tts(text, voice_id, output_file)
         return success
     else:
         # 使用 Edge TTS：通过参数控制
         params = vibe_config["edge_params"]
+        cache_key = tts_cache_key("edge", "zh-CN-YunxiNeural", text, rate=params["rate"],
+                                  pitch=params["pitch"], volume=params["volume"])
+        if get_tts_cache().fetch(cache_key, output_file):
+            return True
         try:
             communicate = edge_tts.Communicate(
                 text, 
@@ -987,9 +940,10 @@ async def synthesize_emotional_segment(text, vibe, output_file, use_volcengine=F
                 pitch=params["pitch"],
                 volume=params["volume"]
             )
-            await communicate.save(output_file)
+            await save_with_timing(communicate, output_file)
             
             if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+                get_tts_cache().store(cache_key, output_file)
                 return True
             else:
                 return False
@@ -997,36 +951,61 @@ async def synthesize_emotional_segment(text, vibe, output_file, use_volcengine=F
             st.warning(f"⚠️ 情绪片段 [{vibe}] 生成失败: {e}")
             return False
 
-async def synthesize_emotional_segments_parallel(segments, use_volcengine=False):
+def volcengine_configured():
+    """是否配置了火山引擎鉴权信息"""
+    try:
+        return bool(st.secrets.get("VOLC_APPID", "") and st.secrets.get("VOLC_ACCESS_TOKEN", ""))
+    except Exception:
+        return False
+
+def emotional_segment_routes(text, vibe, use_volcengine=False):
+    """
+    情绪片段的合成路由：火山引擎（已配置时）→ Edge TTS
+    火山引擎重试耗尽后按片段回退到 Edge，不影响其他片段
+    """
+    vibe_config = VIBE_ROUTING_TABLE.get(vibe, VIBE_ROUTING_TABLE["neutral_narrate"])
+    routes = []
+    if use_volcengine and volcengine_configured():
+        routes.append(SynthesisRoute(
+            "volc", lambda path: call_volcengine_tts(text, vibe_config["volc_voice"], path)
+        ))
+    routes.append(SynthesisRoute(
+        "edge", lambda path: synthesize_emotional_segment(text, vibe, path, use_volcengine=False)
+    ))
+    return routes
+
+async def synthesize_emotional_segments_parallel(segments, use_volcengine=False, scheduler=None):
     """
     并行合成多个情绪片段（核心加速逻辑）
     
+    由 SynthesisScheduler 调度：限制并发与请求速率，失败按指数退避重试，
+    慢请求发对冲请求，火山引擎持续失败时该片段回退到 Edge TTS。
+    
     Args:
         segments: 片段列表 [{"text": "...", "vibe": "..."}, ...]
         use_volcengine: 是否使用火山引擎
+        scheduler: SynthesisScheduler（默认每批新建；传入时可在调用后读取 stats 计数）
     
     Returns:
-        list: 成功生成的音频文件路径列表
+        list: 与 segments 一一对应的音频文件路径，失败为 None
     """
+    scheduler = scheduler or SynthesisScheduler()
+    if use_volcengine and not volcengine_configured():
+        st.warning("⚠️ 未配置火山引擎，情绪片段使用 Edge TTS 合成")
+    
     tasks = []
     output_files = []
-    
     for i, seg in enumerate(segments):
         output_file = f"temp_emotional_segment_{i}_{uuid.uuid4().hex[:8]}.mp3"
         output_files.append(output_file)
-        
-        # 创建并行任务
-        task = synthesize_emotional_segment(
-            text=seg.get("text", ""),
-            vibe=seg.get("vibe", "neutral_narrate"),
-            output_file=output_file,
-            use_volcengine=use_volcengine
-        )
-        tasks.append(task)
+        vibe = seg.get("vibe", "neutral_narrate")
+        tasks.append(SynthesisTask(output_file, emotional_segment_routes(seg.get("text", ""), vibe, use_volcengine),
+                                   label=f"片段 {i+1}"))
     
-    # 🚀 关键：并行执行所有任务（5个片段 = 1个片段的时间）
+    # 🚀 关键：限流并发执行所有任务
     st.info(f"🎬 并行合成 {len(segments)} 个情绪片段...")
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    results = await scheduler.run(tasks)
+    st.caption(f"⏱️ {scheduler.stats.summary()}")
     
     # 验证结果
     success_files = []
@@ -1053,87 +1032,666 @@ def concatenate_audio_segments_with_breath(audio_files, output_path, breath_dura
         str: 输出文件路径，失败返回 None
     """
     try:
-        # 加载所有有效的音频片殶
-        clips = []
+        # 所有片段解码到同一条 PCM 时间线，停顿为零采样
+        timeline = AudioTimeline()
+        segment_count = 0
         for i, file in enumerate(audio_files):
             if file and os.path.exists(file):
                 try:
-                    clip = AudioFileClip(file)
-                    clips.append(clip)
+                    timeline.append(decode_audio(file))
+                    segment_count += 1
                     
-                    # 在片殶之间插入静音（模拟呼吸）
+                    # 在片段之间插入静音（模拟呼吸）
                     if i < len(audio_files) - 1:  # 不在最后一个后面加
-                        # 创建静音片殶
-                        silence = AudioFileClip(file).volumex(0).subclip(0, breath_duration)
-                        clips.append(silence)
+                        timeline.append_silence(breath_duration)
                 except Exception as e:
-                    st.warning(f"⚠️ 片殶 {i+1} 加载失败: {e}")
+                    st.warning(f"⚠️ 片段 {i+1} 加载失败: {e}")
         
-        if not clips:
-            st.error("❌ 没有有效的音频片殶")
+        if not segment_count:
+            st.error("❌ 没有有效的音频片段")
             return None
         
-        # 🎵 拼接所有片殶
-        final_audio = concatenate_audioclips(clips)
-        final_audio.write_audiofile(output_path, codec='libmp3lame')
+        # 🎵 一次编码输出
+        timeline.write(output_path, duration=timeline.cursor / timeline.sample_rate)
         
-        # 清理临时文件
-        for clip in clips:
-            clip.close()
-        for file in audio_files:
-            if file and os.path.exists(file):
-                try:
-                    os.remove(file)
-                except:
-                    pass
+        # 清理临时文件（连同时间戳旁路文件）
+        _cleanup_temp_files(audio_files)
         
-        st.success(f"✅ 音频拼接完成，共 {len(clips)} 个片殶")
+        st.success(f"✅ 音频拼接完成，共 {segment_count} 个片段")
         return output_path
         
     except Exception as e:
         st.error(f"❌ 音频拼接失败: {e}")
         return None
 
-def generate_all_audios_sync(scenes_data, voice_id="zh-CN-YunxiNeural"):
-    """串行生成所有分镜配音"""
-    audio_files = []
-    failed_count = 0
+# 各 TTS 引擎的最大并发请求数
+TTS_CONCURRENCY = {
+    "edge": 6,
+    "volc": 3,
+}
+
+def tts_engine_of(voice_id):
+    """音色 ID 对应的 TTS 引擎"""
+    return "volc" if voice_id.startswith("volc_") else "edge"
+
+async def generate_all_audios(scenes_data, voice_id="zh-CN-YunxiNeural", max_concurrency=None,
+                              only=None, on_result=None):
+    """
+    在同一个事件循环中并发生成所有分镜配音
     
-    for i, scene in enumerate(scenes_data):
+    并发数按引擎限制（TTS_CONCURRENCY），每个分镜沿用 text_to_mp3 的重试与退避；
+    返回顺序与 scenes_data 一致。
+    
+    Args:
+        scenes_data: 分镜数据列表
+        voice_id: 声音 ID
+        max_concurrency: 最大并发数（默认按引擎取 TTS_CONCURRENCY）
+        only: 只生成这些序号的分镜（文件名仍按完整剧本中的序号）
+        on_result: 每个分镜完成后回调 on_result(序号, 路径或 None)
+    
+    Returns:
+        (audio_files, latencies)：音频路径（失败为 None）与各分镜耗时（秒，未生成为 None）
+    """
+    limit = max_concurrency or TTS_CONCURRENCY.get(tts_engine_of(voice_id), 2)
+    semaphore = asyncio.Semaphore(limit)
+    indices = [i for i in range(len(scenes_data)) if only is None or i in only]
+    total = len(indices)
+    done = 0
+    
+    async def synthesize(i, scene):
+        nonlocal done
         audio_file = f"temp_audio_{i}.mp3"
-        st.toast(f"🎹️ AI 配音生成中... {i+1}/{len(scenes_data)}")
-        
-        # 🔥 新增：显示当前处理的文本（前50个字符）
-        narration_preview = scene['narration'][:50] + "..." if len(scene['narration']) > 50 else scene['narration']
-        st.caption(f"📝 正在处理: {narration_preview}")
+        async with semaphore:
+            # 🔥 新增：显示当前处理的文本（前50个字符）
+            narration_preview = scene['narration'][:50] + "..." if len(scene['narration']) > 50 else scene['narration']
+            st.caption(f"📝 正在处理: {narration_preview}")
+            start = time.perf_counter()
+            try:
+                success = await text_to_mp3(scene['narration'], audio_file, voice_id)
+            except Exception as e:
+                st.error(f"❌ 分镜 {i+1} 音频生成异常: {e}")
+                success = False
+            latency = time.perf_counter() - start
         
+        done += 1
+        st.toast(f"🎹️ AI 配音生成中... {done}/{total}")
+        if success:
+            st.success(f"✅ 分镜 {i+1} 音频生成成功（{latency:.1f}s）")
+        else:
+            st.error(f"❌ 分镜 {i+1} 音频生成失败（{latency:.1f}s）")
+            audio_file = None
+        if on_result:
+            on_result(i, audio_file)
+        return audio_file, latency
+    
+    results = await asyncio.gather(*(synthesize(i, scenes_data[i]) for i in indices))
+    audio_files = [None] * len(scenes_data)
+    latencies = [None] * len(scenes_data)
+    for i, (path, latency) in zip(indices, results):
+        audio_files[i] = path
+        latencies[i] = latency
+    return audio_files, latencies
+
+def _report_audio_batch(audio_files, latencies, wall):
+    """汇报一批配音的成功数与耗时（只统计本批实际生成的分镜）"""
+    generated = [(path, latency) for path, latency in zip(audio_files, latencies) if latency is not None]
+    if not generated:
+        return
+    failed_count = sum(1 for path, _ in generated if path is None)
+    # 🔥 新增：显示总结
+    if failed_count > 0:
+        st.warning(f"⚠️ 音频生成完成，但有 {failed_count}/{len(generated)} 个失败")
+    else:
+        st.success(f"✅ 所有 {len(generated)} 个音频生成成功！")
+    
+    per_scene = " / ".join(f"{latency:.1f}s" for _, latency in generated)
+    st.caption(f"⏱️ 配音总耗时 {wall:.1f}s（各分镜：{per_scene}，"
+               f"累计 {sum(latency for _, latency in generated):.1f}s）")
+
+def generate_all_audios_sync(scenes_data, voice_id="zh-CN-YunxiNeural", max_concurrency=None, only=None):
+    """并发生成所有分镜配音（同步入口，整批只创建一次事件循环）"""
+    start = time.perf_counter()
+    audio_files, latencies = asyncio.run(generate_all_audios(scenes_data, voice_id, max_concurrency, only))
+    _report_audio_batch(audio_files, latencies, time.perf_counter() - start)
+    return audio_files
+
+def _with_script_context(func):
+    """包装 func，使其在工作线程中调用 st.* 时仍输出到当前页面"""
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    ctx = get_script_run_ctx(suppress_warning=True)
+    
+    def run(*args, **kwargs):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args, **kwargs)
+    return run
+
+# CogVideoX 生成的分镜视频（其余扩展名按图片处理）
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.webm', '.mkv')
+
+def is_video_path(path):
+    """分镜素材是否为视频片段"""
+    return bool(path) and os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
+
+def load_scene_video(video_path, dur, size=(1080, 1920)):
+    """
+    加载分镜背景视频：等比铺满目标尺寸后居中裁剪，短于 dur 时循环、长于 dur 时截断
+    
+    逐帧由 Pillow 一次完成裁剪 + 缩放（不经 MoviePy resize）；不带音轨。
+    返回的 clip 持有解码进程，用完后调用 close() 释放。
+    """
+    from moviepy.editor import VideoFileClip
+    source = VideoFileClip(video_path, audio=False)
+    target_w, target_h = size
+    src_w, src_h = source.size
+    # 源画面中与目标宽高比一致的居中区域
+    scale = max(target_w / src_w, target_h / src_h)
+    box_w, box_h = target_w / scale, target_h / scale
+    box = ((src_w - box_w) / 2, (src_h - box_h) / 2, (src_w + box_w) / 2, (src_h + box_h) / 2)
+    loop = source.duration
+    last = max(0.0, loop - 1.0 / (source.fps or 24))
+    
+    def frame(get_frame, t):
+        src = Image.fromarray(get_frame(min(t % loop, last)))
+        # 运镜还会再插值一次，逐帧缩放用双线性即可
+        return np.array(src.resize((target_w, target_h), Image.BILINEAR, box=box))
+    
+    clip = source.fl(frame, apply_to=[]).set_duration(dur)
+    clip.size = (target_w, target_h)
+    return clip
+
+def load_scene_background(image_path, dur, size=(1080, 1920)):
+    """
+    加载分镜背景：视频片段见 load_scene_video；图片由 Pillow 等比缩放到目标高度后居中裁剪
+    （失败时抛出异常）
+    """
+    if is_video_path(image_path):
+        return load_scene_video(image_path, dur, size)
+    # 🔑 核心修复：用 Pillow 预处理图片，避免 MoviePy 的 resize 触发 ANTIALIAS
+    from PIL import Image as PILImage
+    target_w, target_h = size
+    img = PILImage.open(image_path)
+    
+    # 计算缩放比例（目标高度 1920）
+    scale = target_h / img.height
+    new_width = int(img.width * scale)
+    
+    # 使用 Pillow 的 LANCZOS 重采样（兼容新旧版本）
+    try:
+        # Pillow >= 10.0.0
+        img_resized = img.resize((new_width, target_h), PILImage.Resampling.LANCZOS)
+    except AttributeError:
+        # Pillow < 10.0.0
+        img_resized = img.resize((new_width, target_h), PILImage.LANCZOS)
+    
+    # 裁剪到 1080x1920（居中裁剪）
+    left = (new_width - target_w) // 2
+    img_cropped = img_resized.crop((left, 0, left + target_w, target_h))
+    
+    # 转为 numpy 数组，传给 MoviePy（不再调用 resize）
+    img_array = np.array(img_cropped.convert('RGB'))
+    return ImageClip(img_array).set_duration(dur)
+
+def render_scene_subtitle(narration, profile=FINAL_PROFILE):
+    """清理 SSML 标签后绘制字幕，返回 RGBA 数组（只读，带缓存）；尺寸按渲染档位缩放"""
+    # 清理 SSML 标签，只保留纯文本
+    clean_narration = clean_ssml_for_subtitle(narration)
+    return create_subtitle_image(clean_narration, width=profile.scaled(1080), height=profile.scaled(400),
+                                 fontsize=profile.scaled(70, minimum=12))
+
+def scene_subtitle_cues(narration, audio_path, dur, profile=FINAL_PROFILE):
+    """
+    分镜字幕分段：配音带句级时间戳（合成时记录）且不止一句时逐句显示，
+    每句从开口显示到下一句开口；否则整段旁白贯穿分镜
+    
+    Returns:
+        [(起点秒, 终点秒, 字幕 RGBA)]
+    """
+    timing = load_speech_timing(audio_path) if audio_path else None
+    spans = sentence_spans(timing, dur)
+    if not spans:
+        return [(0.0, dur, render_scene_subtitle(narration, profile))]
+    return [(span.start, span.end, render_scene_subtitle(span.text, profile)) for span in spans]
+
+def scene_audio_duration(audio_path):
+    """配音时长：优先用合成时记录的时间戳 / MP3 帧头（不解码），都不可用时才用 MoviePy 探测"""
+    duration = audio_duration(audio_path)
+    if duration is None:
+        audio_clip = AudioFileClip(audio_path)
+        duration = audio_clip.duration
+        audio_clip.close()
+    return duration
+
+def subtitle_clip_from_rgba(subtitle_rgba, dur):
+    """把字幕 RGBA 拆分为 MoviePy 图层（RGB + Alpha 蒙版），仅 MoviePy 合成路径使用"""
+    # 🔑 核心修复：拆分 RGB 和 Alpha 通道，确保透明度正确
+    # RGBA 数组的前3个通道是颜色，第4个通道是透明度
+    rgb_array = subtitle_rgba[:, :, :3]  # 取前3个通道（RGB）
+    alpha_array = subtitle_rgba[:, :, 3] / 255.0  # 取第4个通道（Alpha），归一化到0-1
+    
+    # 创建字幕图层，明确指定 mask
+    txt_clip = ImageClip(rgb_array).set_duration(dur)
+    txt_clip = txt_clip.set_mask(ImageClip(alpha_array, ismask=True).set_duration(dur))
+    return txt_clip.set_position(('center', 0.75), relative=True)
+
+def build_subtitle_clip(narration, dur):
+    """用 Pillow 绘制字幕并拆分 RGB / Alpha，返回定位好的字幕图层"""
+    return subtitle_clip_from_rgba(render_scene_subtitle(narration), dur)
+
+def subtitle_clips_from_cues(subtitle_cues):
+    """字幕 [(起点, 终点, RGBA)] 转为各自带起点的 MoviePy 图层列表（create_animated_scene 使用）"""
+    return [subtitle_clip_from_rgba(rgba, end - start).set_start(start)
+            for start, end, rgba in subtitle_cues]
+
+def mix_scene_audio(voice_tracks, output_path, style_name=None, duration=None):
+    """
+    人声 + BGM 混音：人声按起点放到 PCM 时间线上，BGM 随人声自动闪避，
+    整体归一化到目标响度后只编码一次
+    
+    Args:
+        voice_tracks: [(人声音频路径, 起点秒)] 列表
+        output_path: 输出路径（编码器按扩展名选择，通常为 .wav）
+        style_name: 风格名称（用于匹配 BGM，未指定时尝试默认 BGM）
+        duration: 混音时长（默认到最后一段人声结束）
+    
+    Returns:
+        输出路径
+    """
+    voices = AudioTimeline()
+    for path, start in voice_tracks:
+        voices.place(voices.load(path), start)
+    if duration is None:
+        duration = voices.duration
+    
+    bgm = None
+    # 🎵 使用新的 BGM 风格路由系统
+    if style_name:
+        st.write(f"🎵 根据 {style_name} 风格匹配 BGM...")
+        bgm = get_bgm_by_style(style_name, duration)
+        if bgm is None:
+            st.warning("⚠️ BGM 加载失败，使用原始音频")
+    else:
+        # 如果没有指定风格，尝试使用默认 BGM（兼容旧版本）
+        default_bgm_paths = ["assets/bgm.mp3", "bgm.mp3"]
+        bgm_path = next((path for path in default_bgm_paths if os.path.exists(path)), None)
+        if bgm_path:
+            st.info("🎵 使用默认 BGM")
+            bgm = get_audio_asset_cache().loop(bgm_path, duration) * np.float32(0.08)
+    
+    # 🎚️ 人声侧链闪避 BGM + 响度归一化，编码前一次算好
+    mixed, report = master_mix(voices.render(duration), bgm, sample_rate=voices.sample_rate)
+    st.caption(f"🎚️ {report.summary()}")
+    return encode_audio(mixed, output_path, voices.sample_rate)
+
+def sequential_voice_tracks(audio_paths, durations):
+    """首尾相接排列的人声轨：[(路径, 起点秒)]"""
+    tracks = []
+    position = 0.0
+    for path, dur in zip(audio_paths, durations):
+        tracks.append((path, position))
+        position += dur
+    return tracks
+
+def render_scene_segment(job):
+    """
+    进程池 worker：把单个分镜（运镜 + 字幕 + 配音 + 转场淡入淡出）编码为中间片段
+    
+    运行在子进程中，不调用任何 Streamlit 接口；素材加载失败时使用黑屏占位。
+    
+    Args:
+        job: SceneSegmentJob
+    
+    Returns:
+        片段路径
+    """
+    audio_clip = AudioFileClip(job.audio_path)
+    dur = audio_clip.duration
+    
+    bg = None
+    if job.image_path:
         try:
-            success = asyncio.run(text_to_mp3(scene['narration'], audio_file, voice_id))
-            if success:
-                audio_files.append(audio_file)
-                st.success(f"✅ 分镜 {i+1} 音频生成成功")
-            else:
-                audio_files.append(None)
-                failed_count += 1
-                st.error(f"❌ 分镜 {i+1} 音频生成失败")
+            bg = load_scene_background(job.image_path, dur)
         except Exception as e:
-            audio_files.append(None)
-            failed_count += 1
-            st.error(f"❌ 分镜 {i+1} 音频生成异常: {e}")
+            print(f"分镜 {job.index + 1} 素材加载失败: {e}，使用黑屏占位")
+    if bg is None:
+        bg = ColorClip(size=(1080, 1920), color=(0, 0, 0)).set_duration(dur)
+    
+    txt_clips = subtitle_clips_from_cues(scene_subtitle_cues(job.narration, job.audio_path, dur))
+    scene = create_animated_scene(bg, txt_clips, dur, job.style_name, scene_index=job.index)
+    scene = scene.set_audio(audio_clip)
+    
+    # 分镜间转场在片段内部完成，拼接时无需再解码
+    if job.fade_in:
+        scene = scene.fadein(job.fade_in)
+    if job.fade_out:
+        scene = scene.fadeout(job.fade_out)
+    
+    scene.write_videofile(job.output_path, **job.codec.moviepy_kwargs(threads=job.threads))
+    scene.close()
+    bg.close()
+    audio_clip.close()
+    return job.output_path
+
+def render_scenes_parallel(scene_jobs, output_path, style_name=None, max_workers=None):
+    """
+    分镜并行渲染：进程池逐段编码 → 流拷贝拼接 → 一次混音封装
+    
+    Args:
+        scene_jobs: [(分镜序号, 音频路径, 图片路径, 旁白)] 列表，按播放顺序排列
+        output_path: 输出视频路径
+        style_name: 风格名称（用于匹配 BGM 与运镜）
+        max_workers: 最大进程数（默认按 CPU 核数）
+    
+    Returns:
+        bool: 是否成功
+    """
+    from render.segments import default_worker_count
+    
+    workers = max_workers or default_worker_count(len(scene_jobs))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    work_dir = tempfile.mkdtemp(prefix="videotaxi_segments_")
+    
+    try:
+        jobs = []
+        for order, (index, audio_path, image_path, narration) in enumerate(scene_jobs):
+            fade_in, fade_out = scene_transition_fades(order, len(scene_jobs))
+            jobs.append(SceneSegmentJob(
+                index=index,
+                audio_path=os.path.abspath(audio_path),
+                image_path=os.path.abspath(image_path) if image_path else None,
+                narration=narration,
+                style_name=style_name,
+                output_path=os.path.join(work_dir, f"segment_{order:03d}.mkv"),
+                fade_in=fade_in,
+                fade_out=fade_out,
+                threads=threads
+            ))
+        
+        st.write(f"⚡ 并行渲染 {len(jobs)} 个分镜（{workers} 个进程）...")
+        segment_paths = render_segments_parallel(
+            render_scene_segment, jobs, max_workers=workers,
+            on_done=lambda job: st.write(f"✅ 分镜 {job.index + 1} 片段编码完成")
+        )
+        
+        # 流拷贝拼接（不重编码）
+        st.write("🔗 无损拼接分镜片段...")
+        concat_path = os.path.join(work_dir, "concat.mkv")
+        concat_segments(segment_paths, concat_path)
         
-        asyncio.run(asyncio.sleep(0.5))
+        # 人声 + BGM 混音后只做一次 AAC 编码，视频流直接拷贝
+        mix_path = os.path.join(work_dir, "mix.wav")
+        mix_scene_audio([(concat_path, 0.0)], mix_path, style_name)
+        mux_video_audio(concat_path, mix_path, output_path)
+        return True
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+class SceneAssetCache:
+    """
+    分镜素材缓存（会话级）：草稿预览生成的图片 / 配音，正式导出时直接复用
     
-    # 🔥 新增：显示总结
-    if failed_count > 0:
-        st.warning(f"⚠️ 音频生成完成，但有 {failed_count}/{len(scenes_data)} 个失败")
+    图片按 (画面提示词, 是否视频模型)、配音按 (旁白, 音色) 建索引，只缓存生成成功的素材。
+    生成器输出的是按序号命名的临时文件，入缓存时移动到独立目录，避免下一轮生成覆盖。
+    """
+    
+    def __init__(self):
+        self._images = {}
+        self._audios = {}
+        self._dir = None
+    
+    @staticmethod
+    def image_key(scene, use_video_model=False):
+        return (scene.get('image_prompt', ''), bool(use_video_model))
+    
+    @staticmethod
+    def audio_key(scene, voice_id):
+        return (scene['narration'], voice_id)
+    
+    def _lookup(self, table, key):
+        path = table.get(key)
+        if path and os.path.exists(path):
+            return path
+        table.pop(key, None)
+        return None
+    
+    def _adopt(self, table, key, path, kind):
+        if not path or not os.path.exists(path):
+            return None
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix="videotaxi_assets_")
+        target = os.path.join(self._dir, f"{kind}_{uuid.uuid4().hex[:12]}{os.path.splitext(path)[1]}")
+        shutil.move(path, target)
+        # 配音的时间戳旁路文件随音频一起移动
+        if os.path.exists(timing_path(path)):
+            shutil.move(timing_path(path), timing_path(target))
+        table[key] = target
+        return target
+    
+    def get_image(self, scene, use_video_model=False):
+        return self._lookup(self._images, self.image_key(scene, use_video_model))
+    
+    def put_image(self, scene, use_video_model, path):
+        return self._adopt(self._images, self.image_key(scene, use_video_model), path, "image")
+    
+    def get_audio(self, scene, voice_id):
+        return self._lookup(self._audios, self.audio_key(scene, voice_id))
+    
+    def put_audio(self, scene, voice_id, path):
+        return self._adopt(self._audios, self.audio_key(scene, voice_id), path, "audio")
+    
+    def clear(self):
+        """删除所有缓存的素材文件"""
+        if self._dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+        self._dir = None
+        self._images.clear()
+        self._audios.clear()
+
+async def generate_scene_assets(scenes_data, zhipu_key, voice_id, use_video_model=False,
+                                asset_cache=None, on_image=None, on_audio=None):
+    """
+    并行生成分镜图片与配音：图片在工作线程的线程池中并发生成，配音在事件循环中并发合成
+    
+    提供 asset_cache 时只生成缓存中没有的分镜，缓存命中的素材立即回调。
+    
+    Args:
+        on_image / on_audio: 每个分镜的图片 / 配音就绪后回调 (序号, 路径或 None)，在事件循环线程中调用
+    
+    Returns:
+        (image_paths, audio_files)：与 scenes_data 一一对应，失败为 None
+    """
+    from api_services import generate_images_zhipu
+    
+    count = len(scenes_data)
+    if asset_cache is None:
+        image_paths = [None] * count
+        audio_files = [None] * count
     else:
-        st.success(f"✅ 所有 {len(scenes_data)} 个音频生成成功！")
+        image_paths = [asset_cache.get_image(scene, use_video_model) for scene in scenes_data]
+        audio_files = [asset_cache.get_audio(scene, voice_id) for scene in scenes_data]
+        reused_images = sum(1 for path in image_paths if path)
+        reused_audios = sum(1 for path in audio_files if path)
+        if reused_images:
+            st.write(f"♻️ 复用已生成的画面 {reused_images}/{count}")
+        if reused_audios:
+            st.write(f"♻️ 复用已生成的配音 {reused_audios}/{count}")
+    missing_images = {i for i, path in enumerate(image_paths) if path is None}
+    missing_audios = {i for i, path in enumerate(audio_files) if path is None}
+    
+    def image_ready(i, path):
+        if asset_cache is not None:
+            path = asset_cache.put_image(scenes_data[i], use_video_model, path)
+        image_paths[i] = path
+        if on_image:
+            on_image(i, path)
+    
+    def audio_ready(i, path):
+        if asset_cache is not None:
+            path = asset_cache.put_audio(scenes_data[i], voice_id, path)
+        audio_files[i] = path
+        if on_audio:
+            on_audio(i, path)
+    
+    for i in range(count):
+        if i not in missing_images and on_image:
+            on_image(i, image_paths[i])
+        if i not in missing_audios and on_audio:
+            on_audio(i, audio_files[i])
+    
+    loop = asyncio.get_running_loop()
+    
+    async def images():
+        if missing_images:
+            await asyncio.to_thread(
+                _with_script_context(generate_images_zhipu), scenes_data, zhipu_key,
+                use_video_model=use_video_model, only=missing_images,
+                on_result=lambda i, path: loop.call_soon_threadsafe(image_ready, i, path)
+            )
     
-    return audio_files
+    async def audios():
+        if missing_audios:
+            start = time.perf_counter()
+            _, latencies = await generate_all_audios(scenes_data, voice_id, only=missing_audios,
+                                                     on_result=audio_ready)
+            _report_audio_batch(audio_files, latencies, time.perf_counter() - start)
+    
+    await asyncio.gather(images(), audios())
+    return image_paths, audio_files
+
+def prepare_scene_assets(scenes_data, zhipu_key, voice_id, use_video_model=False, asset_cache=None):
+    """
+    生成分镜图片与配音（同步入口）；提供 asset_cache 时只生成缓存中没有的分镜
+    
+    Returns:
+        (image_paths, audio_files)：与 scenes_data 一一对应，失败为 None
+    """
+    return asyncio.run(generate_scene_assets(scenes_data, zhipu_key, voice_id, use_video_model,
+                                             asset_cache))
+
+def encode_scene_segment(index, count, image_path, audio_path, narration, output_path,
+                         style_name=None, profile=FINAL_PROFILE):
+    """
+    把单个分镜（运镜 + 字幕 + 转场淡入淡出）流式编码为无音轨片段
+    
+    在工作线程中运行，不调用 Streamlit 接口；素材加载失败时使用黑屏占位。
+    
+    Returns:
+        (片段路径, 帧数)
+    """
+    dur = scene_audio_duration(audio_path)
+    
+    bg = None
+    if image_path:
+        try:
+            bg = load_scene_background(image_path, dur, size=profile.size)
+        except Exception as e:
+            print(f"分镜 {index + 1} 素材加载失败: {e}，使用黑屏占位")
+    if bg is None:
+        bg = ColorClip(size=profile.size, color=(0, 0, 0)).set_duration(dur)
+    
+    fade_in, fade_out = scene_transition_fades(index, count)
+    layers = build_scene_layers(bg, scene_subtitle_cues(narration, audio_path, dur, profile), dur,
+                                style_name, index, fade_in, fade_out)
+    compositor = FrameCompositor([layers], profile.size, profile.fps)
+    writer = FFmpegFrameWriter(output_path, profile.size, profile.fps, preset=profile.preset,
+                               threads=profile.threads, ffmpeg_params=profile.ffmpeg_params())
+    stream_frames(compositor.compose, compositor.frame_count, writer, compositor.new_buffer)
+    bg.close()
+    return output_path, compositor.frame_count
+
+# 边生成边渲染时同时编码的分镜片段数（图片并发生成、到齐时间接近，串行编码会让尾部耗时累加）
+DATAFLOW_ENCODE_CONCURRENCY = 2
+
+async def render_scenes_dataflow(scenes_data, zhipu_key, output_path, voice_id="zh-CN-YunxiNeural",
+                                 style_name=None, use_video_model=False, profile=FINAL_PROFILE,
+                                 asset_cache=None):
+    """
+    边生成边渲染：分镜的图片与配音都到齐后立即编码该分镜片段，其余分镜继续生成
+    
+    片段按就绪顺序编码（最多同时 DATAFLOW_ENCODE_CONCURRENCY 个），全部完成后按剧本顺序流拷贝拼接；
+    人声按各片段的实际帧数定位后与 BGM 混音，只做一次音频编码。
+    
+    Returns:
+        (success, image_paths, audio_files)：失败时调用方可用已生成的素材走其他导出路径
+    """
+    count = len(scenes_data)
+    barrier = SceneReadyBarrier(count, ("image", "audio"))
+    work_dir = tempfile.mkdtemp(prefix="videotaxi_dataflow_")
+    segments = {}
+    start = time.perf_counter()
+    
+    encode_slots = asyncio.Semaphore(DATAFLOW_ENCODE_CONCURRENCY)
+    
+    async def encode_scene(ready):
+        i = ready.index
+        async with encode_slots:
+            st.write(f"🎬 分镜 {i+1} 开始编码（{ready.ready_at:.1f}s 就绪）...")
+            try:
+                segments[i] = await asyncio.to_thread(
+                    encode_scene_segment, i, count, ready.assets["image"], ready.assets["audio"],
+                    scenes_data[i]['narration'], os.path.join(work_dir, f"segment_{i:03d}.mp4"),
+                    style_name, profile
+                )
+                st.write(f"✅ 分镜 {i+1} 片段编码完成")
+            except Exception as e:
+                st.error(f"❌ 分镜 {i+1} 片段编码失败: {e}")
+    
+    async def encode_ready_scenes():
+        encodes = []
+        try:
+            async for ready in barrier:
+                audio_path = ready.assets["audio"]
+                if not audio_path or not os.path.exists(audio_path):
+                    st.warning(f"⚠️ 分镜 {ready.index+1} 音频生成失败或文件不存在，跳过")
+                    continue
+                encodes.append(asyncio.create_task(encode_scene(ready)))
+            await asyncio.gather(*encodes)
+        except BaseException:
+            for task in encodes:
+                task.cancel()
+            raise
+    
+    try:
+        encoder = asyncio.create_task(encode_ready_scenes())
+        try:
+            image_paths, audio_files = await generate_scene_assets(
+                scenes_data, zhipu_key, voice_id, use_video_model, asset_cache,
+                on_image=lambda i, path: barrier.put(i, "image", path),
+                on_audio=lambda i, path: barrier.put(i, "audio", path)
+            )
+        except BaseException:
+            encoder.cancel()
+            raise
+        assets_done = time.perf_counter() - start
+        await encoder
+        
+        order = [i for i in range(count) if i in segments]
+        if not order:
+            return False, image_paths, audio_files
+        
+        # 流拷贝拼接（不重编码）
+        st.write("🔗 无损拼接分镜片段...")
+        concat_path = os.path.join(work_dir, "concat.mp4")
+        concat_segments([segments[i][0] for i in order], concat_path)
+        
+        # 人声按片段实际帧数定位，保证拼接后音画同步
+        voice_tracks = sequential_voice_tracks([audio_files[i] for i in order],
+                                               [segments[i][1] / profile.fps for i in order])
+        duration = sum(segments[i][1] for i in order) / profile.fps
+        mix_path = os.path.join(work_dir, "mix.wav")
+        mix_scene_audio(voice_tracks, mix_path, style_name, duration)
+        mux_video_audio(concat_path, mix_path, output_path, audio_bitrate=profile.audio_bitrate)
+        
+        st.caption(f"⚡ 首个分镜 {barrier.first_ready_at:.1f}s 就绪，素材全部生成 {assets_done:.1f}s，"
+                   f"成片 {time.perf_counter() - start:.1f}s")
+        return True, image_paths, audio_files
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
 def render_ai_video_pipeline(scenes_data, zhipu_key, output_path, pexels_key=None, 
                               voice_id="zh-CN-YunxiNeural", style_name=None, 
-                              use_video_model=False):
+                              use_video_model=False, parallel_render=False, max_workers=None,
+                              streaming_export=True, draft=False, asset_cache=None):
     """核心视频渲染管线
     
     Args:
@@ -1144,15 +1702,37 @@ def render_ai_video_pipeline(scenes_data, zhipu_key, output_path, pexels_key=Non
         voice_id: 声音 ID
         style_name: 风格名称（用于匹配 BGM）
         use_video_model: 是否使用 CogVideoX-3 视频生成模型（默认False使用图片）
+        parallel_render: 是否按分镜多进程并行渲染（片段无损拼接）
+        max_workers: 并行渲染的最大进程数（默认按 CPU 核数）
+        streaming_export: 是否使用流式原始帧导出（默认开启：分镜素材到齐即编码，失败时回退整批导出 / MoviePy）
+        draft: 草稿预览（360x640@12fps，效果在低分辨率下求值，不走并行渲染）
+        asset_cache: SceneAssetCache，提供时复用 / 保留生成的图片与配音（由调用方负责清理）
     """
-    from api_services import generate_images_zhipu
+    profile = DRAFT_PROFILE if draft else FINAL_PROFILE
     
     # 1. 资源生成
     media_type = "视频" if use_video_model else "图片"
     st.info(f"🎬 使用智谱 {'CogVideoX-3' if use_video_model else 'CogView-4'} 生成{media_type}...")
     
-    image_paths = generate_images_zhipu(scenes_data, zhipu_key, use_video_model=use_video_model)
-    audio_files = generate_all_audios_sync(scenes_data, voice_id)  # 传递 voice_id
+    # ⚡ 边生成边渲染：分镜素材到齐即编码（并行渲染走进程池路径）
+    image_paths = audio_files = None
+    if streaming_export and not (parallel_render and not draft):
+        try:
+            success, image_paths, audio_files = asyncio.run(render_scenes_dataflow(
+                scenes_data, zhipu_key, output_path, voice_id, style_name, use_video_model,
+                profile, asset_cache
+            ))
+            if success:
+                if asset_cache is None:
+                    _cleanup_temp_files([p for p in image_paths if p] + [a for a in audio_files if a])
+                return True
+        except Exception as e:
+            st.warning(f"⚠️ 边生成边渲染失败，回退到整批导出: {e}")
+            image_paths = audio_files = None
+    
+    if image_paths is None:
+        image_paths, audio_files = prepare_scene_assets(scenes_data, zhipu_key, voice_id,
+                                                        use_video_model, asset_cache)
     
     # 🔍 调试信息：显示成功生成的图片数量
     success_count = sum(1 for p in image_paths if p)
@@ -1167,10 +1747,31 @@ def render_ai_video_pipeline(scenes_data, zhipu_key, output_path, pexels_key=Non
         st.error("❌ 所有音频生成失败！请检查网络连接或TTS配置")
         return False
     
-    scene_clips = []
-    temp_files = []
+    # 缓存中的素材留给下一次渲染复用
+    if asset_cache is None:
+        temp_files = [p for p in image_paths if p] + [a for a in audio_files if a]
+    else:
+        temp_files = []
+    
+    # ⚡ 分镜并行渲染（失败时回退到串行合成；草稿不走并行）
+    if parallel_render and not draft:
+        scene_jobs = []
+        for i, scene in enumerate(scenes_data):
+            if not audio_files[i] or not os.path.exists(audio_files[i]):
+                st.warning(f"⚠️ 分镜 {i+1} 音频生成失败或文件不存在，跳过")
+                continue
+            scene_jobs.append((i, audio_files[i], image_paths[i], scene['narration']))
+        
+        try:
+            render_scenes_parallel(scene_jobs, output_path, style_name, max_workers)
+            _cleanup_temp_files(temp_files)
+            return True
+        except Exception as e:
+            st.warning(f"⚠️ 并行渲染失败，回退到串行渲染: {e}")
+    
+    scene_parts = []
 
-    # 2. 逐分镜合成
+    # 2. 逐分镜准备素材
     for i, scene in enumerate(scenes_data):
         # 🔥 修复：先检查audio_files[i]是否为None，再检查文件是否存在
         if not audio_files[i] or not os.path.exists(audio_files[i]): 
@@ -1178,117 +1779,129 @@ def render_ai_video_pipeline(scenes_data, zhipu_key, output_path, pexels_key=Non
             continue
             
         try:
-            audio_clip = AudioFileClip(audio_files[i])
-            dur = audio_clip.duration
-            temp_files.append(audio_files[i])
+            # 时长取自合成时记录的时间戳 / MP3 帧头，不解码音频
+            dur = scene_audio_duration(audio_files[i])
         except Exception as e:
             st.error(f"❌ 分镜 {i+1} 音频加载失败: {e}")
             continue
         
-        # 画面逻辑：AI绘画 > 黑屏占位
+        # 画面逻辑：AI视频 / AI绘画 > 黑屏占位
         if image_paths[i]:
-            st.write(f"🖼️ 分镜 {i+1} 使用AI绘画: {image_paths[i]}")
+            media_type = "AI视频" if is_video_path(image_paths[i]) else "AI绘画"
+            st.write(f"🖼️ 分镜 {i+1} 使用{media_type}: {image_paths[i]}")
             try:
-                # 🔑 核心修复：用 Pillow 预处理图片，避免 MoviePy 的 resize 触发 ANTIALIAS
-                from PIL import Image as PILImage
-                img = PILImage.open(image_paths[i])
-                
-                # 计算缩放比例（目标高度 1920）
-                scale = 1920 / img.height
-                new_width = int(img.width * scale)
-                
-                # 使用 Pillow 的 LANCZOS 重采样（兼容新旧版本）
-                try:
-                    # Pillow >= 10.0.0
-                    img_resized = img.resize((new_width, 1920), PILImage.Resampling.LANCZOS)
-                except AttributeError:
-                    # Pillow < 10.0.0
-                    img_resized = img.resize((new_width, 1920), PILImage.LANCZOS)
-                
-                # 裁剪到 1080x1920（居中裁剪）
-                left = (new_width - 1080) // 2
-                img_cropped = img_resized.crop((left, 0, left + 1080, 1920))
-                
-                # 转为 numpy 数组，传给 MoviePy（不再调用 resize）
-                img_array = np.array(img_cropped)
-                bg = ImageClip(img_array).set_duration(dur)
-                temp_files.append(image_paths[i])
-                st.success(f"✅ 分镜 {i+1} 图片处理成功")
+                bg = load_scene_background(image_paths[i], dur, size=profile.size)
+                st.success(f"✅ 分镜 {i+1} 素材处理成功")
             except Exception as e:
-                st.error(f"❌ 分镜 {i+1} 图片加载失败: {e}，使用黑屏占位")
-                bg = ColorClip(size=(1080, 1920), color=(0, 0, 0)).set_duration(dur)
+                st.error(f"❌ 分镜 {i+1} 素材加载失败: {e}，使用黑屏占位")
+                bg = ColorClip(size=profile.size, color=(0, 0, 0)).set_duration(dur)
         else:
             st.write(f"⚫ 分镜 {i+1} 图片为空，使用黑屏占位")
             # 🔑 修复：使用 ColorClip 创建纯黑背景
-            bg = ColorClip(size=(1080, 1920), color=(0, 0, 0)).set_duration(dur)
+            bg = ColorClip(size=profile.size, color=(0, 0, 0)).set_duration(dur)
 
-        # 🎨 字幕逻辑：用 Pillow 手工绘制 + 正确处理透明度
-        # 清理 SSML 标签，只保留纯文本
-        clean_narration = clean_ssml_for_subtitle(scene['narration'])
-        subtitle_rgba = create_subtitle_image(clean_narration, width=1080, height=400, fontsize=70)
-        
-        # 🔑 核心修复：拆分 RGB 和 Alpha 通道，确保透明度正确
-        # RGBA 数组的前3个通道是颜色，第4个通道是透明度
-        rgb_array = subtitle_rgba[:, :, :3]  # 取前3个通道（RGB）
-        alpha_array = subtitle_rgba[:, :, 3] / 255.0  # 取第4个通道（Alpha），归一化到0-1
-        
-        # 创建字幕图层，明确指定 mask
-        txt_clip = ImageClip(rgb_array).set_duration(dur)
-        txt_clip = txt_clip.set_mask(ImageClip(alpha_array, ismask=True).set_duration(dur))
-        txt_clip = txt_clip.set_position(('center', 0.75), relative=True)
+        # 🎨 字幕逻辑：用 Pillow 手工绘制 + 正确处理透明度；有句级时间戳时逐句显示
+        subtitle_cues = scene_subtitle_cues(scene['narration'], audio_files[i], dur, profile)
         
         # 🎬 添加动画效果（根据风格选择动画策略）
         st.write(f"🎬 为分镜 {i+1} 添加 AI 转场动画...")
-        animated_scene = create_animated_scene(bg, txt_clip, dur, style_name, scene_index=i)
-        
-        scene_clips.append(animated_scene.set_audio(audio_clip))
+        scene_parts.append((i, bg, subtitle_cues, dur, audio_files[i]))
 
-    # 3. 添加场景间转场效果
+    if not scene_parts: return False
+    
+    # 3. 流式导出：逐帧合成直接写入 ffmpeg（失败时回退到 MoviePy 合成）
+    if streaming_export:
+        try:
+            stats = export_scenes_streaming(scene_parts, output_path, style_name, profile=profile)
+            st.caption(f"⚡ {stats.summary()}")
+            _cleanup_temp_files(temp_files)
+            return True
+        except Exception as e:
+            st.warning(f"⚠️ 流式导出失败，回退到 MoviePy 导出: {e}")
+    
+    scene_clips = []
+    for i, bg, subtitle_cues, dur, audio_path in scene_parts:
+        txt_clips = subtitle_clips_from_cues(subtitle_cues)
+        animated_scene = create_animated_scene(bg, txt_clips, dur, style_name, scene_index=i)
+        scene_clips.append(animated_scene.set_audio(AudioFileClip(audio_path)))
+
+    # 4. 添加场景间转场效果
     st.write("🎬 添加场景间转场过渡...")
     scene_clips_with_transitions = add_scene_transitions(scene_clips, transition_type='fade')
     
-    # 4. 最终压制与 BGM 混音
-    if not scene_clips_with_transitions: return False
-    
+    # 5. 最终压制与 BGM 混音
     final = concatenate_videoclips(scene_clips_with_transitions, method="compose")
-    
-    # 🎵 使用新的 BGM 风格路由系统
-    if style_name:
-        st.write(f"🎵 根据 {style_name} 风格匹配 BGM...")
-        bgm_clip = get_bgm_by_style(style_name, final.duration)
-        if bgm_clip:
-            # 混合人声和 BGM
-            final = final.set_audio(CompositeAudioClip([
-                final.audio.volumex(1.2),  # 稍微调高人声，确保清晰
-                bgm_clip
-            ]))
-        else:
-            st.warning("⚠️ BGM 加载失败，使用原始音频")
-    else:
-        # 如果没有指定风格，尝试使用默认 BGM（兼容旧版本）
-        default_bgm_paths = ["assets/bgm.mp3", "bgm.mp3"]
-        bgm_path = None
-        for path in default_bgm_paths:
-            if os.path.exists(path):
-                bgm_path = path
-                break
-        
-        if bgm_path:
-            st.info("🎵 使用默认 BGM")
-            bgm = AudioFileClip(bgm_path).volumex(0.08).set_duration(final.duration)
-            final = final.set_audio(CompositeAudioClip([final.audio, bgm]))
+    fd, mix_path = tempfile.mkstemp(prefix="videotaxi_mix_", suffix=".wav")
+    os.close(fd)
+    temp_files.append(mix_path)
+    voice_tracks = sequential_voice_tracks([part[4] for part in scene_parts],
+                                           [part[3] for part in scene_parts])
+    mix_scene_audio(voice_tracks, mix_path, style_name, final.duration)
+    final = final.set_audio(AudioFileClip(mix_path))
+
+    # 6. 导出 (优化参数防止云端内存溢出)
+    start = time.time()
+    with RssSampler() as sampler:
+        final.write_videofile(output_path, fps=profile.fps, codec="libx264", audio_codec="aac", 
+                              threads=profile.threads, preset=profile.preset,
+                              ffmpeg_params=profile.ffmpeg_params(), logger=None)
+    stats = RenderStats(frames=len(np.arange(0, final.duration, 1.0 / profile.fps)),
+                        seconds=time.time() - start, peak_rss_mb=sampler.peak_mb, path="MoviePy")
+    st.caption(f"⚡ {stats.summary()}")
+    
+    # 7. 资源清理
+    final.close()
+    _cleanup_temp_files(temp_files)
+    return True
 
-    # 4. 导出 (优化参数防止云端内存溢出)
-    final.write_videofile(output_path, fps=24, codec="libx264", audio_codec="aac", 
-                          threads=4, preset="ultrafast", logger=None)
+def export_scenes_streaming(scene_parts, output_path, style_name=None, profile=FINAL_PROFILE):
+    """
+    流式导出：逐帧在复用的 uint8 缓冲区中合成，以原始帧写入 ffmpeg
     
-    # 5. 资源清理
-    final.close()
-    for f in temp_files:
+    画面与 create_animated_scene + add_scene_transitions 的结果一致，
+    音频（人声 + BGM）先在 PCM 时间线上混好，再由同一个 ffmpeg 进程封装。
+    
+    Args:
+        scene_parts: [(分镜序号, 背景 clip, 字幕 [(起点, 终点, RGBA)], 时长, 音频路径)] 列表
+        output_path: 输出视频路径
+        style_name: 风格名称（用于匹配运镜与 BGM）
+        profile: RenderProfile 渲染档位（尺寸 / 帧率 / 编码参数）
+    
+    Returns:
+        RenderStats: 吞吐与峰值内存统计
+    """
+    layers = []
+    for order, (i, bg, subtitle_cues, dur, _) in enumerate(scene_parts):
+        fade_in, fade_out = scene_transition_fades(order, len(scene_parts))
+        layers.append(build_scene_layers(bg, subtitle_cues, dur, style_name, i, fade_in, fade_out))
+    compositor = FrameCompositor(layers, profile.size, profile.fps)
+    
+    voice_tracks = sequential_voice_tracks([part[4] for part in scene_parts],
+                                           [part[3] for part in scene_parts])
+    
+    fd, audio_path = tempfile.mkstemp(prefix="videotaxi_mix_", suffix=".wav")
+    os.close(fd)
+    try:
+        mix_scene_audio(voice_tracks, audio_path, style_name, compositor.duration)
+        writer = FFmpegFrameWriter(output_path, profile.size, profile.fps, preset=profile.preset,
+                                   threads=profile.threads, audio_path=audio_path,
+                                   audio_bitrate=profile.audio_bitrate,
+                                   ffmpeg_params=profile.ffmpeg_params())
+        return stream_frames(compositor.compose, compositor.frame_count, writer,
+                             compositor.new_buffer)
+    finally:
+        try:
+            os.remove(audio_path)
+        except OSError:
+            pass
+
+def _cleanup_temp_files(paths):
+    """删除渲染用的临时素材文件（连同配音的时间戳旁路文件）"""
+    paths = [f for f in paths if f]
+    for f in paths + list(iter_timing_files(paths)):
         if f and os.path.exists(f): 
             try: os.remove(f)
             except: pass
-    return True
 
 # 🎬 导演时间轴引擎 (Director's Timeline Engine)
 class VideoAssembler:
@@ -1337,46 +1950,37 @@ class VideoAssembler:
         
         st.success(f"✅ Manifest 验证通过：{len(self.manifest)} 个分镜，总时长 {self.manifest[-1]['end_time']}s")
     
-    async def synthesize_segment_with_emotion(self, segment, output_file):
+    async def synthesize_all_audio_parallel(self, scheduler=None):
         """
-        根据 emotion_vibe 合成单个音频片段
-        """
-        text = segment["narration"]
-        vibe = segment.get("emotion_vibe", "neutral_narrate")
+        并行合成所有音频片段（SynthesisScheduler 调度：限流、重试、对冲、火山引擎按片段回退 Edge）
         
-        # 调用片段式情绪引擎
-        success = await synthesize_emotional_segment(
-            text=text,
-            vibe=vibe,
-            output_file=output_file,
-            use_volcengine=self.use_volcengine
-        )
+        Args:
+            scheduler: SynthesisScheduler（默认每批新建；传入时可在调用后读取 stats 计数）
         
-        return success
-    
-    async def synthesize_all_audio_parallel(self):
-        """
-        并行合成所有音频片段
         Returns: [(audio_file, sfx_file, start, end), ...]
         """
+        scheduler = scheduler or SynthesisScheduler()
         tasks = []
         audio_info = []
         
         for i, segment in enumerate(self.manifest):
             audio_file = f"temp_timeline_audio_{i}_{uuid.uuid4().hex[:8]}.mp3"
             audio_info.append({
+                "index": i,
                 "audio_file": audio_file,
                 "sfx": segment.get("sfx"),
                 "start": segment["start_time"],
                 "end": segment["end_time"]
             })
             
-            task = self.synthesize_segment_with_emotion(segment, audio_file)
-            tasks.append(task)
+            routes = emotional_segment_routes(segment["narration"], segment.get("emotion_vibe", "neutral_narrate"),
+                                              self.use_volcengine)
+            tasks.append(SynthesisTask(audio_file, routes, label=f"分镜 {i+1}"))
         
-        # 🚀 并行执行
+        # 🚀 限流并发执行
         st.info(f"🎬 并行合成 {len(tasks)} 个情绪音频片段...")
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        results = await scheduler.run(tasks)
+        st.caption(f"⏱️ {scheduler.stats.summary()}")
         
         # 验证结果
         success_info = []
@@ -1393,7 +1997,7 @@ class VideoAssembler:
     def load_sfx(self, sfx_name):
         """
         加载音效文件
-        Returns: AudioFileClip 或 None
+        Returns: 解码后的 PCM（SAMPLE_RATE）或 None
         """
         if not sfx_name or sfx_name == "silence":
             return None
@@ -1401,7 +2005,7 @@ class VideoAssembler:
         sfx_path = self.SFX_LIBRARY.get(sfx_name)
         if sfx_path and os.path.exists(sfx_path):
             try:
-                return AudioFileClip(sfx_path)
+                return get_audio_asset_cache().load(sfx_path)
             except Exception as e:
                 st.warning(f"⚠️ 音效 {sfx_name} 加载失败: {e}")
         else:
@@ -1414,52 +2018,157 @@ class VideoAssembler:
         按照时间轴组装音频（包括 TTS + SFX）
         """
         try:
-            audio_clips = []
+            timeline = AudioTimeline()
+            segment_count = 0
             
             for info in audio_info_list:
                 # 加载 TTS 音频
                 if os.path.exists(info["audio_file"]):
-                    tts_clip = AudioFileClip(info["audio_file"])
-                    
-                    # 加载 SFX
-                    sfx_clip = self.load_sfx(info["sfx"])
+                    start = timeline.cursor
+                    end = timeline.place_samples(timeline.load(info["audio_file"]), start)
                     
-                    if sfx_clip:
-                        # 混合 TTS + SFX
-                        combined = CompositeAudioClip([tts_clip, sfx_clip.volumex(0.3)])
-                        audio_clips.append(combined)
-                    else:
-                        audio_clips.append(tts_clip)
+                    # 混合 TTS + SFX（与 TTS 同起点，片段时长取两者较长者）
+                    sfx = self.load_sfx(info["sfx"])
+                    if sfx is not None:
+                        end = max(end, timeline.place_samples(sfx, start, 0.3))
+                    timeline.cursor = end
+                    segment_count += 1
             
-            if not audio_clips:
+            if not segment_count:
                 st.error("❌ 没有有效的音频片段")
                 return None
             
-            # 🎵 拼接所有片殶
-            final_audio = concatenate_audioclips(audio_clips)
-            final_audio.write_audiofile(output_path, codec='libmp3lame')
+            # 🎵 一次编码输出
+            timeline.write(output_path)
             
-            # 清理临时文件
-            for clip in audio_clips:
-                clip.close()
-            for info in audio_info_list:
-                if os.path.exists(info["audio_file"]):
-                    try:
-                        os.remove(info["audio_file"])
-                    except:
-                        pass
+            # 清理临时文件（连同时间戳旁路文件）
+            _cleanup_temp_files([info["audio_file"] for info in audio_info_list])
             
-            st.success(f"✅ 时间轴音频组装完成，共 {len(audio_clips)} 个片殶")
+            st.success(f"✅ 时间轴音频组装完成，共 {segment_count} 个片段")
             return output_path
             
         except Exception as e:
             st.error(f"❌ 音频组装失败: {e}")
             return None
     
-    async def render_video_from_manifest(self, output_path="final_video.mp4", bgm_style=None):
+    def compile_render_graph(self, audio_info_list, image_paths=None, size=(1080, 1920), fps=24,
+                             bgm_path=None, bgm_volume=0.1):
+        """
+        把 Manifest 编译为渲染图：场景来源 + 情绪运镜 + 字幕、边界转场、音频混音
+        
+        Args:
+            audio_info_list: synthesize_all_audio_parallel 的结果
+            image_paths: 与 manifest 对齐的图片路径列表（缺失时使用黑屏）
+            size: 画面尺寸
+            fps: 帧率
+            bgm_path: 背景音乐路径（可选）
+            bgm_volume: 背景音乐音量
+        
+        Returns:
+            RenderGraph
+        """
+        width, height = size
+        audio_files = {info["index"]: info["audio_file"] for info in audio_info_list}
+        scenes = []
+        for i, segment in enumerate(self.manifest):
+            start, end = float(segment["start_time"]), float(segment["end_time"])
+            duration = end - start
+            if duration <= 0:
+                st.warning(f"⚠️ 分镜 {i+1} 时长无效，跳过")
+                continue
+            vibe = segment.get("emotion_vibe", "neutral_narrate")
+            
+            # 来源：AI 视频 / AI 绘画 > 黑屏占位
+            bg = None
+            image_path = image_paths[i] if image_paths and i < len(image_paths) else None
+            if image_path:
+                try:
+                    bg = load_scene_background(image_path, duration, size)
+                except Exception as e:
+                    st.warning(f"⚠️ 分镜 {i+1} 素材加载失败: {e}，使用黑屏占位")
+            
+            # 效果：情绪路由表中的运镜（静态画面走预处理快速通道）
+            curve = vibe_motion_curve(vibe, width, height, duration)
+            if bg is None or isinstance(bg, ImageClip):
+                image = bg.img if bg is not None else np.zeros((height, width, 3), dtype=np.uint8)
+                engine = MotionEngine.from_static(image, curve, size, duration, fps)
+            else:
+                engine = MotionEngine(bg.get_frame, curve, size)
+            # 字幕：配音有句级时间戳时逐句显示
+            audio_file = audio_files.get(i)
+            subtitles = subtitle_overlays(scene_subtitle_cues(segment["narration"], audio_file, duration))
+            scenes.append(SceneNode(
+                index=i, start=start, end=end,
+                background=lambda t, out, engine=engine: engine.make_frame(t, out=out),
+                overlays=subtitles, vibe=vibe
+            ))
+        
+        # 转场：由后一分镜的情绪决定（与 apply_style_transition 使用同一路由表）
+        transitions = []
+        for k in range(1, len(scenes)):
+            before, after = scenes[k - 1], scenes[k]
+            vibe_config = VIBE_ROUTING_TABLE.get(after.vibe, VIBE_ROUTING_TABLE["neutral_narrate"])
+            kind = vibe_config.get("transition", "crossfade")
+            duration = fit_transition_duration(TRANSITION_DURATIONS.get(kind, 0.3), before, after)
+            transitions.append(TransitionNode(kind=kind, boundary=after.start, duration=duration,
+                                              before=k - 1, after=k))
+        
+        # 音频：TTS 按时间轴起点放置，SFX 与对应分镜同起点
+        tracks = []
+        for info in audio_info_list:
+            tracks.append(AudioTrack(info["audio_file"], start=float(info["start"])))
+            sfx_name = info.get("sfx")
+            sfx_path = self.SFX_LIBRARY.get(sfx_name) if sfx_name else None
+            if sfx_path and os.path.exists(sfx_path):
+                tracks.append(AudioTrack(sfx_path, start=float(info["start"]), volume=0.3, kind="sfx"))
+        if bgm_path:
+            tracks.append(AudioTrack(bgm_path, volume=bgm_volume, kind="bgm"))
+        
+        graph_duration = scenes[-1].end if scenes else 0.0
+        return RenderGraph(scenes=scenes, transitions=transitions,
+                           audio=AudioMixNode(tracks=tracks, duration=graph_duration),
+                           size=size, fps=fps)
+    
+    def render_graph_audio(self, audio_node, output_path):
+        """把音频混音节点渲染为 wav（各轨按起点叠加，BGM 循环铺满并随人声闪避）"""
+        voices = AudioTimeline()
+        effects = AudioTimeline()
+        samples = voices.to_samples(audio_node.duration)
+        bgm = np.zeros((samples, voices.channels), dtype=np.float32)
+        assets = get_audio_asset_cache()
+        for track in audio_node.tracks:
+            if track.kind == "bgm":
+                offset = min(voices.to_samples(track.start), samples)
+                looped = assets.loop(track.path, max(audio_node.duration - track.start, 0.0))
+                count = min(len(looped), samples - offset)
+                bgm[offset:offset + count] += looped[:count] * np.float32(track.volume)
+            elif track.kind == "sfx":
+                effects.place(assets.load(track.path), track.start, track.volume)
+            else:
+                voices.place(voices.load(track.path), track.start, track.volume)
+        
+        # 人声侧链闪避 BGM，音效不参与闪避；整体归一化到目标响度
+        mixed, report = master_mix(voices.render(audio_node.duration), bgm,
+                                   effects.render(audio_node.duration), voices.sample_rate)
+        st.caption(f"🎚️ {report.summary()}")
+        return encode_audio(mixed, output_path, voices.sample_rate)
+    
+    async def render_video_from_manifest(self, output_path="final_video.mp4", bgm_style=None,
+                                         zhipu_key=None, image_paths=None):
         """
         🎬 一键混剪：从 Manifest 生成完整视频
+        
+        Manifest 先编译为渲染图（来源 / 情绪运镜 / 转场 / 音频混音），
+        再由 GraphScheduler 逐帧求值并流式写入 ffmpeg。
+        
+        Args:
+            output_path: 输出视频路径
+            bgm_style: BGM 风格（可选）
+            zhipu_key: 智谱 API Key，未提供 image_paths 时用于生成分镜图片
+            image_paths: 与 manifest 对齐的图片路径列表（可选）
         """
+        import tempfile
+        
         st.info("🎬 开始基于导演时间轴的视频渲染...")
         
         # 1. 并行合成所有音频
@@ -1469,136 +2178,188 @@ class VideoAssembler:
             st.error("❌ 音频合成失败")
             return False
         
-        # 2. 组装时间轴音频（TTS + SFX）
-        timeline_audio = self.assemble_timeline_audio(audio_info_list, "temp_timeline_audio.mp3")
+        # 2. 分镜画面
+        if image_paths is None and zhipu_key:
+            from api_services import generate_images_zhipu
+            image_paths = generate_images_zhipu(self.manifest, zhipu_key)
         
-        if not timeline_audio:
+        bgm_path = None
+        if bgm_style:
+            bgm_path = get_bgm_path_by_style(bgm_style)
+        
+        # 3. 编译渲染图
+        graph = self.compile_render_graph(audio_info_list, image_paths, bgm_path=bgm_path,
+                                          bgm_volume=get_bgm_volume(bgm_style))
+        if not graph.scenes:
+            st.error("❌ 没有可渲染的分镜")
             return False
+        st.write(f"🧩 渲染图：{len(graph.scenes)} 个场景，{len(graph.transitions)} 个转场，"
+                 f"{len(graph.audio.tracks)} 条音轨")
         
-        # 3. TODO: 生成图片并组装视频（复用现有 render_ai_video_pipeline 逻辑）
-        # 这里暂时返回成功，完整实现需要整合图片生成和 MoviePy 渲染
-        st.success("✅ 时间轴音频生成成功！")
-        st.info("🚧 视频渲染功能待完善，当前仅生成音频轨")
+        # 4. 音频混音 + 逐帧求值流式导出
+        fd, audio_path = tempfile.mkstemp(prefix="videotaxi_timeline_", suffix=".wav")
+        os.close(fd)
+        try:
+            self.render_graph_audio(graph.audio, audio_path)
+            scheduler = GraphScheduler(graph)
+            writer = FFmpegFrameWriter(output_path, graph.size, graph.fps, threads=4,
+                                       audio_path=audio_path)
+            stats = stream_frames(scheduler.compose, scheduler.frame_count, writer,
+                                  scheduler.new_buffer)
+            st.caption(f"⚡ {stats.summary()}")
+        except Exception as e:
+            st.error(f"❌ 视频渲染失败: {e}")
+            return False
+        finally:
+            _cleanup_temp_files([audio_path] + [info["audio_file"] for info in audio_info_list])
         
+        st.success("✅ 导演时间轴视频渲染完成！")
         return True
 
 
 # ==================== 🎬 电影级转场系统 v2.0 ====================
 
-def apply_glitch_transition(clip1, clip2, duration=0.3):
+def render_transition_clip(clip1, clip2, kind, duration, clip2_start, boundary):
     """
-    故障艺术转场 - 认知刺客流专用
-    模拟数字信号干扰效果
+    扁平时间线转场：两个片段放在同一条时间线上，由 GraphScheduler 逐帧求值
+    
+    clip1 占 [0, d1)，clip2 从 clip2_start 开始；转场窗口以 boundary 为中心、宽 duration。
+    窗口内前后两帧各取一次，由转场内核在复用缓冲区中原地混合，
+    不再通过 freeze / subclip / 嵌套 concatenate 重新计算 clip1 的尾部。
+    
+    Args:
+        clip1: 前一个片段
+        clip2: 后一个片段
+        kind: 转场类型（见 render.TRANSITION_KERNELS）
+        duration: 转场窗口时长
+        clip2_start: clip2 在时间线上的起点
+        boundary: 转场窗口中心，音频在此处切换
+    
+    Returns:
+        VideoClip
     """
-    from moviepy.editor import concatenate_videoclips, ColorClip
+    from moviepy.video.VideoClip import VideoClip
     
-    # 创建故障帧
-    w, h = clip1.size
+    size = tuple(clip1.size)
+    
+    def clip_source(clip):
+        def render(t, out):
+            frame = clip.get_frame(min(t, clip.duration))
+            np.copyto(out, frame[:, :, :3], casting='unsafe')
+        return render
+    
+    scenes = [
+        SceneNode(index=0, start=0.0, end=clip1.duration, background=clip_source(clip1)),
+        SceneNode(index=1, start=clip2_start, end=clip2_start + clip2.duration,
+                  background=clip_source(clip2)),
+    ]
+    transitions = [TransitionNode(kind=kind, boundary=boundary, duration=duration, before=0, after=1)]
+    fps = getattr(clip1, 'fps', None) or getattr(clip2, 'fps', None) or 24
+    graph = RenderGraph(scenes=scenes, transitions=transitions, audio=AudioMixNode(),
+                        size=size, fps=fps)
+    scheduler = GraphScheduler(graph)
+    buffer = scheduler.new_buffer()
     
-    def make_glitch_frame(t):
-        # 随机切片和位移
-        import numpy as np
-        frame = clip1.get_frame(clip1.duration - duration + t)
-        if t > duration / 2:
-            frame = clip2.get_frame(t - duration / 2)
-        
-        # 添加RGB分离效果
-        shift = int(10 * math.sin(t * 50))
-        frame_shifted = np.roll(frame, shift, axis=1)
-        
-        # 混合原始帧和位移帧
-        result = frame * 0.7 + frame_shifted * 0.3
-        return result.astype(np.uint8)
+    def make_frame(t):
+        # 中间结果都在复用缓冲区中完成；交给 MoviePy 的帧需独立（调用方可能同时持有多帧）
+        return scheduler.compose_at(t, buffer).copy()
     
-    glitch_clip = ColorClip(size=(w, h), color=(0, 0, 0), duration=duration)
-    glitch_clip = glitch_clip.set_make_frame(make_glitch_frame)
+    result = VideoClip(make_frame, duration=graph.duration).set_fps(fps)
     
-    return concatenate_videoclips([
-        clip1.subclip(0, clip1.duration - duration/2),
-        glitch_clip,
-        clip2.subclip(duration/2)
-    ])
+    # 音频在 boundary 处从 clip1 切换到 clip2
+    audio_parts = []
+    if clip1.audio is not None:
+        audio_parts.append(clip1.audio.subclip(0, min(boundary, clip1.duration)))
+    if clip2.audio is not None:
+        offset = max(boundary - clip2_start, 0.0)
+        if offset < clip2.duration:
+            audio_parts.append(clip2.audio.subclip(offset).set_start(max(boundary, clip2_start)))
+    if audio_parts:
+        result = result.set_audio(CompositeAudioClip(audio_parts).set_duration(graph.duration))
+    return result
+
+
+def apply_glitch_transition(clip1, clip2, duration=0.3):
+    """
+    故障艺术转场 - 认知刺客流专用
+    模拟数字信号干扰效果（总时长 d1 + d2，窗口以两段交界为中心）
+    """
+    return render_transition_clip(clip1, clip2, "glitch", duration,
+                                  clip2_start=clip1.duration, boundary=clip1.duration)
 
 
 def apply_zoom_blur_transition(clip1, clip2, duration=0.4):
     """
     缩放模糊转场 - 情绪宣泄流专用
-    快速缩放伴随动态模糊
+    快速缩放伴随动态模糊（两段重叠 duration，总时长 d1 + d2 - duration）
     """
-    def zoom_with_blur(get_frame, t):
-        frame = get_frame(t)
-        progress = t / duration
-        
-        # 缩放因子：快速放大然后切换
-        if progress < 0.5:
-            scale = 1.0 + progress * 0.5
-        else:
-            scale = 1.25 - (progress - 0.5) * 0.5
-        
-        # 应用缩放
-        from scipy import ndimage
-        zoomed = ndimage.zoom(frame, (scale, scale, 1), order=1)
-        
-        # 裁剪回原始大小
-        h, w = frame.shape[:2]
-        zh, zw = zoomed.shape[:2]
-        start_y = (zh - h) // 2
-        start_x = (zw - w) // 2
-        return zoomed[start_y:start_y+h, start_x:start_x+w]
-    
-    # 创建过渡片段
-    transition = clip1.fx(vfx.freeze, t=clip1.duration-duration, freeze_duration=duration)
-    transition = transition.fl(zoom_with_blur)
-    
-    from moviepy.editor import concatenate_videoclips
-    return concatenate_videoclips([
-        clip1.subclip(0, clip1.duration - duration),
-        transition,
-        clip2.subclip(duration)
-    ])
+    return render_transition_clip(clip1, clip2, "zoom_blur", duration,
+                                  clip2_start=clip1.duration - duration,
+                                  boundary=clip1.duration - duration / 2)
 
 
 def apply_whip_pan_transition(clip1, clip2, duration=0.3, direction='right'):
     """
     快速摇镜转场 - 嘲讽/快节奏风格
-    模拟相机快速甩动
+    模拟相机快速甩动（两段重叠 duration，总时长 d1 + d2 - duration）
+    """
+    return render_transition_clip(clip1, clip2, "whip_pan", duration,
+                                  clip2_start=clip1.duration - duration,
+                                  boundary=clip1.duration - duration / 2)
+
+
+def vibe_motion_curve(emotion_vibe, w, h, duration):
     """
-    w, h = clip1.size
+    根据 VIBE_ROUTING_TABLE 的 ken_burns 配置生成运镜曲线
+    平移幅度限制在放大后多出的边距内，不会露出黑边
     
-    def whip_pan(get_frame, t):
-        progress = t / duration
-        # 快速加速然后减速
-        ease = 1 - math.pow(1 - progress, 3)
-        
-        if progress < 0.5:
-            # 第一个画面甩出
-            frame = get_frame(t)
-            offset = int(w * ease * 0.8)
+    Args:
+        emotion_vibe: 情绪标签
+        w, h: 画面尺寸
+        duration: 场景时长
+    
+    Returns:
+        运镜曲线 curve(t) -> (scale, tx, ty)
+    """
+    vibe_config = VIBE_ROUTING_TABLE.get(emotion_vibe, VIBE_ROUTING_TABLE["neutral_narrate"])
+    ken_burns = vibe_config.get("ken_burns", {})
+    zoom_factor = ken_burns.get("zoom_factor", 1.1)
+    direction = ken_burns.get("direction", "in")
+    pan = ken_burns.get("pan", "none")
+    
+    def curve(t):
+        progress = min(max(t / duration, 0.0), 1.0) if duration > 0 else 0.0
+        ease = 0.5 - 0.5 * math.cos(progress * math.pi)
+        if direction == 'in':
+            scale = 1.0 + (zoom_factor - 1.0) * ease
         else:
-            # 第二个画面甩入
-            frame = get_frame(t)
-            offset = int(w * (1 - ease) * 0.8)
+            scale = zoom_factor - (zoom_factor - 1.0) * ease
         
-        # 创建运动模糊效果
-        from scipy import ndimage
-        blurred = ndimage.gaussian_filter1d(frame, sigma=5 * ease, axis=0 if direction == 'vertical' else 1)
-        return blurred
-    
-    transition = clip1.fx(vfx.freeze, t=clip1.duration-duration, freeze_duration=duration)
-    transition = transition.fl(whip_pan)
+        tx, ty = centered_position(w, h, scale)
+        margin_x = (w * scale - w) / 2
+        margin_y = (h * scale - h) / 2
+        
+        if pan == "slow_horizontal":
+            tx += margin_x * 0.8 * (1 - 2 * ease)
+        elif pan == "quick_horizontal":
+            tx += margin_x * 0.8 * math.cos(math.pi * min(1.0, progress * 2))
+        elif pan == "vertical":
+            ty += margin_y * 0.8 * (1 - 2 * ease)
+        elif pan == "shake":
+            tx += margin_x * 0.5 * math.sin(t * 20)
+            ty += margin_y * 0.5 * math.cos(t * 25)
+        elif pan == "jitter":
+            tx += margin_x * 0.3 * math.sin(t * 37)
+            ty += margin_y * 0.3 * math.cos(t * 41)
+        return scale, tx, ty
     
-    from moviepy.editor import concatenate_videoclips
-    return concatenate_videoclips([
-        clip1.subclip(0, clip1.duration - duration),
-        transition,
-        clip2.subclip(duration)
-    ])
+    return curve
 
 
 def apply_beat_sync_zoom(clip, emotion_vibe, audio_beats=None):
     """
     节奏同步缩放 - 根据情绪在特定节拍上产生脉冲效果
-    使用 Pillow 预处理避免 MoviePy resize 的 ANTIALIAS 兼容性问题
+    使用统一运镜引擎（仿射变换）避免 MoviePy resize 的 ANTIALIAS 兼容性问题
     
     Args:
         clip: 视频片段
@@ -1621,27 +2382,13 @@ def apply_beat_sync_zoom(clip, emotion_vibe, audio_beats=None):
     else:  # sentence
         pulse_freq = 1
     
-    def make_frame(t):
+    def curve(t):
         # 生成脉冲
         pulse = math.sin(2 * math.pi * pulse_freq * t / duration)
         scale = 1.0 + intensity * (pulse + 1) / 2
-        
-        frame = clip.get_frame(t)
-        pil_img = Image.fromarray(frame)
-        new_w, new_h = int(w * scale), int(h * scale)
-        pil_img = pil_img.resize((new_w, new_h), Image.LANCZOS)
-        
-        # 裁剪回原始尺寸（居中）
-        left = (new_w - w) // 2
-        top = (new_h - h) // 2
-        right = left + w
-        bottom = top + h
-        pil_img = pil_img.crop((left, top, right, bottom))
-        
-        return np.array(pil_img)
+        return (scale,) + centered_position(w, h, scale)
     
-    from moviepy.video.VideoClip import VideoClip
-    return VideoClip(make_frame, duration=duration).set_fps(clip.fps if hasattr(clip, 'fps') else 24)
+    return render_motion_clip(clip, duration, curve, fps=clip.fps if hasattr(clip, 'fps') else 24)
 
 
 def apply_style_transition(clip1, clip2, emotion_vibe, duration=0.3):
@@ -1667,23 +2414,16 @@ def apply_style_transition(clip1, clip2, emotion_vibe, duration=0.3):
     elif transition_type == "whip_pan":
         return apply_whip_pan_transition(clip1, clip2, duration)
     elif transition_type == "fade_black":
-        # 黑场淡入
-        from moviepy.editor import concatenate_videoclips, ColorClip
-        black = ColorClip(size=clip1.size, color=(0, 0, 0), duration=duration/2)
-        return concatenate_videoclips([
-            clip1.fadeout(duration/2),
-            black,
-            clip2.fadein(duration/2)
-        ])
+        # 黑场淡入：clip1 淡出 → 黑场 → clip2 淡入（中间插入 duration/2 黑场）
+        return render_transition_clip(clip1, clip2, "fade_black", duration * 1.5,
+                                      clip2_start=clip1.duration + duration / 2,
+                                      boundary=clip1.duration + duration / 4)
     elif transition_type == "flash_white":
-        # 白场闪烁
-        from moviepy.editor import concatenate_videoclips, ColorClip
-        white = ColorClip(size=clip1.size, color=(255, 255, 255), duration=0.1)
-        return concatenate_videoclips([
-            clip1.subclip(0, clip1.duration - 0.15),
-            white,
-            clip2.subclip(0.15)
-        ])
+        # 白场闪烁：0.1 秒白场替换两段交界处
+        return render_transition_clip(clip1, clip2, "flash_white", 0.1,
+                                      clip2_start=clip1.duration - 0.2,
+                                      boundary=clip1.duration - 0.1)
     else:
-        # 默认淡入淡出
-        return concatenate_videoclips([clip1, clip2], method="compose")
+        # 默认直接拼接
+        return render_transition_clip(clip1, clip2, "cut", 0.0,
+                                      clip2_start=clip1.duration, boundary=clip1.duration)
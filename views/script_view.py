@@ -4,9 +4,14 @@
 负责剧本生成、编辑、锁定等工作流前端界面
 """
 
+import os
+
 import streamlit as st
 from datetime import datetime
 
+# 草稿预览输出文件
+PREVIEW_VIDEO_FILE = "ai_preview_output.mp4"
+
 # 风格配置数据 - 5大升级版爆款风格
 STYLE_OPTIONS = [
     "🎬 治愈系·观察者",
@@ -411,7 +416,10 @@ def _render_script_editor(
             check_ssml_quality_func, refine_script_by_chat_func
         )
     elif st.session_state.workflow_state == 'locked':
-        _render_locked_actions(user_id, edited_scenes, zhipu_api_key, pexels_api_key, voice_mapping)
+        _render_locked_actions(
+            user_id, edited_scenes, zhipu_api_key, pexels_api_key,
+            voice_mapping, render_ai_video_pipeline_func
+        )
     elif st.session_state.workflow_state == 'producing':
         _render_producing_actions(
             user_id, edited_scenes, zhipu_api_key, pexels_api_key,
@@ -551,16 +559,34 @@ def _render_chat_refiner(edited_scenes, llm_api_key, refine_script_by_chat_func)
                     st.markdown("---")
 
 
-def _render_locked_actions(user_id, edited_scenes, zhipu_api_key, pexels_api_key, voice_mapping):
-    """渲染锁定状态的操作按钮（解锁、一键生产）"""
-    col_unlock, col_produce = st.columns(2)
+def _get_scene_asset_cache():
+    """会话级分镜素材缓存：草稿预览生成的图片 / 配音由正式导出复用"""
+    if 'scene_asset_cache' not in st.session_state:
+        from video_engine import SceneAssetCache
+        st.session_state.scene_asset_cache = SceneAssetCache()
+    return st.session_state.scene_asset_cache
+
+
+def _render_locked_actions(
+    user_id, edited_scenes, zhipu_api_key, pexels_api_key,
+    voice_mapping, render_ai_video_pipeline_func
+):
+    """渲染锁定状态的操作按钮（解锁、快速预览、一键生产）"""
+    col_unlock, col_preview, col_produce = st.columns(3)
     
     with col_unlock:
         if st.button("🔓 解锁重新编辑", use_container_width=True, help="解锁剧本，恢复编辑模式"):
             st.session_state.workflow_state = 'draft'
+            st.session_state.pop('preview_video', None)
             st.info("✅ 已解锁，可以继续编辑")
             st.rerun()
     
+    with col_preview:
+        preview_clicked = st.button(
+            "👀 快速预览", use_container_width=True,
+            help="360x640 低清草稿，几秒出片；生成的画面与配音会留给正式导出复用"
+        )
+    
     with col_produce:
         if st.button("🚀 一键生产视频", type="primary", use_container_width=True, help="渲染过程约2-3 分钟"):
             if not zhipu_api_key:
@@ -568,6 +594,33 @@ def _render_locked_actions(user_id, edited_scenes, zhipu_api_key, pexels_api_key
             else:
                 st.session_state.workflow_state = 'producing'
                 st.rerun()
+    
+    if preview_clicked:
+        if not zhipu_api_key:
+            st.error("请配置智谱 Key！")
+        else:
+            with st.status("👀 正在生成草稿预览...", expanded=False) as status:
+                success = render_ai_video_pipeline_func(
+                    edited_scenes,
+                    zhipu_api_key,
+                    PREVIEW_VIDEO_FILE,
+                    pexels_api_key,
+                    voice_id=st.session_state.voice_id,
+                    style_name=st.session_state.get('script_mode'),
+                    use_video_model=st.session_state.get('use_video_model', False),
+                    draft=True,
+                    asset_cache=_get_scene_asset_cache()
+                )
+                if success:
+                    status.update(label="✅ 草稿预览已生成", state="complete", expanded=False)
+                    st.session_state.preview_video = PREVIEW_VIDEO_FILE
+                else:
+                    status.update(label="❌ 预览生成失败", state="error")
+    
+    preview_video = st.session_state.get('preview_video')
+    if preview_video and os.path.exists(preview_video):
+        st.caption("👀 草稿预览（低清低帧率，仅供检查节奏与画面；正式导出为 1080x1920）")
+        st.video(preview_video)
 
 
 def _render_producing_actions(
@@ -626,7 +679,8 @@ def _render_producing_actions(
             pexels_api_key,
             voice_id=st.session_state.voice_id,
             style_name=st.session_state.get('script_mode'),
-            use_video_model=use_video_model
+            use_video_model=use_video_model,
+            asset_cache=_get_scene_asset_cache()
         )
         
         if success:
@@ -657,4 +711,8 @@ def _render_completed_actions():
         st.session_state.workflow_state = 'draft'
         st.session_state.scenes_data = []
         st.session_state.chat_history = []
+        st.session_state.pop('preview_video', None)
+        asset_cache = st.session_state.pop('scene_asset_cache', None)
+        if asset_cache is not None:
+            asset_cache.clear()
         st.rerun()
@@ -8,11 +8,43 @@ from .base_voice import BaseVoice, VoiceConfig
 from .edge_voice import EdgeVoice
 from .volc_voice import VolcVoice
 from .voice_factory import VoiceFactory
+from .tts_cache import TTSCache, get_tts_cache, tts_cache_key, normalize_tts_text
+from .speech_timing import (
+    SpeechTiming, TimedText, audio_duration, load_speech_timing, save_with_timing, sentence_spans
+)
+from .tts_scheduler import (
+    SchedulerSettings, RetryPolicy, EngineLimit, SynthesisRoute, SynthesisTask, SynthesisScheduler, SynthesisStats
+)
+from .volc_client import (
+    VolcTTSClient, volcengine_synthesize, volcengine_warm_up_sync,
+    close_volcengine_clients
+)
 
 __all__ = [
     'BaseVoice',
     'VoiceConfig',
     'EdgeVoice',
     'VolcVoice',
-    'VoiceFactory'
+    'VoiceFactory',
+    'TTSCache',
+    'get_tts_cache',
+    'tts_cache_key',
+    'normalize_tts_text',
+    'SpeechTiming',
+    'TimedText',
+    'audio_duration',
+    'load_speech_timing',
+    'save_with_timing',
+    'sentence_spans',
+    'SchedulerSettings',
+    'RetryPolicy',
+    'EngineLimit',
+    'SynthesisRoute',
+    'SynthesisTask',
+    'SynthesisScheduler',
+    'SynthesisStats',
+    'VolcTTSClient',
+    'volcengine_synthesize',
+    'volcengine_warm_up_sync',
+    'close_volcengine_clients'
 ]
@@ -61,6 +61,18 @@ class BaseVoice(ABC):
         """检查引擎是否可用（API密钥等）"""
         pass
     
+    def warm_up(self, timeout: float = 10) -> bool:
+        """
+        预热（子类可覆盖）：提前完成凭证校验、建连等一次性准备，首次合成不再承担这部分开销
+        
+        Args:
+            timeout: 预热超时（秒）
+        
+        Returns:
+            是否可用
+        """
+        return self.is_available()
+    
     def get_voice_id(self) -> str:
         """获取音色ID"""
         return self.config.voice_id
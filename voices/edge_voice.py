@@ -7,6 +7,8 @@ Edge TTS 音色实现
 import asyncio
 import edge_tts
 from .base_voice import BaseVoice, VoiceConfig
+from .speech_timing import save_with_timing
+from .tts_cache import get_tts_cache, tts_cache_key
 
 
 class EdgeVoice(BaseVoice):
@@ -94,6 +96,14 @@ class EdgeVoice(BaseVoice):
         # 预处理文本
         text = self.preprocess_text(text)
         
+        # 内容寻址缓存：相同音色 + 参数 + 文本直接复用
+        key = tts_cache_key(self.engine_id, self.config.voice_id, text, rate=rate)
+        return await get_tts_cache().synthesize(
+            key, output_path, lambda path: self._synthesize_uncached(text, path, rate, proxy)
+        )
+    
+    async def _synthesize_uncached(self, text: str, output_path: str, rate: str, proxy) -> bool:
+        """实际调用 Edge TTS（带重试）"""
         # 重试逻辑
         for attempt in range(3):
             try:
@@ -104,7 +114,8 @@ class EdgeVoice(BaseVoice):
                     rate=rate,
                     proxy=proxy
                 )
-                await communicate.save(output_path)
+                # 流式写盘，同时记录句子时间戳
+                await save_with_timing(communicate, output_path)
                 
                 # 验证输出
                 if self.validate_output(output_path):
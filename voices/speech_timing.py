@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+语音时间戳 - 合成时顺带记录的句 / 词时间轴
+Edge TTS 的 SentenceBoundary / WordBoundary 事件与火山引擎的句子结束事件在流式合成时收集，
+以 JSON 旁路文件存放在音频旁边（<音频名>.timing.json），同时记下 MP3 帧头算出的时长。
+下游读取时长、按句切分字幕都不必再解码音频。
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Iterable, List, Optional, Tuple
+
+TIMING_SUFFIX = ".timing.json"
+TIMING_VERSION = 1
+
+# Edge TTS 的 offset / duration 单位为 100 纳秒
+_EDGE_TICKS_PER_SECOND = 10_000_000
+
+# MP3 帧头查表（只支持 Layer III，TTS 引擎输出均为此格式）
+_MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),   # MPEG-1
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),       # MPEG-2 / 2.5
+}
+_MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),   # MPEG-1
+    2: (22050, 24000, 16000),   # MPEG-2
+    0: (11025, 12000, 8000),    # MPEG-2.5
+}
+
+
+@dataclass
+class TimedText:
+    """一句（或一个词）及其在音频中的起止时间（秒）"""
+    text: str
+    start: float
+    end: float
+
+
+@dataclass
+class SpeechTiming:
+    """一段配音的时间轴"""
+    duration: float                                               # 音频时长（秒）
+    sentences: List[TimedText] = field(default_factory=list)
+    words: List[TimedText] = field(default_factory=list)
+    audio_sha1: str = ""                                          # 对应音频的摘要（校验旁路文件是否过期）
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["version"] = TIMING_VERSION
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SpeechTiming":
+        return cls(
+            duration=float(data["duration"]),
+            sentences=[TimedText(**item) for item in data.get("sentences", [])],
+            words=[TimedText(**item) for item in data.get("words", [])],
+            audio_sha1=str(data.get("audio_sha1", "")),
+        )
+
+
+def _file_sha1(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def timing_path(audio_path: str) -> str:
+    """音频对应的时间戳旁路文件路径"""
+    return os.path.splitext(audio_path)[0] + TIMING_SUFFIX
+
+
+def save_speech_timing(audio_path: str, timing: SpeechTiming) -> str:
+    """把时间轴写到音频旁边（原子替换），返回旁路文件路径"""
+    path = timing_path(audio_path)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(timing.to_dict(), f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
+
+
+def load_speech_timing(audio_path: str) -> Optional[SpeechTiming]:
+    """
+    读取音频的时间轴
+
+    Returns:
+        SpeechTiming；没有旁路文件、格式不对或与音频内容不符（音频已被覆盖）时返回 None
+    """
+    try:
+        with open(timing_path(audio_path), encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != TIMING_VERSION:
+            return None
+        timing = SpeechTiming.from_dict(data)
+        if timing.audio_sha1 != _file_sha1(audio_path):
+            return None
+        return timing
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def remove_speech_timing(audio_path: str) -> None:
+    """删除音频的时间戳旁路文件（不存在时忽略）"""
+    try:
+        os.remove(timing_path(audio_path))
+    except OSError:
+        pass
+
+
+def mp3_duration(path: str) -> Optional[float]:
+    """
+    只解析 MP3 帧头计算时长（不解码）
+
+    有 Xing / Info 头时直接用其中记录的帧数（并扣除 LAME 头记录的编码延迟与尾部补齐，
+    与 ffmpeg 无缝解码的长度一致），否则逐帧累计。
+
+    Returns:
+        秒；不是 Layer III MP3 或文件无法读取时返回 None
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    pos = 0
+    # 跳过 ID3v2 标签
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+        pos = 10 + size
+
+    samples = 0
+    sample_rate = None
+    first = True
+    while pos + 4 <= len(data):
+        header = int.from_bytes(data[pos:pos + 4], "big")
+        version = (header >> 19) & 0x3
+        layer = (header >> 17) & 0x3
+        bitrate_index = (header >> 12) & 0xF
+        rate_index = (header >> 10) & 0x3
+        if ((header >> 21) & 0x7FF) != 0x7FF or version == 1 or layer != 1 \
+                or bitrate_index in (0, 15) or rate_index == 3:
+            if first and pos < 65536:
+                pos += 1       # 帧头前可能有垃圾字节，在开头一段内重新同步
+                continue
+            break
+        mpeg1 = version == 3
+        bitrate = _MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+        sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+        padding = (header >> 9) & 0x1
+        frame_samples = 1152 if mpeg1 else 576
+        frame_length = (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+
+        if first:
+            first = False
+            xing = _xing_header(data[pos:pos + frame_length])
+            if xing is not None:
+                frames, trimmed = xing
+                return max(frames * frame_samples - trimmed, 0) / sample_rate
+        samples += frame_samples
+        pos += frame_length
+
+    if not sample_rate:
+        return None
+    return samples / sample_rate
+
+
+def _xing_header(frame: bytes) -> Optional[Tuple[int, int]]:
+    """
+    解析首帧的 Xing / Info 头
+
+    Returns:
+        (总帧数, LAME 头记录的编码延迟 + 尾部补齐采样数)；没有帧数字段时返回 None
+    """
+    for tag in (b"Xing", b"Info"):
+        index = frame.find(tag, 4, 64)
+        if index < 0 or len(frame) < index + 12:
+            continue
+        flags = int.from_bytes(frame[index + 4:index + 8], "big")
+        if not flags & 0x1:
+            return None
+        frames = int.from_bytes(frame[index + 8:index + 12], "big")
+        # 依次跳过帧数、字节数、TOC、质量字段，之后是 LAME 扩展头
+        lame = index + 8 + 4 + (4 if flags & 0x2 else 0) + (100 if flags & 0x4 else 0) + (4 if flags & 0x8 else 0)
+        trimmed = 0
+        if frame[lame:lame + 4] in (b"LAME", b"Lavc", b"Lavf") and len(frame) >= lame + 24:
+            packed = int.from_bytes(frame[lame + 21:lame + 24], "big")
+            trimmed = (packed >> 12) + (packed & 0xFFF)
+        return frames, trimmed
+    return None
+
+
+def audio_duration(path: str) -> Optional[float]:
+    """
+    不解码获取配音时长：优先读时间戳旁路文件，其次解析 MP3 帧头
+
+    Returns:
+        秒；两者都不可用时返回 None（调用方自行探测）
+    """
+    timing = load_speech_timing(path)
+    if timing is not None and timing.duration > 0:
+        return timing.duration
+    if path.lower().endswith(".mp3"):
+        return mp3_duration(path)
+    return None
+
+
+class TimingCollector:
+    """流式合成过程中收集句 / 词边界事件"""
+
+    def __init__(self):
+        self.sentences: List[TimedText] = []
+        self.words: List[TimedText] = []
+
+    def add_edge_boundary(self, chunk: dict) -> None:
+        """Edge TTS stream() 产出的 SentenceBoundary / WordBoundary 事件"""
+        start = chunk["offset"] / _EDGE_TICKS_PER_SECOND
+        item = TimedText(chunk.get("text", ""), start, start + chunk["duration"] / _EDGE_TICKS_PER_SECOND)
+        if chunk["type"] == "SentenceBoundary":
+            self.sentences.append(item)
+        elif chunk["type"] == "WordBoundary":
+            self.words.append(item)
+
+    def add_volc_sentence(self, payload: dict) -> None:
+        """
+        火山引擎 TTSSentenceEnd 事件的负载（enable_timestamp 时带逐字时间戳，单位秒）
+        时间戳若从句首重新计时，则接在上一句之后
+        """
+        words = []
+        for word in payload.get("words") or []:
+            try:
+                start = float(word.get("startTime", word.get("start_time")))
+                end = float(word.get("endTime", word.get("end_time")))
+            except (TypeError, ValueError):
+                continue
+            words.append(TimedText(word.get("word", word.get("text", "")), start, end))
+        if not words:
+            return
+
+        previous_end = self.sentences[-1].end if self.sentences else 0.0
+        if words[0].start < previous_end - 0.05:
+            for word in words:
+                word.start += previous_end
+                word.end += previous_end
+        self.words.extend(words)
+        text = payload.get("text") or "".join(word.text for word in words)
+        self.sentences.append(TimedText(text, words[0].start, words[-1].end))
+
+    def finish(self, audio_path: str) -> Optional[SpeechTiming]:
+        """
+        音频写完后生成时间轴并写入旁路文件
+
+        Returns:
+            SpeechTiming；时长无法确定时不写旁路文件，返回 None
+        """
+        duration = mp3_duration(audio_path) if audio_path.lower().endswith(".mp3") else None
+        if duration is None:
+            remove_speech_timing(audio_path)
+            return None
+        timing = SpeechTiming(duration, self.sentences, self.words, _file_sha1(audio_path))
+        try:
+            save_speech_timing(audio_path, timing)
+        except OSError as e:
+            print(f"⚠️ 时间戳写入失败: {e}")
+        return timing
+
+
+async def save_with_timing(communicate, output_path: str) -> Optional[SpeechTiming]:
+    """
+    代替 edge_tts.Communicate.save：流式写出音频，同时记录句 / 词边界到旁路文件
+
+    Args:
+        communicate: edge_tts.Communicate 实例
+        output_path: 音频输出路径
+
+    Returns:
+        SpeechTiming（见 TimingCollector.finish）
+    """
+    collector = TimingCollector()
+    with open(output_path, "wb") as f:
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                f.write(chunk["data"])
+            else:
+                collector.add_edge_boundary(chunk)
+    return collector.finish(output_path)
+
+
+def sentence_spans(timing: Optional[SpeechTiming], duration: float) -> List[TimedText]:
+    """
+    把句子时间轴铺满整段时长：每句从自己开口显示到下一句开口，首句从 0、末句到 duration
+
+    Returns:
+        句子不足两句时返回空列表（整段显示一条字幕即可）
+    """
+    if timing is None:
+        return []
+    sentences = [s for s in timing.sentences if s.text.strip()]
+    if len(sentences) < 2:
+        return []
+    spans = []
+    for k, sentence in enumerate(sentences):
+        start = 0.0 if k == 0 else min(sentence.start, duration)
+        end = duration if k == len(sentences) - 1 else min(sentences[k + 1].start, duration)
+        if end > start:
+            spans.append(TimedText(sentence.text, start, end))
+    return spans if len(spans) >= 2 else []
+
+
+def iter_timing_files(audio_paths: Iterable[str]) -> Iterable[str]:
+    """音频路径对应的（已存在的）旁路文件，清理临时文件时使用"""
+    for path in audio_paths:
+        if path:
+            sidecar = timing_path(path)
+            if os.path.exists(sidecar):
+                yield sidecar
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 内容寻址缓存 - 所有语音合成入口共用的持久化磁盘缓存
+键为 (引擎, 音色, 语速, 音调, 音量, 规范化后的 SSML 文本) 的哈希，
+写入先落临时文件再原子替换，总大小超限时按最近使用时间淘汰（LRU）。
+合成时记录的时间戳旁路文件（见 speech_timing）随音频一起缓存与淘汰。
+锁定剧本后重新渲染、或对话微调只改了一个分镜时，未改动的分镜不再调用 TTS。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from functools import lru_cache
+from threading import Lock
+from typing import Awaitable, Callable, Optional
+
+from core.primitives import atomic_place
+
+from .speech_timing import TIMING_SUFFIX, remove_speech_timing, timing_path
+
+# 缓存目录与容量可通过环境变量覆盖
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "videotaxi", "tts")
+DEFAULT_MAX_MB = 512
+
+
+def normalize_tts_text(text: str) -> str:
+    """规范化文本：合并空白，去掉首尾空白（SSML 标签原样保留）"""
+    return ' '.join((text or "").split())
+
+
+def tts_cache_key(engine: str, voice_id: str, text: str, rate: str = "+0%",
+                  pitch: str = "+0Hz", volume: str = "+0%", encoding: str = "mp3") -> str:
+    """
+    计算缓存键
+
+    Args:
+        engine: 引擎标识（edge / volc）
+        voice_id: 引擎内的真实音色 ID
+        text: 合成文本（可含 SSML）
+        rate / pitch / volume: 语音参数（默认值与 Edge TTS 一致）
+        encoding: 音频格式
+
+    Returns:
+        sha256 十六进制字符串
+    """
+    payload = json.dumps([engine, voice_id, rate, pitch, volume, encoding, normalize_tts_text(text)],
+                         ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class TTSCache:
+    """
+    TTS 磁盘缓存
+    文件按 <root>/<键前两位>/<键>.<格式> 存放，命中时刷新 mtime 作为 LRU 依据。
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 extension: str = "mp3"):
+        """
+        Args:
+            root: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+            extension: 缓存文件扩展名
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self._lock = Lock()
+        self._size: Optional[int] = None     # 当前总大小（首次写入时扫描一次）
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{self.extension}")
+
+    def lookup(self, key: str) -> Optional[str]:
+        """查找缓存，命中时返回缓存文件路径并刷新使用时间"""
+        path = self.path_for(key)
+        try:
+            if os.path.getsize(path) > 0:
+                os.utime(path)
+                return path
+        except OSError:
+            pass
+        return None
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """命中时把缓存音频（及其时间戳）复制到 output_path"""
+        path = self.lookup(key)
+        if path is None:
+            self.misses += 1
+            return False
+        atomic_place(path, output_path)
+        if os.path.exists(timing_path(path)):
+            atomic_place(timing_path(path), timing_path(output_path))
+        else:
+            remove_speech_timing(output_path)
+        self.hits += 1
+        return True
+
+    def store(self, key: str, source_path: str) -> Optional[str]:
+        """
+        把合成好的音频写入缓存（原子替换，写入后按需淘汰）
+
+        Returns:
+            缓存文件路径；源文件无效或写入失败时返回 None
+        """
+        try:
+            size = os.path.getsize(source_path)
+        except OSError:
+            return None
+        if size == 0:
+            return None
+
+        path = self.path_for(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_place(source_path, path)
+            if os.path.exists(timing_path(source_path)):
+                atomic_place(timing_path(source_path), timing_path(path))
+            else:
+                remove_speech_timing(path)
+        except OSError as e:
+            print(f"⚠️ TTS 缓存写入失败: {e}")
+            return None
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    async def synthesize(self, key: str, output_path: str,
+                         synth: Callable[[str], Awaitable[bool]]) -> bool:
+        """
+        带缓存的合成：命中直接出文件，未命中调用 synth(output_path) 后写入缓存
+
+        Args:
+            key: tts_cache_key 的结果
+            output_path: 调用方期望的输出路径
+            synth: 实际合成协程，返回是否成功
+        """
+        if self.fetch(key, output_path):
+            return True
+        success = await synth(output_path)
+        if success:
+            self.store(key, output_path)
+        return success
+
+    def _entries(self):
+        if not os.path.isdir(self.root):
+            return
+        for sub in os.listdir(self.root):
+            sub_dir = os.path.join(self.root, sub)
+            if not os.path.isdir(sub_dir):
+                continue
+            for name in os.listdir(sub_dir):
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(sub_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        """按 mtime 从旧到新删除，直到总大小回到上限的 90%（时间戳随音频一起删除）"""
+        entries = list(self._entries())
+        total = sum(size for _, size, _ in entries)
+        sidecars = {path: size for path, size, _ in entries if path.endswith(TIMING_SUFFIX)}
+        audios = sorted((entry for entry in entries if entry[0] not in sidecars), key=lambda entry: entry[2])
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in audios:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+            sidecar = timing_path(path)
+            if sidecar in sidecars:
+                remove_speech_timing(path)
+                total -= sidecars[sidecar]
+        self._size = total
+
+    def clear(self) -> None:
+        """清空缓存目录"""
+        with self._lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self._size = 0
+
+
+@lru_cache(maxsize=1)
+def get_tts_cache() -> TTSCache:
+    """
+    获取进程内共享的 TTS 缓存
+    环境变量 VIDEOTAXI_TTS_CACHE_DIR / VIDEOTAXI_TTS_CACHE_MB 可覆盖目录与容量
+    """
+    root = os.environ.get("VIDEOTAXI_TTS_CACHE_DIR", DEFAULT_CACHE_DIR)
+    max_mb = int(os.environ.get("VIDEOTAXI_TTS_CACHE_MB", DEFAULT_MAX_MB))
+    return TTSCache(root, max_mb * 1024 * 1024)
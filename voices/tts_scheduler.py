@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+TTS 合成调度器 - 限流、退避重试、对冲请求与引擎回退
+每个片段按路由（如 火山引擎 → Edge TTS）依次尝试：
+同一引擎失败时按全抖动指数退避重试，重试耗尽再回退到下一个引擎；
+单次尝试明显慢于该引擎的中位耗时时，再发一个重复请求，先成功者胜出。
+所有请求先从引擎的令牌桶取令牌，突发的并发请求不会触发引擎限流。
+"""
+
+import asyncio
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from core.primitives import RetryPolicy, TokenBucket, percentile
+
+from .speech_timing import remove_speech_timing, timing_path
+
+
+@dataclass(frozen=True)
+class EngineLimit:
+    """引擎请求速率上限"""
+    rate: float                     # 每秒请求数
+    burst: int                      # 允许的突发请求数
+
+
+DEFAULT_ENGINE_LIMITS = {
+    "edge": EngineLimit(rate=3.0, burst=3),
+    "volc": EngineLimit(rate=5.0, burst=5),
+}
+
+
+# TTS 单次合成较快，重试退避比 HTTP 接口短
+DEFAULT_TTS_RETRY = RetryPolicy(base_delay=0.5, max_delay=8.0)
+
+
+@dataclass(frozen=True)
+class SchedulerSettings:
+    """调度参数"""
+    max_concurrency: int = 4                    # 同时合成的片段数
+    retry: RetryPolicy = DEFAULT_TTS_RETRY      # 同一引擎内的重试
+    attempt_timeout: float = 60.0               # 单次尝试超时（秒）
+    hedge: bool = True                          # 是否对慢请求发对冲请求
+    hedge_initial_delay: float = 8.0            # 耗时样本不足时的对冲等待（秒）
+    hedge_multiplier: float = 2.0               # 超过该引擎中位耗时的倍数即对冲
+    hedge_min_delay: float = 2.0                # 对冲等待下限（秒）
+    hedge_min_samples: int = 3                  # 开始按中位耗时计算所需的样本数
+    max_hedges: int = 2                         # 每次尝试最多发出的对冲请求数
+    limits: Dict[str, EngineLimit] = field(default_factory=lambda: dict(DEFAULT_ENGINE_LIMITS))
+
+
+DEFAULT_SCHEDULER_SETTINGS = SchedulerSettings()
+
+
+_buckets: Dict[Tuple[str, float, int], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_engine_bucket(engine: str, limit: EngineLimit) -> TokenBucket:
+    """进程内共享的引擎令牌桶（跨批次、跨 asyncio.run 生效）"""
+    key = (engine, limit.rate, limit.burst)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(limit.rate, limit.burst)
+        return bucket
+
+
+@dataclass
+class SynthesisRoute:
+    """片段的一条合成路由"""
+    engine: str                                         # 引擎标识（用于限流与耗时统计）
+    synth: Callable[[str], Awaitable[bool]]             # synth(输出路径) -> 是否成功
+
+
+@dataclass
+class SynthesisTask:
+    """待合成的片段"""
+    output_path: str
+    routes: List[SynthesisRoute]                        # 按顺序尝试，前一个引擎重试耗尽后回退到下一个
+    label: str = ""
+
+
+@dataclass
+class SynthesisStats:
+    """调度计数"""
+    attempts: int = 0               # 实际发出的请求数（含重试与对冲）
+    retries: int = 0                # 失败后的重试次数
+    hedges: int = 0                 # 对冲请求数
+    hedge_wins: int = 0             # 对冲请求先于原请求成功的次数
+    fallbacks: int = 0              # 回退到下一个引擎的片段次数
+    succeeded: int = 0
+    failed: int = 0
+    latencies: List[float] = field(default_factory=list)    # 成功片段的端到端耗时（秒）
+
+    @property
+    def p50(self) -> float:
+        return percentile(self.latencies, 50)
+
+    @property
+    def p95(self) -> float:
+        return percentile(self.latencies, 95)
+
+    def summary(self) -> str:
+        """一行中文摘要"""
+        text = (f"合成 {self.succeeded}/{self.succeeded + self.failed} 段，请求 {self.attempts} 次"
+                f"（重试 {self.retries}，对冲 {self.hedges}，对冲胜出 {self.hedge_wins}）")
+        if self.fallbacks:
+            text += f"，回退 {self.fallbacks} 段"
+        if self.latencies:
+            text += f"，耗时 p50 {self.p50:.1f}s / p95 {self.p95:.1f}s"
+        return text
+
+
+class SynthesisScheduler:
+    """
+    TTS 合成调度器
+    同一实例可跨多个批次使用，计数与各引擎的耗时样本（决定对冲时机）持续累积。
+    """
+
+    def __init__(self, settings: SchedulerSettings = DEFAULT_SCHEDULER_SETTINGS):
+        self.settings = settings
+        self.stats = SynthesisStats()
+        self._engine_latencies: Dict[str, List[float]] = {}
+
+    async def run(self, tasks: Sequence[SynthesisTask]) -> List[bool]:
+        """
+        并发合成一批片段（同时进行的片段数不超过 max_concurrency）
+
+        Returns:
+            与 tasks 一一对应的是否成功
+        """
+        semaphore = asyncio.Semaphore(self.settings.max_concurrency)
+
+        async def guarded(task):
+            async with semaphore:
+                return await self.synthesize(task)
+
+        return list(await asyncio.gather(*(guarded(task) for task in tasks)))
+
+    async def synthesize(self, task: SynthesisTask) -> bool:
+        """按路由合成单个片段：重试 → 回退，成功时音频（及时间戳）位于 task.output_path"""
+        policy = self.settings.retry
+        start = time.monotonic()
+        for k, route in enumerate(task.routes):
+            if k:
+                self.stats.fallbacks += 1
+                print(f"⚠️ {task.label or task.output_path}: {task.routes[k - 1].engine} 多次失败，回退到 {route.engine}")
+            for attempt in range(policy.max_attempts):
+                if attempt:
+                    self.stats.retries += 1
+                    await asyncio.sleep(policy.backoff(attempt - 1))
+                if await self._hedged_attempt(route, task.output_path):
+                    self.stats.succeeded += 1
+                    self.stats.latencies.append(time.monotonic() - start)
+                    return True
+        self.stats.failed += 1
+        return False
+
+    def hedge_delay(self, engine: str) -> float:
+        """单次尝试超过这个时长仍未完成就发对冲请求"""
+        samples = self._engine_latencies.get(engine, [])
+        if len(samples) < self.settings.hedge_min_samples:
+            return self.settings.hedge_initial_delay
+        return max(self.settings.hedge_min_delay, self.settings.hedge_multiplier * percentile(samples, 50))
+
+    async def _attempt(self, route: SynthesisRoute, path: str, sent: asyncio.Event) -> bool:
+        """限流后发出一次请求（取到令牌、请求发出时设置 sent）"""
+        limit = self.settings.limits.get(route.engine)
+        if limit is not None:
+            await get_engine_bucket(route.engine, limit).acquire_async()
+        sent.set()
+        self.stats.attempts += 1
+        start = time.monotonic()
+        try:
+            success = await asyncio.wait_for(route.synth(path), self.settings.attempt_timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ {route.engine} 合成超时（{self.settings.attempt_timeout:.0f}秒）")
+            return False
+        except Exception as e:
+            print(f"⚠️ {route.engine} 合成异常: {e}")
+            return False
+        if success is not True or not os.path.exists(path) or os.path.getsize(path) == 0:
+            return False
+        self._engine_latencies.setdefault(route.engine, []).append(time.monotonic() - start)
+        return True
+
+    async def _hedged_attempt(self, route: SynthesisRoute, output_path: str) -> bool:
+        """
+        一次（可能带对冲的）尝试：每个请求写各自的临时文件，先成功者移到 output_path，其余取消
+        对冲计时从原请求取到令牌发出时开始，限流排队的时间不算慢；
+        对冲请求失败而原请求仍未返回时，再等一个对冲间隔后重新对冲（最多 max_hedges 个）
+        """
+        base, extension = os.path.splitext(output_path)
+        paths: Dict["asyncio.Future", str] = {}
+
+        def launch(sent):
+            path = f"{base}.try{uuid.uuid4().hex[:8]}{extension}"
+            future = asyncio.ensure_future(self._attempt(route, path, sent))
+            paths[future] = path
+            return future
+
+        primary_sent = asyncio.Event()
+        primary = launch(primary_sent)
+        pending = {primary}
+        hedges_left = self.settings.max_hedges if self.settings.hedge else 0
+        sent_waiter = asyncio.ensure_future(primary_sent.wait())
+        try:
+            if hedges_left:
+                await asyncio.wait({primary, sent_waiter}, return_when=asyncio.FIRST_COMPLETED)
+            while pending:
+                # 同一时刻只有一个对冲请求在途
+                can_hedge = hedges_left > 0 and len(pending) == 1
+                timeout = self.hedge_delay(route.engine) if can_hedge else None
+                done, pending = await asyncio.wait(pending, timeout=timeout,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedges_left -= 1
+                    self.stats.hedges += 1
+                    pending.add(launch(asyncio.Event()))
+                    continue
+                for future in done:
+                    if future.result():
+                        _promote(paths[future], output_path)
+                        if future is not primary:
+                            self.stats.hedge_wins += 1
+                        return True
+            return False
+        finally:
+            sent_waiter.cancel()
+            for future in pending:
+                future.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            for path in paths.values():
+                if os.path.exists(path):
+                    os.remove(path)
+                remove_speech_timing(path)
+
+
+def _promote(path: str, output_path: str) -> None:
+    """把胜出请求的音频与时间戳移到最终路径"""
+    os.replace(path, output_path)
+    if os.path.exists(timing_path(path)):
+        os.replace(timing_path(path), timing_path(output_path))
+    else:
+        remove_speech_timing(output_path)
+
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 """
 音色工厂 - 根据音色ID创建对应音色实例
-支持自动路由和降级策略
+支持自动路由和降级策略；实例按音色ID池化复用，可用性检查结果按 TTL 缓存
 """
 
-from typing import Dict, Type, Optional, List
+import threading
+import time
+from typing import Dict, Type, Optional, List, Iterable, Tuple
 from .base_voice import BaseVoice, VoiceConfig
 from .edge_voice import EdgeVoice
 from .volc_voice import VolcVoice
@@ -14,8 +16,22 @@ class VoiceFactory:
     """
     音色工厂类
     负责创建和管理音色实例，支持自动路由
+    同一音色ID只初始化一次，凭证 / 可用性检查在 AVAILABILITY_TTL 内复用；
+    启动时调用 warm_up() / warm_up_in_background() 预先完成这些准备。
     """
     
+    # 默认音色（与 Config.default_voice 一致）
+    DEFAULT_VOICE_ID = "zh-CN-YunxiNeural"
+    
+    # 可用性检查结果的缓存时长（秒）
+    AVAILABILITY_TTL = 300.0
+    
+    # 实例池 {voice_id: 音色实例}
+    _instances: Dict[str, BaseVoice] = {}
+    # 可用性缓存 {voice_id: (检查时刻, 是否可用)}
+    _availability: Dict[str, Tuple[float, bool]] = {}
+    _pool_lock = threading.Lock()
+    
     # 音色注册表
     _voice_registry: Dict[str, Dict] = {
         # Edge TTS 音色
@@ -48,7 +64,7 @@ class VoiceFactory:
     @classmethod
     def create(cls, voice_id: str) -> Optional[BaseVoice]:
         """
-        创建音色实例
+        获取音色实例（池化：同一音色ID返回同一个已初始化的实例）
         
         Args:
             voice_id: 音色ID
@@ -56,6 +72,21 @@ class VoiceFactory:
         Returns:
             音色实例，如果找不到则返回None
         """
+        voice = cls._instances.get(voice_id)
+        if voice is not None:
+            return voice
+        
+        with cls._pool_lock:
+            voice = cls._instances.get(voice_id)
+            if voice is None:
+                voice = cls._build(voice_id)
+                if voice is not None:
+                    cls._instances[voice_id] = voice
+            return voice
+    
+    @classmethod
+    def _build(cls, voice_id: str) -> Optional[BaseVoice]:
+        """按注册表新建实例（不入池）"""
         voice_info = cls._voice_registry.get(voice_id)
         if not voice_info:
             return None
@@ -65,6 +96,92 @@ class VoiceFactory:
         
         return voice_class(voice_key)
     
+    @classmethod
+    def is_available(cls, voice_id: str, refresh: bool = False) -> bool:
+        """
+        音色是否可用（结果缓存 AVAILABILITY_TTL 秒）
+        
+        Args:
+            voice_id: 音色ID
+            refresh: 忽略缓存重新检查
+        """
+        cached = cls._availability.get(voice_id)
+        if not refresh and cached and time.monotonic() - cached[0] < cls.AVAILABILITY_TTL:
+            return cached[1]
+        
+        voice = cls.create(voice_id)
+        try:
+            available = bool(voice and voice.is_available())
+        except Exception as e:
+            print(f"⚠️ 音色可用性检查失败 {voice_id}: {e}")
+            available = False
+        cls._availability[voice_id] = (time.monotonic(), available)
+        return available
+    
+    @classmethod
+    def warm_up(cls, voice_ids: Optional[Iterable[str]] = None, timeout: float = 10) -> Dict[str, bool]:
+        """
+        预热音色：创建实例入池、检查凭证并完成各引擎的一次性准备（如火山引擎预先建连）
+        供应用启动或调度器开工时调用，会话中的首次合成不再承担这些开销。
+        
+        Args:
+            voice_ids: 要预热的音色ID，默认只预热默认音色（其余音色首次使用时再准备）
+            timeout: 单个音色的预热超时（秒）
+        
+        Returns:
+            {voice_id: 是否可用}
+        """
+        voice_ids = list(voice_ids) if voice_ids is not None else [cls.DEFAULT_VOICE_ID]
+        results = {}
+        for voice_id in voice_ids:
+            voice = cls.create(voice_id)
+            if voice is None:
+                results[voice_id] = False
+                continue
+            try:
+                available = bool(voice.warm_up(timeout=timeout))
+            except Exception as e:
+                print(f"⚠️ 音色预热失败 {voice_id}: {e}")
+                available = False
+            cls._availability[voice_id] = (time.monotonic(), available)
+            results[voice_id] = available
+        return results
+    
+    @classmethod
+    def warm_up_in_background(cls, voice_ids: Optional[Iterable[str]] = None,
+                              timeout: float = 10) -> threading.Thread:
+        """
+        在后台线程中预热音色，立即返回（供页面启动时调用，不阻塞渲染）
+        
+        Args:
+            voice_ids: 要预热的音色ID，默认只预热默认音色
+            timeout: 单个音色的预热超时（秒）
+        
+        Returns:
+            预热线程（守护线程）
+        """
+        voice_ids = list(voice_ids) if voice_ids is not None else None
+        thread = threading.Thread(target=cls.warm_up, args=(voice_ids, timeout),
+                                  name="voice-warm-up", daemon=True)
+        thread.start()
+        return thread
+    
+    @classmethod
+    def invalidate(cls, voice_id: Optional[str] = None) -> None:
+        """
+        丢弃池中的实例与可用性缓存（更换凭证后调用）
+        
+        Args:
+            voice_id: 音色ID，默认全部
+        """
+        with cls._pool_lock:
+            if voice_id is None:
+                cls._instances.clear()
+                cls._availability.clear()
+            else:
+                cls._instances.pop(voice_id, None)
+                cls._availability.pop(voice_id, None)
+    
     @classmethod
     def create_with_fallback(cls, voice_id: str) -> BaseVoice:
         """
@@ -76,9 +193,9 @@ class VoiceFactory:
         Returns:
             可用的音色实例
         """
-        # 尝试创建首选音色
+        # 尝试首选音色（可用性检查走缓存）
         voice = cls.create(voice_id)
-        if voice and voice.is_available():
+        if voice and cls.is_available(voice_id):
             return voice
         
         # 如果是火山引擎失败，降级到 Edge TTS
@@ -150,6 +267,7 @@ class VoiceFactory:
             "class": voice_class
         }
         cls._display_names[voice_id] = display_name
+        cls.invalidate(voice_id)
 
 
 class VoiceRouter:
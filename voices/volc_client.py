@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+火山引擎 V3 双向流式 TTS 进程内客户端
+长连接池常驻在后台事件循环线程中，跨 asyncio.run / Streamlit rerun 复用：
+每个片段在空闲连接上开一个会话，音频分块边收边写盘，句子结束事件中的逐字时间戳同时记入旁路文件；
+不同片段占用不同连接并发合成，不再为每段启动 bidirection.py 子进程并重新握手。
+"""
+
+import asyncio
+import concurrent.futures
+import copy
+import json
+import os
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from .speech_timing import TimingCollector
+from .volc_protocols import (
+    EventType,
+    MsgType,
+    finish_connection,
+    finish_session,
+    receive_message,
+    start_connection,
+    start_session,
+    task_request,
+    wait_for_event,
+)
+
+DEFAULT_ENDPOINT = "wss://openspeech.bytedance.com/api/v3/tts/bidirection"
+
+
+def get_resource_id(voice: str) -> str:
+    """音色对应的资源 ID（复刻音色走 megatts）"""
+    if voice.startswith("S_"):
+        return "volc.megatts.default"
+    return "volc.service_type.10029"
+
+
+class VolcTTSClient:
+    """
+    火山引擎 TTS 客户端（绑定创建它的事件循环）
+    连接按资源 ID 分池，同时进行的会话数不超过 max_connections，每条连接同一时刻只跑一个会话。
+    """
+
+    def __init__(self, appid: str, access_token: str, endpoint: str = DEFAULT_ENDPOINT,
+                 max_connections: int = 3, sample_rate: int = 24000):
+        """
+        Args:
+            appid: APP ID
+            access_token: Access Token
+            endpoint: WebSocket 地址
+            max_connections: 最大并发会话（连接）数
+            sample_rate: 输出采样率
+        """
+        self.appid = appid
+        self.access_token = access_token
+        self.endpoint = endpoint
+        self.max_connections = max_connections
+        self.sample_rate = sample_rate
+        self._idle: Dict[str, List] = {}
+        self._slots = asyncio.Semaphore(max_connections)
+        self.connections_opened = 0
+        self.sessions = 0
+
+    async def _connect(self, resource_id: str):
+        import websockets
+
+        headers = {
+            "X-Api-App-Key": self.appid,
+            "X-Api-Access-Key": self.access_token,
+            "X-Api-Resource-Id": resource_id,
+            "X-Api-Connect-Id": str(uuid.uuid4()),
+        }
+        websocket = await websockets.connect(self.endpoint, additional_headers=headers,
+                                             max_size=10 * 1024 * 1024)
+        try:
+            await start_connection(websocket)
+            await wait_for_event(websocket, MsgType.FullServerResponse, EventType.ConnectionStarted)
+        except Exception:
+            await websocket.close()
+            raise
+        self.connections_opened += 1
+        return websocket
+
+    def _base_request(self, voice_type: str, encoding: str) -> dict:
+        return {
+            "user": {"uid": str(uuid.uuid4())},
+            "namespace": "BidirectionalTTS",
+            "req_params": {
+                "speaker": voice_type,
+                "audio_params": {
+                    "format": encoding,
+                    "sample_rate": self.sample_rate,
+                    "enable_timestamp": True,
+                },
+                "additions": json.dumps({"disable_markdown_filter": False}),
+            },
+        }
+
+    async def _run_session(self, websocket, text: str, voice_type: str, output_path: str,
+                           encoding: str) -> int:
+        """在给定连接上跑一个会话，音频流式写入 output_path（时间戳写入旁路文件），返回写入字节数"""
+        base_request = self._base_request(voice_type, encoding)
+        session_id = str(uuid.uuid4())
+
+        start_request = copy.deepcopy(base_request)
+        start_request["event"] = EventType.StartSession
+        await start_session(websocket, json.dumps(start_request).encode(), session_id)
+        await wait_for_event(websocket, MsgType.FullServerResponse, EventType.SessionStarted)
+
+        synthesis_request = copy.deepcopy(base_request)
+        synthesis_request["event"] = EventType.TaskRequest
+        synthesis_request["req_params"]["text"] = text
+        await task_request(websocket, json.dumps(synthesis_request).encode(), session_id)
+        await finish_session(websocket, session_id)
+
+        tmp_path = f"{output_path}.{session_id[:8]}.part"
+        written = 0
+        collector = TimingCollector()
+        try:
+            with open(tmp_path, "wb") as f:
+                while True:
+                    msg = await receive_message(websocket)
+                    if msg.type == MsgType.AudioOnlyServer:
+                        f.write(msg.payload)
+                        written += len(msg.payload)
+                    elif msg.type == MsgType.FullServerResponse:
+                        if msg.event == EventType.SessionFinished:
+                            break
+                        if msg.event in (EventType.SessionFailed, EventType.SessionCanceled):
+                            raise RuntimeError(f"火山引擎会话失败: {msg}")
+                        if msg.event == EventType.TTSSentenceEnd:
+                            try:
+                                collector.add_volc_sentence(json.loads(msg.payload))
+                            except (ValueError, AttributeError):
+                                pass
+                        # 句子开始、用量等事件无需处理
+                    else:
+                        raise RuntimeError(f"火山引擎 TTS 返回错误: {msg}")
+            if written == 0:
+                raise RuntimeError("火山引擎未返回音频数据")
+            os.replace(tmp_path, output_path)
+            collector.finish(output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.sessions += 1
+        return written
+
+    async def synthesize(self, text: str, voice_type: str, output_path: str,
+                         encoding: str = "mp3") -> int:
+        """
+        合成一段语音并写入 output_path
+
+        Returns:
+            音频字节数
+
+        Raises:
+            RuntimeError / websockets 异常：合成失败
+        """
+        from websockets.exceptions import ConnectionClosed
+
+        resource_id = get_resource_id(voice_type)
+        async with self._slots:
+            while True:
+                idle = self._idle.get(resource_id)
+                reused = bool(idle)
+                websocket = idle.pop() if reused else await self._connect(resource_id)
+                try:
+                    written = await self._run_session(websocket, text, voice_type, output_path, encoding)
+                except ConnectionClosed:
+                    await self._discard(websocket)
+                    if reused:
+                        continue  # 空闲连接已被服务端关闭，换一条重试
+                    raise
+                except BaseException:
+                    # 会话中途失败时连接状态未知，直接丢弃
+                    await self._discard(websocket)
+                    raise
+                self._idle.setdefault(resource_id, []).append(websocket)
+                return written
+
+    async def warm_up(self, voice_type: str) -> bool:
+        """
+        预先建立该音色资源的一条空闲连接（已有空闲连接时直接返回）
+
+        Returns:
+            是否新建了连接
+        """
+        resource_id = get_resource_id(voice_type)
+        async with self._slots:
+            if self._idle.get(resource_id):
+                return False
+            websocket = await self._connect(resource_id)
+            self._idle.setdefault(resource_id, []).append(websocket)
+            return True
+
+    async def _discard(self, websocket) -> None:
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def close(self) -> None:
+        """结束并关闭所有空闲连接"""
+        idle = [ws for pool in self._idle.values() for ws in pool]
+        self._idle.clear()
+        for websocket in idle:
+            try:
+                await finish_connection(websocket)
+                await asyncio.wait_for(
+                    wait_for_event(websocket, MsgType.FullServerResponse, EventType.ConnectionFinished),
+                    timeout=2
+                )
+            except Exception:
+                pass
+            await self._discard(websocket)
+
+
+# ==================== 后台事件循环（连接常驻） ====================
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_clients: Dict[Tuple[str, str, str], VolcTTSClient] = {}
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="volc-tts-loop", daemon=True).start()
+        return _loop
+
+
+def _client_for(appid, access_token, endpoint) -> VolcTTSClient:
+    """取（或创建）凭证对应的客户端，只在后台事件循环中调用"""
+    key = (appid, access_token, endpoint)
+    client = _clients.get(key)
+    if client is None:
+        client = VolcTTSClient(appid, access_token, endpoint)
+        _clients[key] = client
+    return client
+
+
+async def _synthesize_on_loop(appid, access_token, endpoint, text, voice_type, output_path,
+                              encoding) -> int:
+    return await _client_for(appid, access_token, endpoint).synthesize(text, voice_type, output_path, encoding)
+
+
+async def _warm_up_on_loop(appid, access_token, endpoint, voice_type) -> bool:
+    return await _client_for(appid, access_token, endpoint).warm_up(voice_type)
+
+
+def _submit(appid, access_token, text, voice_type, output_path, encoding, endpoint):
+    coro = _synthesize_on_loop(appid, access_token, endpoint, text, voice_type, output_path, encoding)
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop())
+
+
+async def volcengine_synthesize(appid: str, access_token: str, text: str, voice_type: str,
+                                output_path: str, encoding: str = "mp3", timeout: float = 60,
+                                endpoint: str = DEFAULT_ENDPOINT) -> int:
+    """
+    在共享长连接上合成语音（可在任意事件循环中 await，多个调用并发合成）
+
+    Returns:
+        音频字节数
+
+    Raises:
+        asyncio.TimeoutError: 超时
+        RuntimeError 等：合成失败
+    """
+    future = _submit(appid, access_token, text, voice_type, output_path, encoding, endpoint)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        future.cancel()
+        raise
+
+
+def volcengine_warm_up_sync(appid: str, access_token: str, voice_type: str, timeout: float = 10,
+                            endpoint: str = DEFAULT_ENDPOINT) -> bool:
+    """
+    预热：提前完成握手，把连接放入空闲池，首个合成请求无需再建连
+
+    Returns:
+        是否新建了连接（已有空闲连接时为 False）
+
+    Raises:
+        concurrent.futures.TimeoutError / websockets 异常：建连失败
+    """
+    future = asyncio.run_coroutine_threadsafe(
+        _warm_up_on_loop(appid, access_token, endpoint, voice_type), _background_loop()
+    )
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        # Python 3.10 中它与内置 TimeoutError 不是同一个类；超时后取消后台循环上的握手
+        future.cancel()
+        raise
+
+
+def close_volcengine_clients(timeout: float = 5) -> None:
+    """关闭所有常驻连接（进程退出或切换凭证时调用）"""
+    if _loop is None or _loop.is_closed():
+        return
+
+    async def close_all():
+        clients = list(_clients.values())
+        _clients.clear()
+        for client in clients:
+            await client.close()
+
+    asyncio.run_coroutine_threadsafe(close_all(), _loop).result(timeout)
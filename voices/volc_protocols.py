@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+火山引擎 V3 双向流式 TTS 二进制协议
+帧格式：4 字节头（版本 / 头长度、消息类型 / 标志、序列化 / 压缩、保留）
++ [事件号][会话 ID][连接 ID][序号 | 错误码] + 负载长度 + 负载，整数均为大端。
+"""
+
+import io
+import struct
+from dataclasses import dataclass
+from enum import IntEnum
+
+
+class MsgType(IntEnum):
+    """消息类型"""
+    Invalid = 0
+    FullClientRequest = 0b1
+    AudioOnlyClient = 0b10
+    FullServerResponse = 0b1001
+    AudioOnlyServer = 0b1011
+    FrontEndResultServer = 0b1100
+    Error = 0b1111
+
+
+class MsgTypeFlagBits(IntEnum):
+    """消息类型标志位"""
+    NoSeq = 0
+    PositiveSeq = 0b1
+    LastNoSeq = 0b10
+    NegativeSeq = 0b11
+    WithEvent = 0b100
+
+
+class SerializationBits(IntEnum):
+    Raw = 0
+    JSON = 0b1
+
+
+class CompressionBits(IntEnum):
+    None_ = 0
+    Gzip = 0b1
+
+
+class EventType(IntEnum):
+    """事件号"""
+    None_ = 0
+    # 连接级
+    StartConnection = 1
+    FinishConnection = 2
+    ConnectionStarted = 50
+    ConnectionFailed = 51
+    ConnectionFinished = 52
+    # 会话级
+    StartSession = 100
+    CancelSession = 101
+    FinishSession = 102
+    SessionStarted = 150
+    SessionCanceled = 151
+    SessionFinished = 152
+    SessionFailed = 153
+    UsageResponse = 154
+    # 数据
+    TaskRequest = 200
+    UpdateConfig = 201
+    TTSSentenceStart = 350
+    TTSSentenceEnd = 351
+    TTSResponse = 352
+    TTSEnded = 359
+
+
+# 不携带会话 ID 的事件
+_NO_SESSION_EVENTS = {
+    EventType.StartConnection, EventType.FinishConnection,
+    EventType.ConnectionStarted, EventType.ConnectionFailed, EventType.ConnectionFinished,
+}
+# 携带连接 ID 的事件（服务端下发）
+_CONNECT_ID_EVENTS = {
+    EventType.ConnectionStarted, EventType.ConnectionFailed, EventType.ConnectionFinished,
+}
+_SEQUENCED_TYPES = {
+    MsgType.FullClientRequest, MsgType.FullServerResponse, MsgType.FrontEndResultServer,
+    MsgType.AudioOnlyClient, MsgType.AudioOnlyServer,
+}
+
+
+@dataclass
+class Message:
+    """协议帧"""
+    version: int = 1
+    header_size: int = 1
+    type: MsgType = MsgType.Invalid
+    flag: MsgTypeFlagBits = MsgTypeFlagBits.NoSeq
+    serialization: SerializationBits = SerializationBits.JSON
+    compression: CompressionBits = CompressionBits.None_
+    event: EventType = EventType.None_
+    session_id: str = ""
+    connect_id: str = ""
+    sequence: int = 0
+    error_code: int = 0
+    payload: bytes = b""
+
+    def marshal(self) -> bytes:
+        """编码为二进制帧"""
+        buffer = io.BytesIO()
+        header = [
+            (self.version << 4) | self.header_size,
+            (self.type << 4) | self.flag,
+            (self.serialization << 4) | self.compression,
+        ]
+        header.extend([0] * (4 * self.header_size - len(header)))
+        buffer.write(bytes(header))
+
+        if self.flag == MsgTypeFlagBits.WithEvent:
+            buffer.write(struct.pack('>i', self.event))
+            if self.event not in _NO_SESSION_EVENTS:
+                _write_string(buffer, self.session_id)
+            if self.event in _CONNECT_ID_EVENTS:
+                _write_string(buffer, self.connect_id)
+
+        if self.type in _SEQUENCED_TYPES:
+            if self.flag in (MsgTypeFlagBits.PositiveSeq, MsgTypeFlagBits.NegativeSeq):
+                buffer.write(struct.pack('>i', self.sequence))
+        elif self.type == MsgType.Error:
+            buffer.write(struct.pack('>I', self.error_code))
+        else:
+            raise ValueError(f"不支持的消息类型: {self.type}")
+
+        buffer.write(struct.pack('>I', len(self.payload)))
+        buffer.write(self.payload)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Message":
+        """从二进制帧解码"""
+        if len(data) < 4:
+            raise ValueError(f"帧长度不足: {len(data)}")
+        buffer = io.BytesIO(data)
+        b0, b1, b2, _ = buffer.read(4)
+        msg = cls(
+            version=b0 >> 4,
+            header_size=b0 & 0x0F,
+            type=MsgType(b1 >> 4),
+            flag=MsgTypeFlagBits(b1 & 0x0F),
+            serialization=SerializationBits(b2 >> 4),
+            compression=CompressionBits(b2 & 0x0F),
+        )
+        buffer.seek(4 * msg.header_size)
+
+        if msg.flag == MsgTypeFlagBits.WithEvent:
+            msg.event = _to_event(struct.unpack('>i', buffer.read(4))[0])
+            if msg.event not in _NO_SESSION_EVENTS:
+                msg.session_id = _read_string(buffer)
+            if msg.event in _CONNECT_ID_EVENTS:
+                msg.connect_id = _read_string(buffer)
+
+        if msg.type in _SEQUENCED_TYPES:
+            if msg.flag in (MsgTypeFlagBits.PositiveSeq, MsgTypeFlagBits.NegativeSeq):
+                msg.sequence = struct.unpack('>i', buffer.read(4))[0]
+        elif msg.type == MsgType.Error:
+            msg.error_code = struct.unpack('>I', buffer.read(4))[0]
+        else:
+            raise ValueError(f"不支持的消息类型: {msg.type}")
+
+        size = struct.unpack('>I', buffer.read(4))[0]
+        msg.payload = buffer.read(size)
+        return msg
+
+    def __str__(self) -> str:
+        event = getattr(self.event, 'name', self.event)
+        if self.type in (MsgType.AudioOnlyServer, MsgType.AudioOnlyClient):
+            return f"{self.type.name} event={event} session={self.session_id} payload={len(self.payload)}B"
+        return (f"{self.type.name} event={event} session={self.session_id} "
+                f"error={self.error_code} payload={self.payload[:200]!r}")
+
+
+def _to_event(value: int):
+    """未登记的事件号原样保留为整数"""
+    try:
+        return EventType(value)
+    except ValueError:
+        return value
+
+
+def _write_string(buffer: io.BytesIO, value: str) -> None:
+    raw = value.encode('utf-8')
+    buffer.write(struct.pack('>I', len(raw)))
+    buffer.write(raw)
+
+
+def _read_string(buffer: io.BytesIO) -> str:
+    size = struct.unpack('>I', buffer.read(4))[0]
+    return buffer.read(size).decode('utf-8') if size else ""
+
+
+async def receive_message(websocket) -> Message:
+    """接收并解码一帧"""
+    data = await websocket.recv()
+    if isinstance(data, str):
+        raise ValueError(f"意外的文本帧: {data}")
+    return Message.from_bytes(data)
+
+
+async def wait_for_event(websocket, msg_type: MsgType, event_type: EventType) -> Message:
+    """接收下一帧并校验类型与事件号"""
+    msg = await receive_message(websocket)
+    if msg.type != msg_type or msg.event != event_type:
+        raise RuntimeError(f"意外的消息: {msg}")
+    return msg
+
+
+async def _send_event(websocket, event: EventType, payload: bytes, session_id: str = "") -> None:
+    msg = Message(type=MsgType.FullClientRequest, flag=MsgTypeFlagBits.WithEvent,
+                  event=event, session_id=session_id, payload=payload)
+    await websocket.send(msg.marshal())
+
+
+async def start_connection(websocket) -> None:
+    await _send_event(websocket, EventType.StartConnection, b"{}")
+
+
+async def finish_connection(websocket) -> None:
+    await _send_event(websocket, EventType.FinishConnection, b"{}")
+
+
+async def start_session(websocket, payload: bytes, session_id: str) -> None:
+    await _send_event(websocket, EventType.StartSession, payload, session_id)
+
+
+async def finish_session(websocket, session_id: str) -> None:
+    await _send_event(websocket, EventType.FinishSession, b"{}", session_id)
+
+
+async def cancel_session(websocket, session_id: str) -> None:
+    await _send_event(websocket, EventType.CancelSession, b"{}", session_id)
+
+
+async def task_request(websocket, payload: bytes, session_id: str) -> None:
+    await _send_event(websocket, EventType.TaskRequest, payload, session_id)
+
+
+__all__ = [
+    'MsgType', 'MsgTypeFlagBits', 'SerializationBits', 'CompressionBits', 'EventType', 'Message',
+    'receive_message', 'wait_for_event', 'start_connection', 'finish_connection',
+    'start_session', 'finish_session', 'cancel_session', 'task_request',
+]
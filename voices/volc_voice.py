@@ -5,10 +5,12 @@
 """
 
 import os
-import sys
-import subprocess
+import time
+import asyncio
 from typing import Optional
 from .base_voice import BaseVoice, VoiceConfig
+from .tts_cache import get_tts_cache, tts_cache_key
+from .volc_client import volcengine_synthesize, volcengine_warm_up_sync
 
 
 class VolcVoice(BaseVoice):
@@ -20,6 +22,9 @@ class VolcVoice(BaseVoice):
     engine_id = "volc"
     engine_name = "火山引擎 TTS"
     
+    # 凭证检查结果的缓存时长（秒）
+    CREDENTIAL_TTL = 300.0
+    
     # 预定义音色列表
     PRESET_VOICES = {
         "lingcheng": VoiceConfig(
@@ -81,9 +86,19 @@ class VolcVoice(BaseVoice):
         self.voice_key = voice_key
         self._appid: Optional[str] = None
         self._access_token: Optional[str] = None
+        self._credentials_checked_at: Optional[float] = None
     
-    def _load_credentials(self) -> bool:
-        """加载 API 凭证"""
+    def _load_credentials(self, refresh: bool = False) -> bool:
+        """
+        加载 API 凭证（结果缓存 CREDENTIAL_TTL 秒）
+        
+        Args:
+            refresh: 忽略缓存重新读取
+        """
+        checked_at = self._credentials_checked_at
+        if not refresh and checked_at is not None and time.monotonic() - checked_at < self.CREDENTIAL_TTL:
+            return bool(self._appid and self._access_token)
+        
         try:
             # 尝试从 Streamlit secrets 加载
             import streamlit as st
@@ -94,12 +109,29 @@ class VolcVoice(BaseVoice):
             self._appid = os.environ.get("VOLC_APPID", "")
             self._access_token = os.environ.get("VOLC_ACCESS_TOKEN", "")
         
+        self._credentials_checked_at = time.monotonic()
         return bool(self._appid and self._access_token)
     
     def is_available(self) -> bool:
         """检查火山引擎是否可用（需要API密钥）"""
         return self._load_credentials()
     
+    def warm_up(self, timeout: float = 10) -> bool:
+        """
+        预热：校验凭证，并提前与火山引擎完成 WebSocket 握手（连接放入空闲池）
+        
+        Returns:
+            凭证可用且建连成功
+        """
+        if not self._load_credentials(refresh=True):
+            return False
+        try:
+            volcengine_warm_up_sync(self._appid, self._access_token, self.config.voice_id, timeout=timeout)
+            return True
+        except Exception as e:
+            print(f"⚠️ 火山引擎预热失败: {e}")
+            return False
+    
     async def synthesize(self, text: str, output_path: str, **kwargs) -> bool:
         """
         使用火山引擎合成语音
@@ -123,38 +155,20 @@ class VolcVoice(BaseVoice):
         # 预处理文本
         text = self.preprocess_text(text)
         
-        # 官方脚本路径
-        script_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)), 
-            "examples", "volcengine", "bidirection.py"
+        # 内容寻址缓存：相同音色 + 文本直接复用
+        key = tts_cache_key(self.engine_id, self.config.voice_id, text)
+        return await get_tts_cache().synthesize(
+            key, output_path, lambda path: self._synthesize_uncached(text, path, timeout)
         )
-        
-        if not os.path.exists(script_path):
-            print(f"❌ 找不到火山引擎脚本: {script_path}")
-            return False
-        
+    
+    async def _synthesize_uncached(self, text: str, output_path: str, timeout: float) -> bool:
+        """在常驻长连接上合成（进程内 WebSocket 客户端）"""
         print(f"🚀 正在调用豆包语音合成: {self.config.voice_name}...")
         
         try:
-            # 构建命令
-            command = [
-                sys.executable,
-                script_path,
-                "--appid", self._appid,
-                "--access_token", self._access_token,
-                "--voice_type", self.config.voice_id,
-                "--text", text,
-                "--encoding", "mp3",
-                "--output", output_path
-            ]
-            
-            # 执行脚本
-            result = subprocess.run(
-                command,
-                check=True,
-                capture_output=True,
-                text=True,
-                timeout=timeout
+            await volcengine_synthesize(
+                self._appid, self._access_token, text, self.config.voice_id, output_path,
+                encoding="mp3", timeout=timeout
             )
             
             # 验证输出
@@ -165,12 +179,9 @@ class VolcVoice(BaseVoice):
                 print(f"❌ 输出文件未生成或为空: {output_path}")
                 return False
                 
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             print(f"❌ 火山引擎 TTS 超时（{timeout}秒）")
             return False
-        except subprocess.CalledProcessError as e:
-            print(f"❌ 火山引擎调用失败: {e.stderr}")
-            return False
         except Exception as e:
             print(f"❌ 火山引擎异常: {e}")
             return False